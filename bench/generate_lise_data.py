@@ -0,0 +1,251 @@
+"""Synthetic LISE exports for local NB_BRONZE / NB_SILVER runs.
+
+Writes the 15 datasets of the NB_BRONZE registry as the school software exports
+them: UTF-16LE with a BOM, every field quoted, CRLF rows, control characters and
+line breaks inside values, null tokens in date fields and per-year file names.
+
+    python bench/generate_lise_data.py --out /tmp/lise/LH_BRONZE.Lakehouse/Files --scale 10
+"""
+
+import argparse
+import csv
+import os
+import random
+from datetime import date, timedelta
+
+YEAR_SUFFIXES = {
+    "2023-2024": "_2324",
+    "2024-2025": "_2425",
+    "2025-2026": "",
+}
+
+# Row counts at scale 1; students, families and invoice runs grow with --scale
+BASE_STUDENTS = 600
+BASE_FAMILIES = 450
+BASE_VALIDATIONS = 10
+STAFF = 80
+
+NOISE = ["\x01", "\x07", "\x1F", "\x7F", "\uFEFF"]
+NOISE_RATE = 0.02
+MULTILINE_RATE = 0.05
+NULL_DATE_TOKENS = ["NULL", "00000000", "InvalidDate", ""]
+
+CLASSES = [
+    (1, "TP", "TP - Soleil"), (2, "PS", "PS - Lune"), (3, "MS", "MS - Etoile"), (4, "GS", "GS - Comète"),
+    (5, "CP", "CP - Alpha"), (6, "CE1", "CE1 - Beta"), (7, "CE2", "CE2 - Gamma"), (8, "CM1", "CM1 - Delta"),
+    (9, "5EME", "5ème - Alpha"), (10, "CM2", "CM2 - Epsilon"), (11, "5EME", "5ème - Beta"), (12, "6ÈME", "6ème - Alpha"),
+    (13, "4EME", "4ème - Alpha"), (14, "3EME", "3ème - Alpha"), (15, "CP", "CP - Beta"), (16, "CE1", "CE1 - Alpha"),
+    (17, "CE2", "CE2 - Alpha"), (18, "CM1", "CM1 - Alpha"), (19, "CM2", "CM2 - Alpha"), (20, "AE", None),
+    (21, "GS", "GS - Alpha"), (22, "MS", "MS - Alpha"), (23, "6ÈME", "6ème - Beta")
+]
+NIVEAUX = ["MAT", "PRIM", "AE", "6E 5E 4E 3E"]
+ETABLISSEMENTS = [(1, "L.I.S.E COLLEGE"), (2, "L.I.S.E PRIMARY"), (3, "L.I.S.E ACADEMY")]
+VILLES = ["LES ABYMES", "BAIE MAHAULT", "Baie-Mahault", "LE GOSIER", "STE ANNE", "ST FRANCOIS", "PETIT-BOURG",
+          "POINTE A PITRE", "LAMENTIN", "LE MOULE", "GOYAVE", "BASSE TERRE", "JARRY", "PARIS", "MONTREAL"]
+CSP = [(10, "Agriculteurs exploitants"), (21, "Artisans"), (23, "Chefs d'entreprise"), (31, "Professions libérales"),
+       (33, "Cadres de la fonction publique"), (37, "Cadres administratifs et commerciaux"), (42, "Professeurs des écoles"),
+       (46, "Professions intermédiaires"), (52, "Employés civils"), (54, "Employés administratifs"), (55, "Employés de commerce"),
+       (62, "Ouvriers qualifiés"), (81, "Chômeurs n'ayant jamais travaillé"), (99, "Non renseignée")]
+PAYS = [(1, "FRANCE", "FRANCAISE"), (2, "HAITI", "HAITIENNE"), (3, "DOMINIQUE", "DOMINIQUAISE"),
+        (4, "ETATS-UNIS", "AMERICAINE"), (5, "CANADA", "CANADIENNE"), (6, "ROYAUME-UNI", "BRITANNIQUE"),
+        (7, "ESPAGNE", "ESPAGNOLE"), (8, "SAINTE-LUCIE", "SAINT-LUCIENNE")]
+BANK_CODES = ["10278", "10107", "11006", "11315", "30004", "11600", "20041", "30003", "40618", "16958", "28233",
+              "30002", "99999"]
+SERVICE_CODES = ["SCOLARITE", "CANTINE", "ETUDE", "GARDERIE", "CM2_TRIP", "VOYAGE_LING_FLL", "POLO", "JUPES",
+                 "PSG_COMPLET", "EXT_PSG_DEMI", "FRAIS_INS", "FRAISRETARD", "KAYAK", "CAMBRIDGEEXAM", "BABY_LISE",
+                 "EXT_OUTDOOR", "FOURNITURES", "REPAS_THANKSGIVING", "ACADEMIC_WEDNESDAY"]
+POSTES_ANA = ["TPS", "PRIMAIRE", "COLLEGE", "ACTIVITES EXTRASCOLAIRES", "FRAISRETARD", "VOYAGES"]
+NOMS = ["MARTIN", "BERNARD", "THOMAS", "PETIT", "ROBERT", "RICHARD", "DURAND", "DUBOIS", "MOREAU", "LAURENT",
+        "SIMON", "MICHEL", "LEFEBVRE", "LEROY", "ROUX", "DAVID", "BERTRAND", "MOREL", "FOURNIER", "GIRARD"]
+PRENOMS = ["Emma", "Louise", "Jade", "Alice", "Chloé", "Lina", "Léa", "Gabriel", "Louis", "Raphaël", "Jules",
+           "Adam", "Lucas", "Léo", "Hugo", "Arthur", "Nathan", "Liam", "Ethan", "Maël"]
+
+# Column layout of each export; the registry columns of NB_BRONZE plus the free-text
+# columns the real exports carry, which Bronze ignores but still has to parse.
+LAYOUTS = {
+    "COM_NIVEAU": ["NI_CODE", "NI_LIBELLE"],
+    "COM_ETABLISSEMENT": ["IDETABLISSEMENT", "ET_LIBELLE", "ET_ADRESSE"],
+    "COM_CLASSES": ["IDCLASSE", "CL_CODE", "CL_LIBELLE", "IDETABLISSEMENT", "IDNIVEAU", "CL_CLASSE_RECTORAT"],
+    "COM_FOYER": ["IDFOYER", "VILLE", "FO_ADRESSE"],
+    "COM_RESPONSABLES": ["IDRESPONSABLE", "IDFOYER", "RE_NOM1", "RE_PRENOM1", "RE_CSP1", "RE_CSP2", "RE_MODE_REGLEMENT",
+                         "RE_ENF_A_CHARGE", "RE_TELPORTABLE1", "RE_EMAILPERSO1", "RE_IBAN", "RE_CODEPOSTAL",
+                         "RE_OBSERVATIONS"],
+    "TAB_CSP": ["CSP_CODE", "CSP_LIBELLE"],
+    "COM_ELEVES": ["IDELEVE", "EL_IDCLASSE", "EL_IDREGIME", "EL_NOM1", "EL_PRENOM1", "EL_SEXE", "EL_DATE_DE_NAISSANCE",
+                   "EL_DATE_ENTREE", "EL_DATE_SORTIE", "EL_NATIONALITE1", "EL_IDENT_NAT", "EL_OBSERVATIONS"],
+    "FAC_COMPTA_GENERAL": ["IDRESPONSABLE", "IDVALIDATION", "CG_POSTE_ANA", "CG_CREDIT", "CG_DEBIT", "CG_DATE_FACTURE"],
+    "FAC_HISTO_LIGNE": ["IDELEVE", "IDRESPONSABLE", "IDVALIDATION", "HL_CODE_LIGNE", "HL_LIBELLE", "HL_QUANTITE",
+                        "HL_PRIX", "HL_REMISE_MT_AUTO", "HL_APAYER_LIGNE"],
+    "FAC_HISTO_FAMILLE": ["IDRESPONSABLE", "IDVALIDATION", "HF_APAYER_FACTURE", "HF_DATE_FACTURE"],
+    "FAC_HISTO_ELEVE": ["IDELEVE", "IDRESPONSABLE", "IDVALIDATION", "HE_IDCLASSE", "HE_IDREGIME", "HE_APAYER_ELEVE"],
+    "FAC_VALIDATION": ["IDVALIDATION", "VA_TYPE_FACTURE", "VA_NB_FACTURES", "VA_DATE_HEURE"],
+    "COM_PERSONNELS": ["IDPERSONNEL", "PE_NOM", "PE_PRENOM", "PE_TYPE", "PE_VILLE", "PE_PAYS", "PE_NATIONALITE",
+                       "PE_DATE_ENTREE", "PE_DATE_SORTIE", "PE_NAISSANCE_DATE", "PE_TELPORTABLE", "PE_EMAIL_PRO",
+                       "PE_NUMSECU", "PE_BADGENUM", "PE_IBAN"],
+    "COM_PROFS_PRINCIPAUX": ["IDPROFSPRINCIPAUX", "IDPERSONNEL", "IDCLASSE"],
+    "TAB_PAYS": ["PA_CODE", "PA_PAYS", "PA_NATIONALITE"],
+}
+
+VILLES_CSV = [
+    ("LES ABYMES", 97139, 16.27, -61.5, "GUADELOUPE", "FRANCE"), ("BAIE MAHAULT", 97122, 16.26, -61.58, "GUADELOUPE", "FRANCE"),
+    ("LE GOSIER", 97190, 16.2, -61.49, "GUADELOUPE", "FRANCE"), ("SAINTE ANNE", 97180, 16.22, -61.38, "GUADELOUPE", "FRANCE"),
+    ("SAINT FRANCOIS", 97118, 16.25, -61.27, "GUADELOUPE", "FRANCE"), ("PETIT BOURG", 97170, 16.19, -61.59, "GUADELOUPE", "FRANCE"),
+    ("POINTE A PITRE", 97110, 16.24, -61.53, "GUADELOUPE", "FRANCE"), ("LAMENTIN", 97129, 16.27, -61.63, "GUADELOUPE", "FRANCE"),
+    ("LE MOULE", 97160, 16.33, -61.34, "GUADELOUPE", "FRANCE"), ("GOYAVE", 97128, 16.13, -61.57, "GUADELOUPE", "FRANCE"),
+    ("BASSE TERRE", 97100, 16.0, -61.73, "GUADELOUPE", "FRANCE"), ("HORS GUADELOUPE", None, None, None, "GUADELOUPE", "FRANCE"),
+    ("FORT DE FRANCE", 97200, 14.6, -61.07, "MARTINIQUE", "FRANCE")
+]
+
+
+def yyyymmdd(value: date) -> str:
+    return value.strftime("%Y%m%d")
+
+
+class Export:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def text(self, value, multiline: bool = False) -> str:
+        value = "" if value is None else str(value)
+        if value and self.rng.random() < NOISE_RATE:
+            at = self.rng.randrange(len(value) + 1)
+            value = value[:at] + self.rng.choice(NOISE) + value[at:]
+        if multiline and self.rng.random() < MULTILINE_RATE:
+            value = f"{value}\nSuite de la remarque\r\n\"citée\""
+        return value
+
+    def date(self, value: date, null_rate: float = 0.0) -> str:
+        if value is None or self.rng.random() < null_rate:
+            return self.rng.choice(NULL_DATE_TOKENS)
+        return yyyymmdd(value)
+
+    def write(self, path: str, header: list, rows):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-16-le", newline="") as f:
+            f.write("\uFEFF")
+            writer = csv.writer(f, quoting=csv.QUOTE_ALL, lineterminator="\r\n")
+            writer.writerow(header)
+            count = 0
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        return count
+
+
+def school_year_start(year: str) -> int:
+    return int(year[:4])
+
+
+def generate_year(export: Export, folder: str, year: str, suffix: str, scale: int) -> dict:
+    rng = export.rng
+    start = school_year_start(year)
+    students = BASE_STUDENTS * scale
+    families = BASE_FAMILIES * scale
+    validations = BASE_VALIDATIONS * scale
+    # Student and family IDs move one year forward per school year so that years overlap
+    first_student = (start - 2023) * students // 5 + 1
+    first_family = (start - 2023) * families // 5 + 1
+    student_ids = range(first_student, first_student + students)
+    family_of = {student: first_family + rng.randrange(families) for student in student_ids}
+    class_of = {student: rng.choice(CLASSES)[0] for student in student_ids}
+    counts = {}
+
+    def out(file_stem: str) -> str:
+        return f"{folder}/Lise_Data/{year}/{file_stem}{suffix}.csv"
+
+    def write(file_stem: str, rows):
+        counts[file_stem] = export.write(out(file_stem), LAYOUTS[file_stem], rows)
+
+    write("COM_NIVEAU", ([export.text(code), export.text(code.title())] for code in NIVEAUX))
+    write("COM_ETABLISSEMENT", ([i, export.text(name), export.text("Route de Montauban", multiline=True)]
+                                for i, name in ETABLISSEMENTS))
+    write("COM_CLASSES", ([i, export.text(code), export.text(label), 1, 0, export.text(code)]
+                          for i, code, label in CLASSES))
+    write("COM_FOYER", ([family, export.text(rng.choice(VILLES)), export.text(f"{rng.randint(1, 200)} rue des Flamboyants", multiline=True)]
+                        for family in range(first_family, first_family + families)))
+    write("COM_RESPONSABLES", ([
+        family, family,
+        export.text(rng.choice(NOMS)), export.text(rng.choice(PRENOMS)),
+        rng.choice([c for c, _ in CSP] + [""]), rng.choice([c for c, _ in CSP]),
+        export.text(rng.choice(["PRELEVEMENT", "CHEQUE", "VIREMENT", "ESPECES"])),
+        rng.randint(1, 4),
+        export.text(rng.choice(["+590 690 ", "0690-", "+33 6 "]) + f"{rng.randint(100000, 999999)}"),
+        export.text(f"parent{family}@example.com"),
+        export.text(f"FR76 {rng.choice(BANK_CODES)} {rng.randint(10000, 99999)} {rng.randint(10 ** 10, 10 ** 11 - 1)} {rng.randint(10, 99)}"),
+        rng.choice(["97122", "97190", "97139", "H4V1H2", ""]),
+        export.text("RAS", multiline=True)
+    ] for family in range(first_family, first_family + families)))
+    write("TAB_CSP", ([code, export.text(label)] for code, label in CSP))
+    write("COM_ELEVES", ([
+        student, class_of[student], rng.choice([1, 2, 0]),
+        export.text(rng.choice(NOMS)), export.text(rng.choice(PRENOMS)), rng.choice(["M", "F"]),
+        export.date(date(start - rng.randint(3, 15), rng.randint(1, 12), rng.randint(1, 28)), null_rate=0.01),
+        export.date(date(start - rng.randint(0, 5), 9, 1)),
+        export.date(date(start + 1, 7, 5), null_rate=0.8),
+        export.text(rng.choice(PAYS)[2]), export.text(f"{rng.randint(10 ** 9, 10 ** 10 - 1)}A"),
+        export.text("", multiline=True)
+    ] for student in student_ids))
+
+    invoice_dates = {v: date(start, 9, 1) + timedelta(days=(v - 1) * 300 // validations) for v in range(1, validations + 1)}
+    billed = {v: rng.sample(list(student_ids), int(students * 0.9)) for v in invoice_dates}
+
+    write("FAC_VALIDATION", ([
+        v, export.text(rng.choice(["Toutes", "Sélection"])), len(billed[v]),
+        export.text(f"Le {invoice_dates[v].strftime('%d/%m/%Y')} à {rng.randint(8, 18):02d}:{rng.randint(0, 59):02d}")
+    ] for v in invoice_dates))
+    write("FAC_HISTO_ELEVE", ([student, family_of[student], v, class_of[student], rng.choice([1, 2, 0]),
+                               round(rng.uniform(50, 600), 2)]
+                              for v in invoice_dates for student in billed[v]))
+    write("FAC_HISTO_LIGNE", ([student, family_of[student], v, code, export.text(code.replace("_", " ").title()),
+                               quantity, price, remise, round(quantity * price - remise, 2)]
+                              for v in invoice_dates for student in billed[v]
+                              for code in rng.sample(SERVICE_CODES, rng.randint(1, 3))
+                              for quantity, price in [(rng.randint(1, 20), round(rng.uniform(2, 300), 2))]
+                              for remise in [round(rng.choice([0, 0, 0, 5, 10.5]), 2)]))
+    families_billed = {v: sorted({family_of[student] for student in billed[v]}) for v in invoice_dates}
+    write("FAC_HISTO_FAMILLE", ([family, v, round(rng.uniform(100, 2000), 2), export.date(invoice_dates[v], null_rate=0.005)]
+                                for v in invoice_dates for family in families_billed[v]))
+    write("FAC_COMPTA_GENERAL", ([family, v, export.text(rng.choice(POSTES_ANA)), round(rng.uniform(0, 1500), 2),
+                                  round(rng.uniform(0, 100), 2), export.date(invoice_dates[v])]
+                                 for v in invoice_dates for family in families_billed[v]))
+
+    write("COM_PERSONNELS", ([
+        person, export.text(rng.choice(NOMS)), export.text(rng.choice(PRENOMS)),
+        export.text(rng.choice(["prof", "exterieur", "Administration", "Agent"])),
+        export.text(rng.choice(VILLES)), export.text("FRANCE"), rng.choice(PAYS)[0],
+        export.date(date(start - rng.randint(0, 15), 9, 1)), export.date(None if rng.random() < 0.9 else date(start + 1, 7, 1)),
+        export.date(date(start - rng.randint(22, 64), rng.randint(1, 12), rng.randint(1, 28))),
+        export.text(f"+590 690 {rng.randint(100000, 999999)}"), export.text(f"staff{person}@lise.fr"),
+        export.text(f"{rng.randint(10 ** 14, 10 ** 15 - 1)}"), 1000 + person,
+        export.text(f"FR76{rng.choice(BANK_CODES)}{rng.randint(10 ** 17, 10 ** 18 - 1)}")
+    ] for person in range(1, STAFF + 1)))
+    write("COM_PROFS_PRINCIPAUX", ([i, rng.randint(1, STAFF), class_id] for i, (class_id, _, _) in enumerate(CLASSES, start=1)))
+    write("TAB_PAYS", ([code, export.text(pays), export.text(nationalite)] for code, pays, nationalite in PAYS))
+    return counts
+
+
+def write_villes(folder: str):
+    os.makedirs(f"{folder}/External_Data", exist_ok=True)
+    with open(f"{folder}/External_Data/VILLES.csv", "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(["VILLE", "CODEPOSTAL", "LATITUDE", "LONGITUDE", "DEPARTEMENT", "PAYS"])
+        writer.writerows(VILLES_CSV)
+
+
+def generate(folder: str, scale: int = 1, years=None, seed: int = 42) -> dict:
+    export = Export(random.Random(seed))
+    write_villes(folder)
+    return {year: generate_year(export, folder, year, YEAR_SUFFIXES[year], scale)
+            for year in (years or YEAR_SUFFIXES)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic LISE exports under a Bronze Files folder.")
+    parser.add_argument("--out", required=True, help="Bronze Files folder; exports go to <out>/Lise_Data/<year>/")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplier for students, families and invoice runs")
+    parser.add_argument("--years", nargs="*", choices=list(YEAR_SUFFIXES), help="School years to write (default: all)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    for year, counts in generate(args.out, args.scale, args.years, args.seed).items():
+        print(f"{year}: " + ", ".join(f"{name}={rows}" for name, rows in counts.items()))
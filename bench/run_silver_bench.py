@@ -0,0 +1,161 @@
+"""Run NB_BRONZE and NB_SILVER on local Spark against generated LISE data.
+
+The notebooks are executed cell by cell as they are committed, with the
+notebookutils calls served by lise_silver.notebookutils_stub and BRONZE_BASE pointed at a
+local lakehouse folder. Per-stage duration, peak execution memory and shuffle
+bytes are written to bench/results/<commit>_x<scale>.json so two commits can
+be compared with --compare.
+
+Requires pyspark and delta-spark (see requirements.txt) and a local JDK.
+"""
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+import urllib.request
+from datetime import datetime, timezone
+
+from generate_lise_data import generate
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from lise_silver import run_notebook, spark_session
+
+RESULTS_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+COMPARED_METRICS = ["durationSec", "peakExecutionMemory", "shuffleReadBytes", "shuffleWriteBytes"]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def stage_rest(spark, stage_ids: list) -> dict:
+    sc = spark.sparkContext
+    totals = {"peakExecutionMemory": 0, "shuffleReadBytes": 0, "shuffleWriteBytes": 0}
+    for stage_id in stage_ids:
+        url = f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}/stages/{stage_id}?details=true"
+        with urllib.request.urlopen(url, timeout=10) as response:
+            for attempt in json.load(response):
+                peaks = [task.get("taskMetrics", {}).get("peakExecutionMemory", 0)
+                         for task in attempt.get("tasks", {}).values()]
+                totals["peakExecutionMemory"] = max([totals["peakExecutionMemory"], *peaks])
+                totals["shuffleReadBytes"] += attempt.get("shuffleReadBytes", 0)
+                totals["shuffleWriteBytes"] += attempt.get("shuffleWriteBytes", 0)
+    return totals
+
+
+def silver_stages(run: dict) -> list:
+    namespace = run["namespace"]
+    spark = namespace["spark"]
+    tracker = spark.sparkContext.statusTracker()
+    stages = []
+    for record in namespace["stage_records"]:
+        job_ids = sorted(tracker.getJobIdsForGroup(record["group"]))
+        stage_ids = sorted({stage_id for job_id in job_ids if (info := tracker.getJobInfo(job_id)) for stage_id in info.stageIds})
+        stages.append({
+            "stage": record["stage"],
+            "target": record["target"],
+            "status": record["status"],
+            "durationSec": round(record["durationSec"], 3),
+            "rows": record["rows"],
+            **stage_rest(spark, stage_ids)
+        })
+    return stages
+
+
+def run(scale: int, work: str, keep: bool, shuffle_partitions: int) -> dict:
+    bronze = os.path.join(work, "LH_BRONZE.Lakehouse")
+    silver = os.path.join(work, "LH_SILVER.Lakehouse")
+    if os.path.exists(work) and not keep:
+        shutil.rmtree(work)
+    for lakehouse in (bronze, silver):
+        os.makedirs(os.path.join(lakehouse, "Files"), exist_ok=True)
+        os.makedirs(os.path.join(lakehouse, "Tables"), exist_ok=True)
+
+    started = time.perf_counter()
+    generate(os.path.join(bronze, "Files"), scale=scale)
+    generate_sec = time.perf_counter() - started
+
+    bronze_files = os.path.join(bronze, "Files")
+    started = time.perf_counter()
+    spark = spark_session("bench_NB_BRONZE", os.path.join(bronze, "Tables"), shuffle_partitions)
+    bronze_run = run_notebook(spark, "NB_BRONZE", bronze, {"BRONZE_BASE": bronze_files})
+    bronze_sec = time.perf_counter() - started
+    spark.stop()
+
+    started = time.perf_counter()
+    spark = spark_session("bench_NB_SILVER", os.path.join(silver, "Tables"), shuffle_partitions)
+    silver_run = run_notebook(spark, "NB_SILVER", silver, {"BRONZE_BASE": bronze_files,
+                                                           "BRONZE_TABLES": os.path.join(bronze, "Tables")})
+    silver_sec = time.perf_counter() - started
+    stages = silver_stages(silver_run)
+    spark.stop()
+
+    return {
+        "commit": git_commit(),
+        "scale": scale,
+        "run_ts": datetime.now(timezone.utc).isoformat(),
+        "shuffle_partitions": shuffle_partitions,
+        "generate_sec": round(generate_sec, 3),
+        "bronze_sec": round(bronze_sec, 3),
+        "silver_sec": round(silver_sec, 3),
+        "driver_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "bronze_status": (bronze_run["exit"] or {}).get("status"),
+        "silver_status": (silver_run["exit"] or {}).get("status"),
+        "stages": stages
+    }
+
+
+def compare(baseline_path: str, candidate_path: str):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    with open(candidate_path, encoding="utf-8") as f:
+        candidate = json.load(f)
+    before = {(s["stage"], s["target"]): s for s in baseline["stages"]}
+    print(f"{baseline['commit']} -> {candidate['commit']} (scale {candidate['scale']})")
+    print(f"{'stage':<40}" + "".join(f"{m:>24}" for m in COMPARED_METRICS))
+    for stage in candidate["stages"]:
+        key = (stage["stage"], stage["target"])
+        cells = []
+        for metric in COMPARED_METRICS:
+            old, new = before.get(key, {}).get(metric), stage.get(metric)
+            change = f"{(new - old) / old:+.0%}" if old and new is not None else "n/a"
+            cells.append(f"{new} ({change})")
+        print(f"{':'.join(key):<40}" + "".join(f"{c:>24}" for c in cells))
+    print(f"{'total silver_sec':<40}{candidate['silver_sec']:>24} (was {baseline['silver_sec']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=int, default=1, choices=[1, 10, 100])
+    parser.add_argument("--work", default=os.path.join("/tmp", "lise_bench"), help="local lakehouse root")
+    parser.add_argument("--keep", action="store_true", help="reuse existing tables (incremental run)")
+    parser.add_argument("--shuffle-partitions", type=int, default=8)
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CANDIDATE"), help="compare two result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    results = run(args.scale, os.path.abspath(args.work), args.keep, args.shuffle_partitions)
+    os.makedirs(RESULTS_FOLDER, exist_ok=True)
+    target = os.path.join(RESULTS_FOLDER, f"{results['commit']}_x{args.scale}.json")
+    with open(target, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"{len(results['stages'])} stages written to {target}")
+    if results["silver_status"] != "succeeded":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
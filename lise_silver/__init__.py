@@ -0,0 +1,9 @@
+"""Local, Fabric-free access to the LISE Silver transforms.
+
+    from lise_silver import transforms
+    df_classes = transforms.build_classes(transforms.transform_classes(transforms.add_class_rows(df_bronze_classes)))
+
+python -m lise_silver runs whole notebooks or single transforms on local Spark.
+"""
+
+from .runner import STEPS, TransformRunner, run_notebook, spark_session
@@ -0,0 +1,90 @@
+"""Run LISE notebooks or single Silver transforms on local Spark.
+
+    python -m lise_silver notebook NB_BRONZE --work /tmp/lise
+    python -m lise_silver notebook NB_SILVER --work /tmp/lise --param TRIGGER_TYPE='"Local"'
+    python -m lise_silver notebook NB_SILVER --work /tmp/lise --param SCHOOL_YEARS=2024-2025 --param TABLES=fact_factures_eleves
+    python -m lise_silver transform transform_factures_services --work /tmp/lise
+    python -m lise_silver list
+
+--work holds LH_BRONZE.Lakehouse and LH_SILVER.Lakehouse folders, each with
+Files/ and Tables/; bench/generate_lise_data.py fills LH_BRONZE.Lakehouse/Files.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from .runner import STEPS, TransformRunner, run_notebook, spark_session
+
+NOTEBOOK_LAKEHOUSES = {
+    "NB_BRONZE": "LH_BRONZE.Lakehouse",
+    "NB_SILVER": "LH_SILVER.Lakehouse",
+    "NB_SILVER_STREAM": "LH_SILVER.Lakehouse",
+    "NB_PAYROLL": "LH_SILVER.Lakehouse",
+    "NB_BENCH_SILVER": "LH_SILVER.Lakehouse",
+}
+
+
+def parse_param(value: str):
+    name, _, raw = value.partition("=")
+    try:
+        return name, json.loads(raw)
+    except json.JSONDecodeError:
+        return name, raw
+
+
+def lakehouses(work: str) -> tuple:
+    bronze = os.path.join(work, "LH_BRONZE.Lakehouse")
+    silver = os.path.join(work, "LH_SILVER.Lakehouse")
+    for lakehouse in (bronze, silver):
+        os.makedirs(os.path.join(lakehouse, "Files"), exist_ok=True)
+        os.makedirs(os.path.join(lakehouse, "Tables"), exist_ok=True)
+    return bronze, silver
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m lise_silver", description=__doc__.splitlines()[0])
+    parser.add_argument("--work", default="/tmp/lise", help="folder holding the local lakehouses")
+    parser.add_argument("--shuffle-partitions", type=int, default=8)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    notebook = commands.add_parser("notebook", help="run a notebook cell by cell")
+    notebook.add_argument("name", choices=sorted(NOTEBOOK_LAKEHOUSES))
+    notebook.add_argument("--param", action="append", default=[], type=parse_param, metavar="NAME=JSON",
+                          help="override a parameters cell value")
+
+    transform = commands.add_parser("transform", help="time one transform with its inputs materialized")
+    transform.add_argument("names", nargs="+", choices=sorted(STEPS), metavar="NAME")
+    transform.add_argument("--out", help="write the results as Delta tables under this folder")
+    transform.add_argument("--no-materialize", action="store_true", help="time the transform with its whole lineage")
+
+    commands.add_parser("list", help="list the transforms and their inputs")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name, inputs in STEPS.items():
+            print(f"{name:<32} {', '.join(inputs)}")
+        return
+
+    bronze, silver = lakehouses(os.path.abspath(args.work))
+    lakehouse = silver if args.command == "transform" else os.path.join(args.work, NOTEBOOK_LAKEHOUSES[args.name])
+    spark = spark_session(f"lise_{args.command}", os.path.join(os.path.abspath(lakehouse), "Tables"), args.shuffle_partitions)
+    try:
+        if args.command == "notebook":
+            overrides = {"BRONZE_BASE": os.path.join(bronze, "Files"), "BRONZE_TABLES": os.path.join(bronze, "Tables")}
+            overrides.update(dict(args.param))
+            result = run_notebook(spark, args.name, os.path.abspath(lakehouse), overrides)
+            print(json.dumps(result["exit"], indent=2, default=str))
+            if (result["exit"] or {}).get("status", "succeeded") != "succeeded":
+                sys.exit(1)
+        else:
+            runner = TransformRunner(spark, bronze)
+            for name in args.names:
+                print(json.dumps(runner.time(name, materialize_inputs=not args.no_materialize, output=args.out)))
+    finally:
+        spark.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Reading Fabric notebook-content.py sources outside Fabric."""
+
+import os
+import re
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOTEBOOK_FOLDERS = [os.path.join(REPO_ROOT, "school-dev", folder) for folder in ("Ingestion", "Transformation")]
+CELL_MARKER = "# CELL ********************"
+METADATA_MARKER = "# METADATA ********************"
+RUN_MAGIC = re.compile(r"^%run\s+(\S+)\s*$", re.M)
+
+
+def notebook_path(name: str) -> str:
+    for folder in NOTEBOOK_FOLDERS:
+        path = os.path.join(folder, f"{name}.Notebook", "notebook-content.py")
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"Notebook {name} not found under {NOTEBOOK_FOLDERS}")
+
+
+def notebook_cells(name: str) -> list:
+    """Code cells of a notebook, with %run cells replaced by the referenced notebook's cells."""
+    with open(notebook_path(name), encoding="utf-8") as f:
+        content = f.read()
+    cells = []
+    for chunk in content.split(CELL_MARKER)[1:]:
+        code = chunk.split(METADATA_MARKER)[0].strip("\n")
+        run = RUN_MAGIC.match(code)
+        if run:
+            cells.extend(notebook_cells(run.group(1)))
+        else:
+            cells.append(code)
+    return cells
+
+
+def exec_notebook(name: str, namespace: dict):
+    for index, code in enumerate(notebook_cells(name)):
+        exec(compile(code, f"{name}[cell {index}]", "exec"), namespace)
@@ -0,0 +1,100 @@
+"""Local stand-in for the parts of Fabric's notebookutils the LISE notebooks call.
+
+Paths relative to the default lakehouse ("Files/...") resolve under a local
+lakehouse folder, file: URIs and absolute paths are used as they are.
+"""
+
+import os
+import shutil
+import sys
+import types
+from collections import namedtuple
+
+FileInfo = namedtuple("FileInfo", ["name", "path", "size", "isDir", "isFile", "modifyTime"])
+
+
+class NotebookExit(Exception):
+    def __init__(self, value):
+        super().__init__(value)
+        self.value = value
+
+
+class LocalFs:
+    def __init__(self, lakehouse_root: str):
+        self.lakehouse_root = lakehouse_root
+
+    def local(self, path: str) -> str:
+        if path.startswith("file:"):
+            return path[len("file:"):].replace("///", "/", 1) if path.startswith("file:///") else path[len("file:"):]
+        if os.path.isabs(path):
+            return path
+        return os.path.join(self.lakehouse_root, path)
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(self.local(path))
+
+    def head(self, path: str, max_bytes: int = 65536) -> str:
+        with open(self.local(path), "rb") as f:
+            return f.read(max_bytes).decode("utf-8")
+
+    def put(self, path: str, content: str, overwrite: bool = False) -> bool:
+        target = self.local(path)
+        if os.path.exists(target) and not overwrite:
+            raise FileExistsError(target)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "w", encoding="utf-8") as f:
+            f.write(content)
+        return True
+
+    def mkdirs(self, path: str) -> bool:
+        os.makedirs(self.local(path), exist_ok=True)
+        return True
+
+    def ls(self, path: str) -> list:
+        target = self.local(path)
+        entries = [target] if os.path.isfile(target) else [os.path.join(target, name) for name in sorted(os.listdir(target))]
+        return [FileInfo(os.path.basename(entry), f"file:{entry}", os.path.getsize(entry), os.path.isdir(entry),
+                         os.path.isfile(entry), int(os.path.getmtime(entry) * 1000))
+                for entry in entries]
+
+    def cp(self, source: str, target: str, recurse: bool = False) -> bool:
+        if recurse and os.path.isdir(self.local(source)):
+            shutil.copytree(self.local(source), self.local(target), dirs_exist_ok=True)
+        else:
+            shutil.copyfile(self.local(source), self.local(target))
+        return True
+
+    def rm(self, path: str, recurse: bool = False) -> bool:
+        target = self.local(path)
+        if os.path.isdir(target) and recurse:
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+        return True
+
+
+class LocalNotebook:
+    def __init__(self, runner=None):
+        self.runner = runner
+
+    def exit(self, value):
+        raise NotebookExit(value)
+
+    def run(self, name: str, timeout_seconds: int = 90, arguments: dict = None) -> str:
+        if self.runner is None:
+            raise NotImplementedError("notebook.run needs a runner, see lise_silver.runner.run_notebook")
+        return self.runner(name, arguments or {})
+
+
+def install(lakehouse_root: str, runner=None):
+    """Register a notebookutils module whose mssparkutils works on lakehouse_root.
+
+    runner(name, arguments) serves notebook.run and returns the child's exit value.
+    """
+    mssparkutils = types.SimpleNamespace(fs=LocalFs(lakehouse_root), notebook=LocalNotebook(runner))
+    module = types.ModuleType("notebookutils")
+    module.mssparkutils = mssparkutils
+    module.fs = mssparkutils.fs
+    module.notebook = mssparkutils.notebook
+    sys.modules["notebookutils"] = module
+    return mssparkutils
@@ -0,0 +1,153 @@
+"""Local Spark execution of the LISE notebooks and of single Silver transforms.
+
+A local lakehouse is a folder with Files/ and Tables/ like the OneLake item:
+NB_BRONZE writes its tables under LH_BRONZE.Lakehouse/Tables and NB_SILVER
+reads them from there through BRONZE_TABLES.
+"""
+
+import builtins
+import json
+import os
+import re
+import time
+
+from . import notebookutils_stub
+from .notebook import notebook_cells
+
+# Inputs of each transform, in argument order: "spark", a Bronze table ("bronze:<dataset>"),
+# the VILLES reference file or another transform
+STEPS = {
+    "build_services": ["spark"],
+    "build_service_codes": ["spark"],
+    "build_regimes": ["spark"],
+    "build_dates": ["spark"],
+    "build_school_years": ["spark"],
+    "add_class_rows": ["bronze:classes"],
+    "transform_villes": ["csv:villes"],
+    "transform_etablissements": ["bronze:etablissements"],
+    "transform_niveaux": ["bronze:niveaux"],
+    "transform_classes": ["add_class_rows"],
+    "build_classes": ["transform_classes"],
+    "build_classes_targets": ["transform_classes"],
+    "transform_foyers": ["bronze:foyers", "transform_villes"],
+    "transform_professions": ["bronze:professions"],
+    "transform_pays": ["bronze:pays"],
+    "transform_personnels": ["bronze:personnels"],
+    "build_staff": ["transform_personnels"],
+    "build_personnels": ["transform_personnels", "transform_pays"],
+    "transform_professeurs": ["bronze:professeurs", "build_classes"],
+    "transform_responsables": ["bronze:responsables", "transform_foyers"],
+    "build_parents": ["transform_responsables"],
+    "transform_ecoliers": ["bronze:eleves", "bronze:factures_eleves", "build_classes", "build_regimes"],
+    "build_enfants": ["transform_ecoliers"],
+    "transform_factures_familles": ["bronze:factures_familles", "transform_responsables"],
+    "transform_factures_eleves": ["bronze:factures_eleves", "transform_factures_familles"],
+    "transform_factures_services": ["bronze:factures_services", "build_service_codes", "transform_factures_eleves"],
+    "unmapped_service_codes": ["bronze:factures_services", "build_service_codes"],
+    "transform_factures_niveaux": ["bronze:factures_niveaux", "transform_niveaux"],
+    "transform_factures_validations": ["bronze:factures_validations", "transform_factures_familles"],
+}
+
+
+def spark_session(name: str, warehouse: str, shuffle_partitions: int = 8):
+    from pyspark.sql import SparkSession
+    from delta import configure_spark_with_delta_pip
+
+    builder = SparkSession.builder.appName(name).master(os.environ.get("LISE_SPARK_MASTER", "local[*]")) \
+        .config("spark.sql.extensions", "io.delta.sql.DeltaSparkSessionExtension") \
+        .config("spark.sql.catalog.spark_catalog", "org.apache.spark.sql.delta.catalog.DeltaCatalog") \
+        .config("spark.sql.warehouse.dir", warehouse) \
+        .config("spark.sql.shuffle.partitions", str(shuffle_partitions)) \
+        .config("spark.driver.memory", os.environ.get("LISE_DRIVER_MEMORY", "4g"))
+    return configure_spark_with_delta_pip(builder).getOrCreate()
+
+
+def run_notebook(spark, name: str, lakehouse: str, overrides: dict) -> dict:
+    """Run a notebook with lakehouse as its default lakehouse; returns its namespace and exit value.
+
+    overrides are re-applied after every cell assigning one of them, so they
+    replace the parameters cell values the way pipeline parameters do. notebook.run
+    calls run the child notebook the same way, on the same lakehouse.
+    """
+    def run_child(child: str, arguments: dict) -> str:
+        child_exit = run_notebook(spark, child, lakehouse, {**overrides, **arguments})["exit"]
+        notebookutils_stub.install(lakehouse, run_child)
+        return json.dumps(child_exit) if child_exit is not None else ""
+
+    notebookutils_stub.install(lakehouse, run_child)
+    # The notebooks call __builtins__.max and friends, which needs the module rather than exec's default dict
+    namespace = {"__name__": f"lise_{name}", "__builtins__": builtins, "spark": spark,
+                 "display": lambda df, *a, **k: df.show(20, False)}
+    exit_value = None
+    cwd = os.getcwd()
+    os.chdir(lakehouse)
+    try:
+        for index, code in enumerate(notebook_cells(name)):
+            started = time.perf_counter()
+            try:
+                exec(compile(code, f"{name}[cell {index}]", "exec"), namespace)
+            except notebookutils_stub.NotebookExit as e:
+                exit_value = e.value
+                break
+            finally:
+                if any(re.search(rf"^{key}\s*=", code, re.M) for key in overrides):
+                    namespace.update(overrides)
+            print(f"{name} cell {index}: {time.perf_counter() - started:.2f}s")
+    finally:
+        os.chdir(cwd)
+    return {"namespace": namespace, "exit": json.loads(exit_value) if exit_value else None}
+
+
+class TransformRunner:
+    """Resolves a transform's inputs from a local Bronze lakehouse, reusing frames across calls."""
+
+    def __init__(self, spark, bronze_lakehouse: str):
+        from . import transforms
+        self.spark = spark
+        self.bronze_lakehouse = bronze_lakehouse
+        self.transforms = transforms
+        self.frames = {}
+
+    def source(self, name: str):
+        if name == "spark":
+            return self.spark
+        if name not in self.frames:
+            if name.startswith("bronze:"):
+                path = os.path.join(self.bronze_lakehouse, "Tables", f"bronze_{name.split(':', 1)[1]}")
+                df = self.spark.read.format("delta").load(path)
+            elif name == "csv:villes":
+                path = os.path.join(self.bronze_lakehouse, "Files", "External_Data", "VILLES.csv")
+                df = self.spark.read.csv(path, schema=self.transforms.villes_schema, header=True, sep=",", encoding="UTF-8")
+            else:
+                df = self.build(name)
+            self.frames[name] = df
+        return self.frames[name]
+
+    def inputs(self, name: str) -> list:
+        if name not in STEPS:
+            raise KeyError(f"Unknown transform {name}; expected one of {sorted(STEPS)}")
+        return [self.source(input_name) for input_name in STEPS[name]]
+
+    def build(self, name: str):
+        return getattr(self.transforms, name)(*self.inputs(name))
+
+    def time(self, name: str, materialize_inputs: bool = True, output: str = None) -> dict:
+        """Time one transform; its inputs are persisted first so only its own work is measured."""
+        inputs = self.inputs(name)
+        if materialize_inputs:
+            for index, input_name in enumerate(STEPS[name]):
+                if input_name != "spark":
+                    inputs[index] = inputs[index].persist()
+                    inputs[index].count()
+        df = getattr(self.transforms, name)(*inputs)
+        started = time.perf_counter()
+        if output:
+            df.write.mode("overwrite").format("delta").save(os.path.join(output, name))
+        else:
+            df.write.format("noop").mode("overwrite").save()
+        elapsed = time.perf_counter() - started
+        result = {"transform": name, "inputs": STEPS[name], "durationSec": round(elapsed, 3), "rows": df.count()}
+        for frame in inputs:
+            if frame is not self.spark:
+                frame.unpersist()
+        return result
@@ -0,0 +1,9 @@
+"""The Silver transforms from NB_SILVER_TRANSFORMS, importable outside Fabric.
+
+The notebook stays the single source: its cells are executed into this
+module's namespace on import, exactly as NB_SILVER's %run does in Fabric.
+"""
+
+from .notebook import exec_notebook
+
+exec_notebook("NB_SILVER_TRANSFORMS", globals())
@@ -1,4 +1,7 @@
 CREATE   PROCEDURE LISE.sp_UpdateInsertData
+    @RunID VARCHAR(100) = NULL,
+    @BatchID VARCHAR(50) = NULL,
+    @TriggerType VARCHAR(50) = NULL
 AS
 BEGIN
   SET NOCOUNT ON;
@@ -36,8 +39,9 @@ BEGIN
     FROM LISE.Classes AS LC
     INNER JOIN LISE.Staging_Classes AS LSC
       ON LC.ClasseID = LSC.IDCLASSE
-    WHERE ISNULL(LC.Classe, '') <> ISNULL(LSC.CLASSE, '')
-      OR ISNULL(LC.ClasseLibelle, '') <> ISNULL(LSC.CLASSELIBELLE, '')
+    WHERE LSC.OPERATION = 'U'
+      AND (ISNULL(LC.Classe, '') <> ISNULL(LSC.CLASSE, '')
+        OR ISNULL(LC.ClasseLibelle, '') <> ISNULL(LSC.CLASSELIBELLE, ''))
     ;
     SET @uclasses = @@ROWCOUNT;
 
@@ -60,10 +64,11 @@ BEGIN
     FROM LISE.ClassesTargets AS LCT 
     INNER JOIN LISE.Staging_ClassesTargets AS LSCT
       ON LCT.ClasseKey = LSCT.KEYCLASSE
-    WHERE ISNULL(LCT.ClasseID, '') <> ISNULL(LSCT.IDCLASSE, '')
-      OR ISNULL(LCT.TargetCount, 0) <> ISNULL(LSCT.TARGETCOUNT, 0)
-      OR ISNULL(LCT.MaximumCount, 0) <> ISNULL(LSCT.MAXIMUMCOUNT, 0)
-      OR ISNULL(LCT.SchoolYear, '') <> ISNULL(LSCT.SCHOOLYEAR, '')
+    WHERE LSCT.OPERATION = 'U'
+      AND (ISNULL(LCT.ClasseID, '') <> ISNULL(LSCT.IDCLASSE, '')
+        OR ISNULL(LCT.TargetCount, 0) <> ISNULL(LSCT.TARGETCOUNT, 0)
+        OR ISNULL(LCT.MaximumCount, 0) <> ISNULL(LSCT.MAXIMUMCOUNT, 0)
+        OR ISNULL(LCT.SchoolYear, '') <> ISNULL(LSCT.SCHOOLYEAR, ''))
     ;
     SET @utargets = @@ROWCOUNT;
     
@@ -87,10 +92,11 @@ BEGIN
     FROM LISE.Eleves AS LE
     INNER JOIN LISE.Staging_Eleves AS LSE
       ON LE.EleveKey = LSE.KEYELEVE
-    WHERE ISNULL(LE.EleveID, '') <> ISNULL(LSE.IDELEVE, '')
-       OR ISNULL(LE.ResponsableID, '') <> ISNULL(LSE.IDRESPONSABLE, '')
-       OR ISNULL(LE.DateEntree, '') <> ISNULL(LSE.DATEENTREE, '')
-       OR ISNULL(LE.DateSortie, '') <> ISNULL(LSE.DATESORTIE, '')
+    WHERE LSE.OPERATION = 'U'
+      AND (ISNULL(LE.EleveID, '') <> ISNULL(LSE.IDELEVE, '')
+         OR ISNULL(LE.ResponsableID, '') <> ISNULL(LSE.IDRESPONSABLE, '')
+         OR ISNULL(LE.DateEntree, '') <> ISNULL(LSE.DATEENTREE, '')
+         OR ISNULL(LE.DateSortie, '') <> ISNULL(LSE.DATESORTIE, ''))
     ;
     SET @ueleves = @@ROWCOUNT;
 
@@ -111,7 +117,8 @@ BEGIN
     FROM LISE.Professions AS LP
     INNER JOIN LISE.Staging_Professions AS LSP
       ON LP.ProfessionID = LSP.IDPROFESSION
-    WHERE ISNULL(LP.Profession, '') <> ISNULL(LSP.PROFESSION, '')
+    WHERE LSP.OPERATION = 'U'
+      AND (ISNULL(LP.Profession, '') <> ISNULL(LSP.PROFESSION, ''))
     ;
     SET @uprofessions = @@ROWCOUNT;
 
@@ -131,8 +138,9 @@ BEGIN
     FROM LISE.Pays AS LPAY
     INNER JOIN LISE.Staging_Pays AS LSPAY
     ON LPAY.PaysID = LSPAY.IDPAYS
-    WHERE ISNULL(LPAY.Pays, '') <> ISNULL(LSPAY.PAYS, '')
-      OR ISNULL(LPAY.Nationalite, '') <> ISNULL(LSPAY.NATIONALITE, '')
+    WHERE LSPAY.OPERATION = 'U'
+      AND (ISNULL(LPAY.Pays, '') <> ISNULL(LSPAY.PAYS, '')
+        OR ISNULL(LPAY.Nationalite, '') <> ISNULL(LSPAY.NATIONALITE, ''))
     ;
     SET @upays = @@ROWCOUNT;
 
@@ -158,14 +166,15 @@ BEGIN
     FROM LISE.Staff AS LST 
     INNER JOIN LISE.Staging_Staff AS LSST
     ON LST.PersonnelKey = LSST.KEYPERSONNEL
-    WHERE ISNULL(LST.PersonnelID, '') <> ISNULL(LSST.IDPERSONNEL, '')
-       OR ISNULL(LST.Ville, '') <> ISNULL(LSST.VILLE, '')
-       OR ISNULL(LST.DateEntree, '') <> ISNULL(LSST.DATEENTREE, '')
-       OR ISNULL(LST.DateSortie, '') <> ISNULL(LSST.DATESORTIE, '')
-       OR ISNULL(LST.Telephone, '') <> ISNULL(LSST.TELEPHONE, '')
-       OR ISNULL(LST.Email, '') <> ISNULL(LSST.EMAIL, '')
-       OR ISNULL(LST.DateNaissance, '') <> ISNULL(LSST.DATENAISSANCE, '')
-       OR ISNULL(LST.Age, -1) <> ISNULL(LSST.AGE, -1)
+    WHERE LSST.OPERATION = 'U'
+      AND (ISNULL(LST.PersonnelID, '') <> ISNULL(LSST.IDPERSONNEL, '')
+         OR ISNULL(LST.Ville, '') <> ISNULL(LSST.VILLE, '')
+         OR ISNULL(LST.DateEntree, '') <> ISNULL(LSST.DATEENTREE, '')
+         OR ISNULL(LST.DateSortie, '') <> ISNULL(LSST.DATESORTIE, '')
+         OR ISNULL(LST.Telephone, '') <> ISNULL(LSST.TELEPHONE, '')
+         OR ISNULL(LST.Email, '') <> ISNULL(LSST.EMAIL, '')
+         OR ISNULL(LST.DateNaissance, '') <> ISNULL(LSST.DATENAISSANCE, '')
+         OR ISNULL(LST.Age, -1) <> ISNULL(LSST.AGE, -1))
     ;
     SET @ustaff = @@ROWCOUNT;
 
@@ -187,10 +196,11 @@ BEGIN
     FROM LISE.Personnels AS LPS
     INNER JOIN LISE.Staging_Personnels AS LSPS
     ON LPS.PersonnelID = LSPS.IDPERSONNEL
-    WHERE ISNULL(LPS.Nom, '') <> ISNULL(LSPS.NOM, '')
-          OR ISNULL(LPS.Prenom, '') <> ISNULL(LSPS.PRENOM, '')
-          OR ISNULL(LPS.Nationalite, '') <> ISNULL(LSPS.NATIONALITE, '')
-          OR ISNULL(LPS.Badge, '') <> ISNULL(LSPS.BADGE, '')
+    WHERE LSPS.OPERATION = 'U'
+      AND (ISNULL(LPS.Nom, '') <> ISNULL(LSPS.NOM, '')
+            OR ISNULL(LPS.Prenom, '') <> ISNULL(LSPS.PRENOM, '')
+            OR ISNULL(LPS.Nationalite, '') <> ISNULL(LSPS.NATIONALITE, '')
+            OR ISNULL(LPS.Badge, '') <> ISNULL(LSPS.BADGE, ''))
     ;
     SET @upersonnels = @@ROWCOUNT;
 
@@ -210,8 +220,9 @@ BEGIN
     FROM LISE.Professeurs AS LPR 
     INNER JOIN LISE.Staging_Professeurs AS LSPR
       ON LPR.ProfesseurID = LSPR.IDPROFESSEUR
-    WHERE ISNULL(LPR.PersonnelID, '') <> ISNULL(LSPR.IDPERSONNEL, '')
-          OR ISNULL(LPR.ClasseID, '') <> ISNULL(LSPR.IDCLASSE, '')
+    WHERE LSPR.OPERATION = 'U'
+      AND (ISNULL(LPR.PersonnelID, '') <> ISNULL(LSPR.IDPERSONNEL, '')
+            OR ISNULL(LPR.ClasseID, '') <> ISNULL(LSPR.IDCLASSE, ''))
     ;
     SET @uprofesseurs = @@ROWCOUNT;
 
@@ -237,7 +248,8 @@ BEGIN
     FROM LISE.Responsables AS LR
     INNER JOIN LISE.Staging_Responsables AS LSR
       ON LR.ResponsableKey = LSR.KEYRESPONSABLE
-    WHERE ISNULL(LR.ResponsableID, '') <> ISNULL(LSR.IDRESPONSABLE, '')
+    WHERE LSR.OPERATION = 'U'
+      AND (ISNULL(LR.ResponsableID, '') <> ISNULL(LSR.IDRESPONSABLE, ''))
     ;
     SET @uresponsables = @@ROWCOUNT;
 
@@ -259,7 +271,8 @@ BEGIN
     FROM LISE.Niveaux AS LN
     INNER JOIN LISE.Staging_Niveaux AS LSN
       ON LN.NiveauID = LSN.IDNIVEAU
-    WHERE ISNULL(LN.Niveau, '') <> ISNULL(LSN.NIVEAU, '')
+    WHERE LSN.OPERATION = 'U'
+      AND (ISNULL(LN.Niveau, '') <> ISNULL(LSN.NIVEAU, ''))
     ;
     SET @univeaux = @@ROWCOUNT;
 
@@ -281,7 +294,8 @@ BEGIN
     FROM LISE.Etablissements AS LET
     INNER JOIN LISE.Staging_Etablissements AS LSET
       ON LET.EtablissementID = LSET.IDETABLISSEMENT
-    WHERE ISNULL(LET.Etablissement, '') <> ISNULL(LSET.ETABLISSEMENT, '')
+    WHERE LSET.OPERATION = 'U'
+      AND (ISNULL(LET.Etablissement, '') <> ISNULL(LSET.ETABLISSEMENT, ''))
     ;
     SET @uetablissements = @@ROWCOUNT;
 
@@ -303,7 +317,8 @@ BEGIN
     FROM LISE.Regimes AS LREG
     INNER JOIN LISE.Staging_Regimes AS LSREG
       ON LREG.RegimeID = LSREG.IDREGIME
-    WHERE ISNULL(LREG.Regime, '') <> ISNULL(LSREG.REGIME, '')
+    WHERE LSREG.OPERATION = 'U'
+      AND (ISNULL(LREG.Regime, '') <> ISNULL(LSREG.REGIME, ''))
     ;
     SET @uregimes = @@ROWCOUNT;
 
@@ -326,9 +341,10 @@ BEGIN
     FROM LISE.Parents AS LPA 
     INNER JOIN LISE.Staging_Parents AS LSPA
       ON LPA.ResponsableID = LSPA.IDRESPONSABLE
-    WHERE ISNULL(LPA.Nom, '') <> ISNULL(LSPA.NOM, '')
-      OR ISNULL(LPA.Prenom, '') <> ISNULL(LSPA.PRENOM, '')
-      OR ISNULL(LPA.FullName, '') <> ISNULL(LSPA.FULLNAME, '')
+    WHERE LSPA.OPERATION = 'U'
+      AND (ISNULL(LPA.Nom, '') <> ISNULL(LSPA.NOM, '')
+        OR ISNULL(LPA.Prenom, '') <> ISNULL(LSPA.PRENOM, '')
+        OR ISNULL(LPA.FullName, '') <> ISNULL(LSPA.FULLNAME, ''))
     ;
     SET @uparents = @@ROWCOUNT;
 
@@ -356,14 +372,15 @@ BEGIN
     FROM LISE.Enfants AS LEN
     INNER JOIN LISE.Staging_Enfants AS LSEN 
       ON LEN.EleveID = LSEN.IDELEVE
-    WHERE ISNULL(LEN.Nom, '') <> ISNULL(LSEN.NOM, '')
-      OR ISNULL(LEN.Prenom, '') <> ISNULL(LSEN.PRENOM, '')
-      OR ISNULL(LEN.Sexe, '') <> ISNULL(LSEN.SEXE, '')
-      OR ISNULL(LEN.DateNaissance, '') <> ISNULL(LSEN.DATENAISSANCE, '')
-      OR ISNULL(LEN.Age, '') <> ISNULL(LSEN.AGE, '')
-      OR ISNULL(LEN.Nationalite, '') <> ISNULL(LSEN.NATIONALITE, '')
-      OR ISNULL(LEN.IdentiteNationale, '') <> ISNULL(LSEN.IDENTITENATIONALE, '')
-      OR ISNULL(LEN.FullName, '') <> ISNULL(LSEN.FULLNAME, '')
+    WHERE LSEN.OPERATION = 'U'
+      AND (ISNULL(LEN.Nom, '') <> ISNULL(LSEN.NOM, '')
+        OR ISNULL(LEN.Prenom, '') <> ISNULL(LSEN.PRENOM, '')
+        OR ISNULL(LEN.Sexe, '') <> ISNULL(LSEN.SEXE, '')
+        OR ISNULL(LEN.DateNaissance, '') <> ISNULL(LSEN.DATENAISSANCE, '')
+        OR ISNULL(LEN.Age, '') <> ISNULL(LSEN.AGE, '')
+        OR ISNULL(LEN.Nationalite, '') <> ISNULL(LSEN.NATIONALITE, '')
+        OR ISNULL(LEN.IdentiteNationale, '') <> ISNULL(LSEN.IDENTITENATIONALE, '')
+        OR ISNULL(LEN.FullName, '') <> ISNULL(LSEN.FULLNAME, ''))
     ;
     SET @uenfants = @@ROWCOUNT;
 
@@ -381,11 +398,14 @@ BEGIN
 
     UPDATE LF 
     SET
-      LF.Ville = LSF.VILLE
+      LF.Ville = LSF.VILLE,
+      LF.VilleID = LSF.IDVILLE
     FROM LISE.Foyers AS LF
     INNER JOIN LISE.Staging_Foyers AS LSF
       ON LF.FoyerID = LSF.IDFOYER
-    WHERE ISNULL(LF.Ville, '') <> ISNULL(LSF.VILLE, '')
+    WHERE LSF.OPERATION = 'U'
+      AND (ISNULL(LF.Ville, '') <> ISNULL(LSF.VILLE, '')
+        OR ISNULL(LF.VilleID, -1) <> ISNULL(LSF.IDVILLE, -1))
     ;
     SET @ufoyers = @@ROWCOUNT;
 
@@ -406,7 +426,8 @@ BEGIN
     FROM LISE.Services AS LS 
     INNER JOIN LISE.Staging_Services AS LSS
       ON LS.ServiceID = LSS.IDSERVICE
-    WHERE ISNULL(LS.Service, '') <> ISNULL(LSS.SERVICE, '')
+    WHERE LSS.OPERATION = 'U'
+      AND (ISNULL(LS.Service, '') <> ISNULL(LSS.SERVICE, ''))
     ;
     SET @uservices = @@ROWCOUNT;
 
@@ -432,12 +453,13 @@ BEGIN
     FROM LISE.Villes AS LV
     INNER JOIN LISE.Staging_Villes AS LSV
       ON LV.VilleID = LSV.IDVILLE
-    WHERE ISNULL(LV.Ville, '') <> ISNULL(LSV.VILLE, '')
-      OR ISNULL(LV.CodePostal, '') <> ISNULL(LSV.CODEPOSTAL, '')
-      OR ISNULL(LV.Latitude, '') <> ISNULL(LSV.LATITUDE, '')
-      OR ISNULL(LV.Longitude, '') <> ISNULL(LSV.LONGITUDE, '')
-      OR ISNULL(LV.Departement, '') <> ISNULL(LSV.DEPARTEMENT, '')
-      OR ISNULL(LV.Pays, '') <> ISNULL(LSV.PAYS, '')
+    WHERE LSV.OPERATION = 'U'
+      AND (ISNULL(LV.Ville, '') <> ISNULL(LSV.VILLE, '')
+        OR ISNULL(LV.CodePostal, '') <> ISNULL(LSV.CODEPOSTAL, '')
+        OR ISNULL(LV.Latitude, '') <> ISNULL(LSV.LATITUDE, '')
+        OR ISNULL(LV.Longitude, '') <> ISNULL(LSV.LONGITUDE, '')
+        OR ISNULL(LV.Departement, '') <> ISNULL(LSV.DEPARTEMENT, '')
+        OR ISNULL(LV.Pays, '') <> ISNULL(LSV.PAYS, ''))
     ;
     SET @uvilles = @@ROWCOUNT;
     
@@ -457,7 +479,8 @@ BEGIN
     FROM LISE.SchoolYears AS LY 
     INNER JOIN LISE.Staging_SchoolYears AS LSY
       ON LY.SchoolYear = LSY.SCHOOLYEAR
-    WHERE ISNULL(LY.SchoolYearLibelle, '') <> ISNULL(LSY.SCHOOLYEARLIBELLE, '')
+    WHERE LSY.OPERATION = 'U'
+      AND (ISNULL(LY.SchoolYearLibelle, '') <> ISNULL(LSY.SCHOOLYEARLIBELLE, ''))
     ;
     SET @uschoolyear = @@ROWCOUNT;
 
@@ -585,6 +608,45 @@ BEGIN
     COALESCE(@idates,0) + COALESCE(@ifac_services,0) + COALESCE(@ifac_niveaux,0) + COALESCE(@ifac_eleves,0) +
     COALESCE(@ifac_familles,0) + COALESCE(@ifac_validations,0);
 
+  IF @RunID IS NOT NULL
+  BEGIN
+    INSERT INTO LISE.IngestionLogs (
+      IngestionID, PipelineName, Layer, TargetObject, Status, FinishedAtUTC,
+      WatermarkBefore, WatermarkAfter, RowsWritten, ErrorMessage, RunID, BatchID,
+      TriggerType, BytesWritten, FilesWritten, DurationSec, ThroughputMBps)
+    SELECT NEWID(), 'PL_GOLD', 'Gold', c.TargetObject, 'Succeeded', CAST(SYSUTCDATETIME() AS DATETIME2(3)),
+      NULL, NULL, c.RowsWritten, NULL, @RunID, LEFT(@BatchID, 50),
+      @TriggerType, NULL, NULL, NULL, NULL
+    FROM (VALUES
+      ('update:Classes', @uclasses), ('insert:Classes', @iclasses),
+      ('update:ClassesTargets', @utargets), ('insert:ClassesTargets', @itargets),
+      ('update:Eleves', @ueleves), ('insert:Eleves', @ieleves),
+      ('update:Professions', @uprofessions), ('insert:Professions', @iprofessions),
+      ('update:Pays', @upays), ('insert:Pays', @ipays),
+      ('update:Staff', @ustaff), ('insert:Staff', @istaff),
+      ('update:Personnels', @upersonnels), ('insert:Personnels', @ipersonnels),
+      ('update:Professeurs', @uprofesseurs), ('insert:Professeurs', @iprofesseurs),
+      ('update:Responsables', @uresponsables), ('insert:Responsables', @iresponsables),
+      ('update:Niveaux', @univeaux), ('insert:Niveaux', @iniveaux),
+      ('update:Etablissements', @uetablissements), ('insert:Etablissements', @ietablissements),
+      ('update:Regimes', @uregimes), ('insert:Regimes', @iregimes),
+      ('update:Parents', @uparents), ('insert:Parents', @iparents),
+      ('update:Enfants', @uenfants), ('insert:Enfants', @ienfants),
+      ('update:Foyers', @ufoyers), ('insert:Foyers', @ifoyers),
+      ('update:Services', @uservices), ('insert:Services', @iservices),
+      ('update:Villes', @uvilles), ('insert:Villes', @ivilles),
+      ('update:SchoolYears', @uschoolyear), ('insert:SchoolYears', @ischoolyear),
+      ('insert:Dates', @idates),
+      ('insert:FacturesServices', @ifac_services),
+      ('insert:FacturesNiveaux', @ifac_niveaux),
+      ('insert:FacturesEleves', @ifac_eleves),
+      ('insert:FacturesFamilles', @ifac_familles),
+      ('insert:FacturesValidations', @ifac_validations)
+    ) AS c (TargetObject, RowsWritten)
+    WHERE c.RowsWritten > 0
+    ;
+  END;
+
   SELECT
     RowsUpdated_Classes = @uclasses,
     RowsInserted_Classes = @iclasses,
@@ -0,0 +1,45 @@
+CREATE PROCEDURE LISE.spc_remap_villes
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    -- One-off migration, run by hand once the hashed IDs have reached Gold: EXEC LISE.spc_remap_villes;
+    -- dim_villes moved from row_number IDs to hash_key(VILLE): re-point Foyers and replace the
+    -- Villes rows still under their old ID.
+    IF NOT EXISTS (
+      SELECT 1
+      FROM LISE.Villes AS LV
+      INNER JOIN LH_SILVER.dbo.dim_villes AS DV
+        ON DV.VILLE = LV.Ville
+      WHERE DV.IDVILLE <> LV.VilleID)
+    BEGIN
+      PRINT 'LISE.Villes already carries the Silver IDs, nothing to remap';
+      RETURN;
+    END
+
+    UPDATE LF
+    SET LF.VilleID = DF.IDVILLE
+    FROM LISE.Foyers AS LF
+    INNER JOIN LH_SILVER.dbo.dim_foyers AS DF
+      ON LF.FoyerID = DF.IDFOYER
+    WHERE ISNULL(LF.VilleID, -1) <> ISNULL(DF.IDVILLE, -1)
+    ;
+
+    INSERT INTO LISE.Villes (VilleID, Ville, CodePostal, Latitude, Longitude, Departement, Pays)
+    SELECT DV.IDVILLE, DV.VILLE, DV.CODEPOSTAL, DV.LATITUDE, DV.LONGITUDE, DV.DEPARTEMENT, DV.PAYS
+    FROM LH_SILVER.dbo.dim_villes AS DV
+    WHERE NOT EXISTS (
+      SELECT 1
+      FROM LISE.Villes AS LV
+      WHERE LV.VilleID = DV.IDVILLE)
+    ;
+
+    DELETE FROM LISE.Villes
+    WHERE VilleID IN (
+      SELECT LV.VilleID
+      FROM LISE.Villes AS LV
+      INNER JOIN LH_SILVER.dbo.dim_villes AS DV
+        ON DV.VILLE = LV.Ville
+      WHERE DV.IDVILLE <> LV.VilleID)
+    ;
+END
\ No newline at end of file
@@ -1,32 +1,67 @@
 CREATE PROCEDURE LISE.spc_upsert_payroll
+    @RunID VARCHAR(100) = NULL,
+    @BatchID VARCHAR(50) = NULL,
+    @TriggerType VARCHAR(50) = NULL
 AS
 BEGIN
     SET NOCOUNT ON;
 
+    DECLARE @rows BIGINT = 0;
+
+    -- Rows loaded before PeriodeCode existed take the file period of the one staged payslip
+    -- carrying their Periode label; labels shared by several payslips are left unmatched
+    UPDATE T
+    SET T.PeriodeCode = S.PERIODE
+    FROM LISE.Payroll AS T
+    INNER JOIN (
+        SELECT KEYPERSONNEL, PERIODELIBELLE, PERIODE,
+        COUNT(*) OVER (PARTITION BY KEYPERSONNEL, PERIODELIBELLE) AS LABELROWS
+        FROM LISE.Staging_Payroll) AS S
+      ON T.PersonnelKey = S.KEYPERSONNEL
+      AND T.Periode = S.PERIODELIBELLE
+    WHERE T.PeriodeCode IS NULL
+      AND S.LABELROWS = 1
+    ;
+
+    -- NB_PAYROLL stages only new or changed payslips, one row per PersonnelKey and file period
+    -- (the KEYPAIE key of fact_payroll); the Periode label is stored but not matched on
     MERGE LISE.Payroll AS T
     USING (
-        SELECT PersonnelID, PersonnelKey, Nom, Prenom, Periode, 
-        Date, Montant, Devise, ProfessionTypeID,
-        EtablissementID, ClasseID 
-        FROM LISE.Payroll_Incoming) AS S 
-    ON T.PersonnelID = S.PersonnelID
-    AND T.PersonnelKey = S.PersonnelKey
-    AND T.Nom = S.Nom
-    AND T.Prenom = S.Prenom
-    AND T.Periode = S.Periode
-    AND T.Date = S.Date
-    AND T.ProfessionTypeID = S.ProfessionTypeID
-    AND T.EtablissementID = S.EtablissementID
-    AND COALESCE(T.ClasseID, 0) = COALESCE(S.ClasseID, 0)
+        SELECT KEYPERSONNEL, IDPERSONNEL, NOM, PRENOM, PERIODE, PERIODELIBELLE,
+        DATE, MONTANT, DEVISE, IDPROFESSIONTYPE,
+        IDETABLISSEMENT, IDCLASSE, IDNIVEAU
+        FROM LISE.Staging_Payroll) AS S
+    ON T.PersonnelKey = S.KEYPERSONNEL
+    AND T.PeriodeCode = S.PERIODE
     WHEN MATCHED THEN
     UPDATE SET
-        T.Montant = S.Montant,
-        T.Devise = S.Devise
-    WHEN NOT MATCHED THEN 
-        INSERT (PaieID, PersonnelID, PersonnelKey, Nom, Prenom, Periode, Date, Montant, Devise, ProfessionTypeID,
-                EtablissementID, ClasseID)
-        VALUES (NEWID(), S.PersonnelID, S.PersonnelKey, S.Nom, S.Prenom, S.Periode, S.Date, S.Montant, S.Devise, S.ProfessionTypeID,
-                S.EtablissementID, S.ClasseID);
+        T.PersonnelID = S.IDPERSONNEL,
+        T.Nom = S.NOM,
+        T.Prenom = S.PRENOM,
+        T.Periode = S.PERIODELIBELLE,
+        T.Date = S.DATE,
+        T.Montant = S.MONTANT,
+        T.Devise = S.DEVISE,
+        T.ProfessionTypeID = S.IDPROFESSIONTYPE,
+        T.EtablissementID = S.IDETABLISSEMENT,
+        T.ClasseID = S.IDCLASSE,
+        T.NiveauID = S.IDNIVEAU
+    WHEN NOT MATCHED THEN
+        INSERT (PaieID, PersonnelID, PersonnelKey, Nom, Prenom, Periode, PeriodeCode, Date, Montant, Devise,
+                ProfessionTypeID, EtablissementID, ClasseID, NiveauID)
+        VALUES (NEWID(), S.IDPERSONNEL, S.KEYPERSONNEL, S.NOM, S.PRENOM, S.PERIODELIBELLE, S.PERIODE, S.DATE, S.MONTANT,
+                S.DEVISE, S.IDPROFESSIONTYPE, S.IDETABLISSEMENT, S.IDCLASSE, S.IDNIVEAU);
+
+    SET @rows = @@ROWCOUNT;
 
-    TRUNCATE TABLE LISE.Payroll_Incoming;
+    IF @RunID IS NOT NULL
+    BEGIN
+        INSERT INTO LISE.IngestionLogs (
+          IngestionID, PipelineName, Layer, TargetObject, Status, FinishedAtUTC,
+          WatermarkBefore, WatermarkAfter, RowsWritten, ErrorMessage, RunID, BatchID,
+          TriggerType, BytesWritten, FilesWritten, DurationSec, ThroughputMBps)
+        VALUES (NEWID(), 'PL_Payroll', 'Gold', 'upsert:Payroll', 'Succeeded', CAST(SYSUTCDATETIME() AS DATETIME2(3)),
+          NULL, NULL, @rows, NULL, @RunID, LEFT(@BatchID, 50),
+          @TriggerType, NULL, NULL, NULL, NULL);
+    END
 END;
\ No newline at end of file
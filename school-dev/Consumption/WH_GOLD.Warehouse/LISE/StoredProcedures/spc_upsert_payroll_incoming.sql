@@ -0,0 +1,37 @@
+CREATE PROCEDURE LISE.spc_upsert_payroll_incoming
+    @Periode VARCHAR(7) = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    -- Fallback for workspaces where NB_PAYROLL is not configured: PL_Payroll refreshes DF_GOLD into
+    -- Payroll_Incoming and merges it the way it did before the notebook. PeriodeCode is set so that
+    -- spc_upsert_payroll matches these rows once the notebook takes over.
+    MERGE LISE.Payroll AS T
+    USING (
+        SELECT PersonnelID, PersonnelKey, Nom, Prenom, Periode, 
+        Date, Montant, Devise, ProfessionTypeID,
+        EtablissementID, ClasseID 
+        FROM LISE.Payroll_Incoming) AS S 
+    ON T.PersonnelID = S.PersonnelID
+    AND T.PersonnelKey = S.PersonnelKey
+    AND T.Nom = S.Nom
+    AND T.Prenom = S.Prenom
+    AND T.Periode = S.Periode
+    AND T.Date = S.Date
+    AND T.ProfessionTypeID = S.ProfessionTypeID
+    AND T.EtablissementID = S.EtablissementID
+    AND COALESCE(T.ClasseID, 0) = COALESCE(S.ClasseID, 0)
+    WHEN MATCHED THEN
+    UPDATE SET
+        T.Montant = S.Montant,
+        T.Devise = S.Devise,
+        T.PeriodeCode = COALESCE(T.PeriodeCode, @Periode)
+    WHEN NOT MATCHED THEN 
+        INSERT (PaieID, PersonnelID, PersonnelKey, Nom, Prenom, Periode, PeriodeCode, Date, Montant, Devise,
+                ProfessionTypeID, EtablissementID, ClasseID)
+        VALUES (NEWID(), S.PersonnelID, S.PersonnelKey, S.Nom, S.Prenom, S.Periode, @Periode, S.Date, S.Montant, S.Devise,
+                S.ProfessionTypeID, S.EtablissementID, S.ClasseID);
+
+    TRUNCATE TABLE LISE.Payroll_Incoming;
+END;
\ No newline at end of file
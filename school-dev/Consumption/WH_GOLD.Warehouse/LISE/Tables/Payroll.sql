@@ -12,5 +12,6 @@ CREATE TABLE [LISE].[Payroll] (
 	[EtablissementID] int NULL, 
 	[ClasseID] int NULL, 
 	[NiveauID] int NULL, 
-	[PersonnelKey] varchar(50) NULL
+	[PersonnelKey] varchar(50) NULL, 
+	[PeriodeCode] varchar(7) NULL
 );
\ No newline at end of file
@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) B8D524F6B87CB6BADF6EED72BF62EAB22AABABDF327835D6F9C897AB1067D100
 CREATE VIEW LISE.Staging_Classes
 AS
-SELECT DISTINCT IDCLASSE, CLASSE, CLASSELIBELLE, IDNIVEAU, IDETABLISSEMENT
-FROM LH_SILVER.dbo.dim_classes;
\ No newline at end of file
+SELECT IDCLASSE, CLASSE, CLASSELIBELLE, IDNIVEAU, IDETABLISSEMENT, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_classes;
\ No newline at end of file
@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 83CB9D72581295F51F85270343CC2D6C2FC83CB467542D3C285057340B1186C6
 CREATE VIEW LISE.Staging_ClassesTargets
 AS
-SELECT DISTINCT KEYCLASSE, IDCLASSE, TARGETCOUNT, MAXIMUMCOUNT, SCHOOLYEAR
-from LH_SILVER.dbo.dim_classes_targets;
\ No newline at end of file
+SELECT KEYCLASSE, IDCLASSE, TARGETCOUNT, MAXIMUMCOUNT, SCHOOLYEAR, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_classes_targets;
\ No newline at end of file
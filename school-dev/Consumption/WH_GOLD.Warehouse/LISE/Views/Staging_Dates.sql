@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 9D18A960A229D44B6C3C6C3E32FFD1961E624865AE50968146C55CFCD8D0019E
 CREATE VIEW LISE.Staging_Dates
 AS
-SELECT DISTINCT IDDATE, DATE, CALENDARYEAR, CALENDARMONTH, CALENDARDAY, MONTHNAME, DAYNAME, SCHOOLYEAR, ISSCHOOLPERIOD
-FROM LH_SILVER.dbo.dim_dates;
\ No newline at end of file
+SELECT IDDATE, DATE, CALENDARYEAR, CALENDARMONTH, CALENDARDAY, MONTHNAME, DAYNAME, SCHOOLYEAR, ISSCHOOLPERIOD, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_dates;
\ No newline at end of file
@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 7922232B831EB1A09E01D59F4FCD167DEECE11B699FCD11D8BDEF2FC10A424A6
 CREATE VIEW LISE.Staging_Eleves
 AS
-SELECT DISTINCT KEYELEVE, IDELEVE, IDRESPONSABLE, DATEENTREE, DATESORTIE
-FROM LH_SILVER.dbo.dim_eleves;
\ No newline at end of file
+SELECT KEYELEVE, IDELEVE, IDRESPONSABLE, DATEENTREE, DATESORTIE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_eleves;
\ No newline at end of file
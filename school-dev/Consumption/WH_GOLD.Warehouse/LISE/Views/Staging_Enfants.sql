@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) EC33E53F6627BC11B244D05272E05D7C976863447EC96D1388075B4E320ED64B
 CREATE VIEW LISE.Staging_Enfants
 AS
-SELECT DISTINCT IDELEVE, NOM, PRENOM, SEXE, DATENAISSANCE, AGE, NATIONALITE, IDENTITENATIONALE, FULLNAME
-FROM LH_SILVER.dbo.dim_enfants;
\ No newline at end of file
+SELECT IDELEVE, NOM, PRENOM, SEXE, DATENAISSANCE, AGE, NATIONALITE, IDENTITENATIONALE, FULLNAME, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_enfants;
\ No newline at end of file
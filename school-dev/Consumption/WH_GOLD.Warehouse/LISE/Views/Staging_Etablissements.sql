@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 334C2D1F07B2E92FFAF38B58CB8E00E2563EC37124620C075E6D7DF00BB853D3
 CREATE VIEW LISE.Staging_Etablissements
 AS
-SELECT DISTINCT IDETABLISSEMENT, ETABLISSEMENT
-FROM LH_SILVER.dbo.dim_etablissements;
\ No newline at end of file
+SELECT IDETABLISSEMENT, ETABLISSEMENT, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_etablissements;
\ No newline at end of file
@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 67AC90975EE849087FC919800179067920C4F0089B95B7905A859554F8853D06
 CREATE VIEW LISE.Staging_FacturesEleves
 AS 
-SELECT DISTINCT KEYELEVE, IDELEVE, KEYRESPONSABLE, IDRESPONSABLE, KEYVALIDATION, IDVALIDATION, KEYCLASSE, IDCLASSE, IDREGIME, TOTALELEVE, DATEFACTURE
-FROM LH_SILVER.dbo.fact_factures_eleves;
\ No newline at end of file
+SELECT KEYELEVE, IDELEVE, KEYRESPONSABLE, IDRESPONSABLE, KEYVALIDATION, IDVALIDATION, KEYCLASSE, IDCLASSE, IDREGIME, TOTALELEVE, DATEFACTURE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_fact_factures_eleves;
\ No newline at end of file
@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) B774BAA3F0E37119877D8DA3D8E35BADD16C0E03DBE4E8897028430A8F15B2C1
 CREATE VIEW LISE.Staging_FacturesFamilles
 AS
-SELECT DISTINCT KEYRESPONSABLE, IDRESPONSABLE, KEYVALIDATION, IDVALIDATION, IDFOYER, IDPROFESSION, TOTALFAMILLE, DATEFACTURE 
-FROM LH_SILVER.dbo.fact_factures_familles;
\ No newline at end of file
+SELECT KEYRESPONSABLE, IDRESPONSABLE, KEYVALIDATION, IDVALIDATION, IDFOYER, IDPROFESSION, TOTALFAMILLE, DATEFACTURE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_fact_factures_familles;
\ No newline at end of file
@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) D90B64EC898B7D491F462CD09D1056404AA21F27667DF3A126E0D7C1C14073FA
 CREATE VIEW LISE.Staging_FacturesNiveaux
 AS 
-SELECT DISTINCT IDNIVEAU, KEYVALIDATION, IDVALIDATION, KEYRESPONSABLE, IDRESPONSABLE, TOTALNIVEAU, DATEFACTURE
-FROM LH_SILVER.dbo.fact_factures_niveaux;
\ No newline at end of file
+SELECT IDNIVEAU, KEYVALIDATION, IDVALIDATION, KEYRESPONSABLE, IDRESPONSABLE, TOTALNIVEAU, DATEFACTURE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_fact_factures_niveaux;
\ No newline at end of file
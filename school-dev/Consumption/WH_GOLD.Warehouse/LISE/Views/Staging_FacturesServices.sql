@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) E651B2512D0A26E9B40E3D84A2B2EEC2182B38FE615DED92FF89E5DCE35AE21F
 CREATE VIEW LISE.Staging_FacturesServices
 AS 
-SELECT DISTINCT KEYELEVE, IDELEVE, KEYRESPONSABLE, IDRESPONSABLE, KEYVALIDATION, IDVALIDATION, IDSERVICE, QUANTITE, PRIX, REMISE, TOTALSERVICE, DATEFACTURE
-FROM LH_SILVER.dbo.fact_factures_services;
\ No newline at end of file
+SELECT KEYELEVE, IDELEVE, KEYRESPONSABLE, IDRESPONSABLE, KEYVALIDATION, IDVALIDATION, IDSERVICE, QUANTITE, PRIX, REMISE, TOTALSERVICE, DATEFACTURE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_fact_factures_services;
\ No newline at end of file
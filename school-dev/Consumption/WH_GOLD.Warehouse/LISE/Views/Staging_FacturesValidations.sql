@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 5BA96F10BDC07667554C0800D163421066FFD800CA8D30312189D580D2EFE01D
 CREATE VIEW LISE.Staging_FacturesValidations
 AS
-SELECT DISTINCT KEYVALIDATION, IDVALIDATION, TYPEFACTURE, NOMBREFACTURE, DATEVALIDATION
-FROM LH_SILVER.dbo.fact_factures_validations;
\ No newline at end of file
+SELECT KEYVALIDATION, IDVALIDATION, TYPEFACTURE, NOMBREFACTURE, DATEVALIDATION, OPERATION
+FROM LH_SILVER.dbo.gold_delta_fact_factures_validations;
\ No newline at end of file
@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) F09ADA96D0A4FAD9FD3E732949CE76B2CAD89A9F5CAC8EF62496E95C9054E7CF
 CREATE VIEW LISE.Staging_Foyers
 AS
-SELECT DISTINCT IDFOYER, VILLE, IDVILLE
-FROM LH_SILVER.dbo.dim_foyers;
\ No newline at end of file
+SELECT IDFOYER, VILLE, IDVILLE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_foyers;
\ No newline at end of file
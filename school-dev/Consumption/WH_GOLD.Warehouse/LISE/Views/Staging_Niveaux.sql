@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 160CF24287E55309669A6BD110C22A5B2E79B9C0AFDBB5EE36DFEB0EC6B57931
 CREATE VIEW LISE.Staging_Niveaux
 AS
-SELECT DISTINCT IDNIVEAU, NIVEAU, IDETABLISSEMENT
-FROM LH_SILVER.dbo.dim_niveaux;
\ No newline at end of file
+SELECT IDNIVEAU, NIVEAU, IDETABLISSEMENT, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_niveaux;
\ No newline at end of file
@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 4699D40A7BF73D3166E31FC7069293EC23A73741271FE993C2A4E76ED137ED06
 CREATE VIEW LISE.Staging_Parents
 AS
-SELECT DISTINCT IDRESPONSABLE, NOM, PRENOM, FULLNAME
-FROM LH_SILVER.dbo.dim_parents;
\ No newline at end of file
+SELECT IDRESPONSABLE, NOM, PRENOM, FULLNAME, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_parents;
\ No newline at end of file
@@ -0,0 +1,5 @@
+CREATE VIEW LISE.Staging_Payroll
+AS
+SELECT KEYPERSONNEL, IDPERSONNEL, NOM, PRENOM, PERIODE, PERIODELIBELLE, DATE, MONTANT, DEVISE, IDPROFESSIONTYPE,
+       IDETABLISSEMENT, IDCLASSE, IDNIVEAU, OPERATION
+FROM LH_SILVER.dbo.gold_delta_fact_payroll;
\ No newline at end of file
@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 2D4656A9D1271276EE060358C9A6A11D310E0D5762F294A16B93E98203D7C7AD
 CREATE VIEW LISE.Staging_Pays
 AS 
-SELECT DISTINCT IDPAYS, PAYS, NATIONALITE
-FROM LH_SILVER.dbo.dim_pays;
\ No newline at end of file
+SELECT IDPAYS, PAYS, NATIONALITE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_pays;
\ No newline at end of file
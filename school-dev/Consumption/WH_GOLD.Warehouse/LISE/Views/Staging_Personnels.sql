@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 19282DCAFFB2DDCFED5754D3E2F5DD762DCFF65CB849925CF8C8A32B7A928D84
 CREATE VIEW LISE.Staging_Personnels
 AS
-SELECT DISTINCT IDPERSONNEL, NOM, PRENOM, NATIONALITE, BADGE
-FROM LH_SILVER.dbo.dim_personnels;
\ No newline at end of file
+SELECT IDPERSONNEL, NOM, PRENOM, NATIONALITE, BADGE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_personnels;
\ No newline at end of file
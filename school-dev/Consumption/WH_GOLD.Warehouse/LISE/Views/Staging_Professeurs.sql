@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 904ECCBE5D5D3284305BB6567804FBABECB83C4128B971C58E48CFEF1FC208BE
 CREATE VIEW LISE.Staging_Professeurs
 AS
-SELECT DISTINCT IDPROFESSEUR, IDPERSONNEL, IDCLASSE
-FROM LH_SILVER.dbo.dim_professeurs;
\ No newline at end of file
+SELECT IDPROFESSEUR, IDPERSONNEL, IDCLASSE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_professeurs;
\ No newline at end of file
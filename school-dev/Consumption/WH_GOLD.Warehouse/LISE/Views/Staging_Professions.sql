@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 9FB2C32210D09FE31AA5766064256D0BFE07B013BA507A07CD65D4E9368B9BAD
 CREATE VIEW LISE.Staging_Professions
 AS 
-SELECT DISTINCT IDPROFESSION, PROFESSION
-FROM LH_SILVER.dbo.dim_professions;
\ No newline at end of file
+SELECT IDPROFESSION, PROFESSION, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_professions;
\ No newline at end of file
@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 4140403C609093762F9BB24E37A5BE7779501354973A3140A75DACCF867276D0
 CREATE VIEW LISE.Staging_Regimes
 AS
-SELECT DISTINCT IDREGIME, REGIME
-FROM LH_SILVER.dbo.dim_regimes;
\ No newline at end of file
+SELECT IDREGIME, REGIME, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_regimes;
\ No newline at end of file
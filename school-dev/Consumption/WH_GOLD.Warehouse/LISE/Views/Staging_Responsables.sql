@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) BC2A64931C7F2DE4DA68A1E5419B309C29B630E6377562984D3D06ACCBD00F70
 CREATE VIEW LISE.Staging_Responsables
 AS
-SELECT DISTINCT KEYRESPONSABLE, IDRESPONSABLE, ENFANTSACHARGE, REGLEMENT, TELEPHONE, EMAIL, NUMEROCOMPTE, BANQUE
-FROM LH_SILVER.dbo.dim_responsables;
\ No newline at end of file
+SELECT KEYRESPONSABLE, IDRESPONSABLE, ENFANTSACHARGE, REGLEMENT, TELEPHONE, EMAIL, NUMEROCOMPTE, BANQUE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_responsables;
\ No newline at end of file
@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) B80CDE2C92943CEAE820E9A3E45B7DDF978C2653EE5DD43044B16A8A3A4EACF4
 CREATE VIEW LISE.Staging_SchoolYears
 AS
-SELECT DISTINCT SCHOOLYEAR, SCHOOLYEARLIBELLE
-from LH_SILVER.dbo.dim_school_years;
\ No newline at end of file
+SELECT SCHOOLYEAR, SCHOOLYEARLIBELLE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_school_years;
\ No newline at end of file
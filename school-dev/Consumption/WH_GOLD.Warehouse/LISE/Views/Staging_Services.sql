@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) D9BEFA956A87DD860EC6319A89F6016EFBF81D795126D77BBF3D4B23BA31D23C
 CREATE VIEW LISE.Staging_Services
 AS
-SELECT DISTINCT IDSERVICE, SERVICE
-FROM LH_SILVER.dbo.dim_services;
\ No newline at end of file
+SELECT IDSERVICE, SERVICE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_services;
\ No newline at end of file
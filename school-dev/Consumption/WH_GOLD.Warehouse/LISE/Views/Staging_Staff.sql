@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) D6C5A6B10E369B6564FC9201C69D5475BD212A09E872F3D99204721636059DD2
 CREATE VIEW LISE.Staging_Staff
 AS
-SELECT DISTINCT KEYPERSONNEL, IDPERSONNEL, VILLE, DATEENTREE, DATESORTIE, TELEPHONE, EMAIL, DATENAISSANCE, AGE
-FROM LH_SILVER.dbo.dim_staff;
\ No newline at end of file
+SELECT KEYPERSONNEL, IDPERSONNEL, VILLE, DATEENTREE, DATESORTIE, TELEPHONE, EMAIL, DATENAISSANCE, AGE, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_staff;
\ No newline at end of file
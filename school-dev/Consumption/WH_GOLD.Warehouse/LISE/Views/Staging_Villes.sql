@@ -1,5 +1,5 @@
 -- Auto Generated (Do not modify) 516A1C67260913FBCD1B9CEDF29D51680E7C0FD52A853601A76D6FAB4A6F2218
 CREATE VIEW LISE.Staging_Villes
 AS
-SELECT DISTINCT IDVILLE, VILLE, CODEPOSTAL, LATITUDE, LONGITUDE, DEPARTEMENT, PAYS
-FROM LH_SILVER.dbo.dim_villes;
\ No newline at end of file
+SELECT IDVILLE, VILLE, CODEPOSTAL, LATITUDE, LONGITUDE, DEPARTEMENT, PAYS, OPERATION
+FROM LH_SILVER.dbo.gold_delta_dim_villes;
\ No newline at end of file
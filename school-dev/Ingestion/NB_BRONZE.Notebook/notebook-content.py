@@ -0,0 +1,460 @@
+# Fabric notebook source
+
+# METADATA ********************
+
+# META {
+# META   "kernel_info": {
+# META     "name": "synapse_pyspark"
+# META   },
+# META   "dependencies": {
+# META     "lakehouse": {
+# META       "default_lakehouse": "bfe479b8-2f70-44bc-84d5-dfa2ec50d321",
+# META       "default_lakehouse_name": "LH_BRONZE",
+# META       "default_lakehouse_workspace_id": "28e6a84a-1953-410e-8b52-272e6318afde",
+# META       "known_lakehouses": [
+# META         {
+# META           "id": "bfe479b8-2f70-44bc-84d5-dfa2ec50d321"
+# META         }
+# META       ]
+# META     }
+# META   }
+# META }
+
+# CELL ********************
+
+from pyspark.sql.types import *
+from pyspark.sql.functions import *
+from notebookutils import mssparkutils
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import hashlib
+import json
+import csv
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+BRONZE_BASE = "abfss://LISE@onelake.dfs.fabric.microsoft.com/LH_BRONZE.Lakehouse/Files"
+
+def p(year: str, filename: str) -> str:
+    return f"{BRONZE_BASE}/Lise_Data/{year}/{filename}"
+
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+YEAR_SUFFIXES = {
+    "2023-2024": "_2324",
+    "2024-2025": "_2425",
+    "2025-2026": "",
+}
+
+datasets = {
+    "niveaux": {
+        "file": "COM_NIVEAU",
+        "schema": StructType([
+            StructField("NI_CODE", StringType(), True)
+        ])
+    },
+    "etablissements": {
+        "file": "COM_ETABLISSEMENT",
+        "schema": StructType([
+            StructField("IDETABLISSEMENT", IntegerType(), True),
+            StructField("ET_LIBELLE", StringType(), True)
+        ])
+    },
+    "classes": {
+        "file": "COM_CLASSES",
+        "schema": StructType([
+            StructField("IDCLASSE", IntegerType(), True),
+            StructField("CL_CODE", StringType(), True),
+            StructField("CL_LIBELLE", StringType(), True),
+            StructField("IDETABLISSEMENT", IntegerType(), True),
+            StructField("IDNIVEAU", IntegerType(), True),
+            StructField("CL_CLASSE_RECTORAT", StringType(), True)
+        ])
+    },
+    "foyers": {
+        "file": "COM_FOYER",
+        "schema": StructType([
+            StructField("IDFOYER", IntegerType(), True),
+            StructField("VILLE", StringType(), True)
+        ])
+    },
+    "responsables": {
+        "file": "COM_RESPONSABLES",
+        "schema": StructType([
+            StructField("IDRESPONSABLE", IntegerType(), True),
+            StructField("IDFOYER", IntegerType(), True),
+            StructField("RE_NOM1", StringType(), True),
+            StructField("RE_PRENOM1", StringType(), True),
+            StructField("RE_CSP1", IntegerType(), True),
+            StructField("RE_CSP2", IntegerType(), True),
+            StructField("RE_MODE_REGLEMENT", StringType(), True),
+            StructField("RE_ENF_A_CHARGE", DoubleType(), True),
+            StructField("RE_TELPORTABLE1", StringType(), True),
+            StructField("RE_EMAILPERSO1", StringType(), True),
+            StructField("RE_IBAN", StringType(), True),
+            StructField("RE_CODEPOSTAL", StringType(), True)
+        ])
+    },
+    "professions": {
+        "file": "TAB_CSP",
+        "schema": StructType([
+            StructField("CSP_CODE", IntegerType(), True),
+            StructField("CSP_LIBELLE", StringType(), True)
+        ])
+    },
+    "eleves": {
+        "file": "COM_ELEVES",
+        "schema": StructType([
+            StructField("IDELEVE", IntegerType(), True),
+            StructField("EL_IDCLASSE", IntegerType(), True),
+            StructField("EL_IDREGIME", IntegerType(), True),
+            StructField("EL_NOM1", StringType(), True),
+            StructField("EL_PRENOM1", StringType(), True),
+            StructField("EL_SEXE", StringType(), True),
+            StructField("EL_DATE_DE_NAISSANCE", DateType(), True, {"format": "yyyyMMdd"}),
+            StructField("EL_DATE_ENTREE", DateType(), True, {"format": "yyyyMMdd"}),
+            StructField("EL_DATE_SORTIE", DateType(), True, {"format": "yyyyMMdd"}),
+            StructField("EL_NATIONALITE1", StringType(), True),
+            StructField("EL_IDENT_NAT", StringType(), True)
+        ])
+    },
+    "factures_niveaux": {
+        "file": "FAC_COMPTA_GENERAL",
+        "schema": StructType([
+            StructField("IDRESPONSABLE", IntegerType(), True),
+            StructField("IDVALIDATION", IntegerType(), True),
+            StructField("CG_POSTE_ANA", StringType(), True),
+            StructField("CG_CREDIT", DoubleType(), True),
+            StructField("CG_DEBIT", DoubleType(), True),
+            StructField("CG_DATE_FACTURE", DateType(), True, {"format": "yyyyMMdd"})
+        ])
+    },
+    "factures_services": {
+        "file": "FAC_HISTO_LIGNE",
+        "schema": StructType([
+            StructField("IDELEVE", IntegerType(), True),
+            StructField("IDRESPONSABLE", IntegerType(), True),
+            StructField("IDVALIDATION", IntegerType(), True),
+            StructField("HL_CODE_LIGNE", StringType(), True),
+            StructField("HL_QUANTITE", FloatType(), True),
+            StructField("HL_PRIX", FloatType(), True),
+            StructField("HL_REMISE_MT_AUTO", FloatType(), True),
+            StructField("HL_APAYER_LIGNE", FloatType(), True)
+        ])
+    },
+    "factures_familles": {
+        "file": "FAC_HISTO_FAMILLE",
+        "schema": StructType([
+            StructField("IDRESPONSABLE", IntegerType(), True),
+            StructField("IDVALIDATION", IntegerType(), True),
+            StructField("HF_APAYER_FACTURE", FloatType(), True),
+            StructField("HF_DATE_FACTURE", DateType(), True, {"format": "yyyyMMdd"})
+        ])
+    },
+    "factures_eleves": {
+        "file": "FAC_HISTO_ELEVE",
+        "schema": StructType([
+            StructField("IDELEVE", IntegerType(), True),
+            StructField("IDRESPONSABLE", IntegerType(), True),
+            StructField("IDVALIDATION", IntegerType(), True),
+            StructField("HE_IDCLASSE", IntegerType(), True),
+            StructField("HE_IDREGIME", IntegerType(), True),
+            StructField("HE_APAYER_ELEVE", FloatType(), True)
+        ])
+    },
+    "factures_validations": {
+        "file": "FAC_VALIDATION",
+        "schema": StructType([
+            StructField("IDVALIDATION", IntegerType(), True),
+            StructField("VA_TYPE_FACTURE", StringType(), True),
+            StructField("VA_NB_FACTURES", IntegerType(), True),
+            StructField("VA_DATE_HEURE", StringType(), True)
+        ])
+    },
+    "personnels": {
+        "file": "COM_PERSONNELS",
+        "schema": StructType([
+            StructField("IDPERSONNEL", IntegerType(), True),
+            StructField("PE_NOM", StringType(), True),
+            StructField("PE_PRENOM", StringType(), True),
+            StructField("PE_TYPE", StringType(), True),
+            StructField("PE_VILLE", StringType(), True),
+            StructField("PE_PAYS", StringType(), True),
+            StructField("PE_NATIONALITE", IntegerType(), True),
+            StructField("PE_DATE_ENTREE", DateType(), True, {"format": "yyyyMMdd"}),
+            StructField("PE_DATE_SORTIE", DateType(), True, {"format": "yyyyMMdd"}),
+            StructField("PE_NAISSANCE_DATE", DateType(), True, {"format": "yyyyMMdd"}),
+            StructField("PE_TELPORTABLE", StringType(), True),
+            StructField("PE_EMAIL_PRO", StringType(), True),
+            StructField("PE_NUMSECU", StringType(), True),
+            StructField("PE_BADGENUM", IntegerType(), True),
+            StructField("PE_IBAN", StringType(), True)
+        ])
+    },
+    "professeurs": {
+        "file": "COM_PROFS_PRINCIPAUX",
+        "schema": StructType([
+            StructField("IDPROFSPRINCIPAUX", IntegerType(), True),
+            StructField("IDPERSONNEL", IntegerType(), True),
+            StructField("IDCLASSE", IntegerType(), True)
+        ])
+    },
+    "pays": {
+        "file": "TAB_PAYS",
+        "schema": StructType([
+            StructField("PA_CODE", IntegerType(), True),
+            StructField("PA_PAYS", StringType(), True),
+            StructField("PA_NATIONALITE", StringType(), True)
+        ])
+    }
+}
+
+# {dataset_name: {year: {source column name: registry column name}}}
+column_overrides = {}
+
+paths = {year: {dataset_name: p(year, f"{spec['file']}{suffix}.csv") for dataset_name, spec in datasets.items()}
+         for year, suffix in YEAR_SUFFIXES.items()}
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+MANIFEST_FILE = "Files/Watermarks/manifest.json"
+
+def bronze_table(dataset_name: str) -> str:
+    return f"bronze_{dataset_name}"
+
+def schema_hash(dataset_name: str) -> str:
+    return hashlib.md5(datasets[dataset_name]["schema"].json().encode()).hexdigest()
+
+def load_manifest() -> dict:
+    if not mssparkutils.fs.exists(MANIFEST_FILE):
+        return {}
+    return json.loads(mssparkutils.fs.head(MANIFEST_FILE, 10 * 1024 * 1024))
+
+def file_hash(path: str) -> str:
+    return spark.read.format("binaryFile").load(path).select(md5(col("content"))).first()[0]
+
+def detect_changes(manifest: dict):
+    current, changed, reshaped = {}, set(), set()
+    for year, year_paths in paths.items():
+        for dataset_name, path in year_paths.items():
+            key = f"{year}/{dataset_name}"
+            info = mssparkutils.fs.ls(path)[0]
+            entry = {"path": path, "size": info.size, "modificationTime": info.modifyTime,
+                     "schema": schema_hash(dataset_name),
+                     "overrides": column_overrides.get(dataset_name, {}).get(year, {})}
+            previous = manifest.get(key) or {}
+            table_exists = spark.catalog.tableExists(bronze_table(dataset_name))
+            same_layout = previous.get("schema") == entry["schema"] and previous.get("overrides") == entry["overrides"]
+
+            if previous and table_exists and same_layout and previous["size"] == entry["size"] and previous["modificationTime"] == entry["modificationTime"]:
+                entry["hash"] = previous["hash"]
+                entry["landedAt"] = previous.get("landedAt")
+            else:
+                entry["hash"] = file_hash(path)
+                if not previous or not table_exists or not same_layout or previous["hash"] != entry["hash"]:
+                    changed.add((year, dataset_name))
+                else:
+                    entry["landedAt"] = previous.get("landedAt")
+
+            if previous and previous.get("schema") != entry["schema"]:
+                reshaped.add(dataset_name)
+
+            current[key] = entry
+    return current, changed, reshaped
+
+
+previous_manifest = load_manifest()
+current_manifest, changed_files, reshaped_datasets = detect_changes(previous_manifest)
+
+print(f"Changed source files: {sorted(changed_files)}")
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+CONTROL_CHARS = "\uFEFF" + "".join(chr(i) for i in range(0x20)) + "\x7F"
+CONTROL_PATTERN = "[\uFEFF\x00-\x1F\x7F]"
+FAST_CLEAN = True
+NULL_TOKENS = ["NULL", "", "0", "NaN", "InvalidDate", "00000000"]
+HEADER_MAX_BYTES = 64 * 1024
+
+def clean_value(c, fast: bool = FAST_CLEAN):
+    if fast:
+        return translate(c, CONTROL_CHARS, "")
+    return regexp_replace(c, CONTROL_PATTERN, "")
+
+def parse_date(c, fmt: str):
+    return when(trim(c).isin(NULL_TOKENS), lit(None)).otherwise(to_date(trim(c), fmt))
+
+def apply_schema(df, schema: StructType, keep=()):
+    columns = []
+    for field in schema.fields:
+        value = clean_value(col(field.name)) if field.name in df.columns else lit(None).cast(StringType())
+        if isinstance(field.dataType, DateType):
+            value = parse_date(value, field.metadata.get("format", "yyyyMMdd"))
+        elif not isinstance(field.dataType, StringType):
+            value = value.cast(field.dataType)
+        columns.append(value.alias(field.name))
+    return df.select(columns + [col(c) for c in keep])
+
+def read_header(path: str) -> list:
+    jvm = spark._jvm
+    hadoop_path = jvm.org.apache.hadoop.fs.Path(path)
+    fs = hadoop_path.getFileSystem(spark._jsc.hadoopConfiguration())
+    size = __builtins__.min(fs.getFileStatus(hadoop_path).getLen(), HEADER_MAX_BYTES)
+    stream = fs.open(hadoop_path)
+    try:
+        head = bytes(jvm.org.apache.commons.io.IOUtils.toByteArray(stream, size))
+    finally:
+        stream.close()
+    first_line = head[:len(head) - len(head) % 2].decode("utf-16-le", errors="ignore").splitlines()[0]
+    header = next(csv.reader([first_line], delimiter=",", quotechar='"'))
+    return [c.strip().replace("\uFEFF", "").replace('"', "").strip() for c in header]
+
+def read_dataset(dataset_name: str, years: list):
+    try:
+        year_paths = [paths[year][dataset_name] for year in years]
+        headers = {year: read_header(paths[year][dataset_name]) for year in years}
+        width = __builtins__.max(len(header) for header in headers.values())
+        positional = StructType([StructField(f"_c{i}", StringType(), True) for i in range(width)])
+
+        df = spark.read.csv(year_paths, schema=positional, header=True, enforceSchema=True, sep=",", quote='"',
+                            escape='"', encoding="UTF-16LE", multiLine=True) \
+                  .withColumn("SCHOOLYEAR", regexp_extract(col("_metadata.file_path"), r"/Lise_Data/(\d{4}-\d{4})/", 1))
+
+        # Source column position per year, after the year's renames
+        positions = {}
+        for year, header in headers.items():
+            renames = column_overrides.get(dataset_name, {}).get(year, {})
+            for i, name in enumerate(header):
+                positions.setdefault(renames.get(name, name), {})[year] = i
+
+        resolved = []
+        for field in datasets[dataset_name]["schema"].fields:
+            by_year = positions.get(field.name)
+            if not by_year:
+                continue
+            value = None
+            for year, i in by_year.items():
+                condition = col("SCHOOLYEAR") == year
+                value = when(condition, col(f"_c{i}")) if value is None else value.when(condition, col(f"_c{i}"))
+            resolved.append(value.alias(field.name))
+
+        df = apply_schema(df.select(resolved + [col("SCHOOLYEAR")]), datasets[dataset_name]["schema"], keep=["SCHOOLYEAR"])
+
+        print(f"Dataset {dataset_name} read for {years}")
+        return df
+
+    except Exception as e:
+        print(f"Error reading {dataset_name} for {years}:{e}")
+        raise
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+LAND_WORKERS = 4
+CHANGE_FEED = True
+
+spark.conf.set("spark.databricks.delta.properties.defaults.enableChangeDataFeed", str(CHANGE_FEED).lower())
+
+def enable_change_feed(table_name: str):
+    # NB_SILVER_STREAM follows the Bronze tables through their change feed
+    if not CHANGE_FEED or not spark.catalog.tableExists(table_name):
+        return
+    properties = {row["key"]: row["value"] for row in spark.sql(f"SHOW TBLPROPERTIES {table_name}").collect()}
+    if properties.get("delta.enableChangeDataFeed") != "true":
+        spark.sql(f"ALTER TABLE {table_name} SET TBLPROPERTIES (delta.enableChangeDataFeed = true)")
+        print(f"Change data feed enabled on {table_name}")
+
+def land_dataset(dataset_name: str, years: list):
+    year_list = ", ".join(f"'{year}'" for year in years)
+    enable_change_feed(bronze_table(dataset_name))
+    read_dataset(dataset_name, years).write.format("delta") \
+                                     .mode("overwrite") \
+                                     .option("replaceWhere", f"SCHOOLYEAR IN ({year_list})") \
+                                     .option("mergeSchema", "true") \
+                                     .partitionBy("SCHOOLYEAR") \
+                                     .saveAsTable(bronze_table(dataset_name))
+    print(f"Table {bronze_table(dataset_name)} landed for {years}")
+    return dataset_name, years
+
+
+for dataset_name in sorted(reshaped_datasets):
+    spark.sql(f"DROP TABLE IF EXISTS {bronze_table(dataset_name)}")
+    print(f"Schema of {dataset_name} changed, table {bronze_table(dataset_name)} will be rebuilt")
+
+changed_years = {}
+for year, dataset_name in sorted(changed_files):
+    changed_years.setdefault(dataset_name, []).append(year)
+
+landed = []
+with ThreadPoolExecutor(max_workers=LAND_WORKERS) as executor:
+    futures = [executor.submit(land_dataset, dataset_name, years) for dataset_name, years in changed_years.items()]
+    for future in as_completed(futures):
+        dataset_name, years = future.result()
+        for year in years:
+            current_manifest[f"{year}/{dataset_name}"]["landedAt"] = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+            landed.append(f"{year}/{dataset_name}")
+
+landed.sort()
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+mssparkutils.fs.mkdirs("Files/Watermarks")
+mssparkutils.fs.put(MANIFEST_FILE, json.dumps(current_manifest, indent=2), overwrite=True)
+
+result = {
+    "status": "succeeded" if landed else "no_change",
+    "run_ts": datetime.now(ZoneInfo("America/New_York")).isoformat(),
+    "landed": landed
+}
+
+mssparkutils.notebook.exit(json.dumps(result))
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
@@ -0,0 +1,270 @@
+# Fabric notebook source
+
+# METADATA ********************
+
+# META {
+# META   "kernel_info": {
+# META     "name": "synapse_pyspark"
+# META   },
+# META   "dependencies": {
+# META     "lakehouse": {
+# META       "default_lakehouse": "b727fb41-33d0-41ec-90bd-dfc3c112f2b3",
+# META       "default_lakehouse_name": "LH_SILVER",
+# META       "default_lakehouse_workspace_id": "28e6a84a-1953-410e-8b52-272e6318afde",
+# META       "known_lakehouses": [
+# META         {
+# META           "id": "bfe479b8-2f70-44bc-84d5-dfa2ec50d321"
+# META         },
+# META         {
+# META           "id": "b727fb41-33d0-41ec-90bd-dfc3c112f2b3"
+# META         }
+# META       ]
+# META     },
+# META     "warehouse": {
+# META       "known_warehouses": []
+# META     }
+# META   }
+# META }
+
+# CELL ********************
+
+from pyspark.sql.types import *
+from pyspark.sql.functions import *
+from pyspark.sql.window import *
+from delta.tables import DeltaTable
+from datetime import datetime, timezone
+from notebookutils import mssparkutils
+from zoneinfo import ZoneInfo
+import re
+import uuid
+import json
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+BRONZE_BASE = "abfss://LISE@onelake.dfs.fabric.microsoft.com/LH_BRONZE.Lakehouse/Files"
+# Comma-separated periods or period prefixes ("2025-09", "2025"); empty reads every dropzone file
+PERIODS = ""
+PIPELINE_RUN_ID = None
+PAYROLL_PUBLISHED_AT = None
+
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+PAYROLL_TABLE = "fact_payroll"
+STAGING_TABLE = f"gold_delta_{PAYROLL_TABLE}"
+PAYROLL_SYNC_FILE = "Files/Watermarks/payroll_sync.json"
+PAYROLL_FILE = re.compile(r"^Payroll_(\d{4}-\d{2})\.csv$")
+
+run_id = PIPELINE_RUN_ID or str(uuid.uuid4())
+
+def list_payroll_files(folder: str) -> dict:
+    # Period -> path of every non-empty Payroll_yyyy-MM.csv below folder
+    if not mssparkutils.fs.exists(folder):
+        return {}
+    found = {}
+    for entry in mssparkutils.fs.ls(folder):
+        if entry.isDir:
+            found.update(list_payroll_files(entry.path))
+        elif (match := PAYROLL_FILE.match(entry.name)) and entry.size > 0:
+            found[match.group(1)] = entry.path
+    return found
+
+
+requested = [period.strip() for period in PERIODS.split(",") if period.strip()]
+
+payroll_files = list_payroll_files(f"{BRONZE_BASE}/Payroll/dropzone")
+if requested:
+    # Backfills also pick up archived months; a dropzone copy wins over the archived one
+    payroll_files = {**list_payroll_files(f"{BRONZE_BASE}/Payroll/processed"), **payroll_files}
+    payroll_files = {period: path for period, path in payroll_files.items()
+                     if any(period.startswith(prefix) for prefix in requested)}
+
+periods = sorted(payroll_files)
+print(f"Payroll periods to load: {periods}")
+
+if not periods:
+    mssparkutils.notebook.exit(json.dumps({
+        "status": "no_change",
+        "run_id": run_id,
+        "run_ts": datetime.now(ZoneInfo("America/New_York")).isoformat(),
+        "periods": [],
+        "total_rows_processed": 0
+    }))
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+PAYROLL_COLUMNS = ["KEYPAIE", "IDPERSONNEL", "KEYPERSONNEL", "NOM", "PRENOM", "PERIODE", "PERIODELIBELLE", "DATE",
+                   "MONTANT", "DEVISE", "IDPROFESSIONTYPE", "IDETABLISSEMENT", "IDCLASSE", "IDNIVEAU"]
+HASHED_COLUMNS = [c for c in PAYROLL_COLUMNS if c not in ("KEYPAIE", "PERIODE")]
+
+def parse_montant(c):
+    # "1 747,52" -> 1747.52, empty amounts as 0 like the former dataflow
+    cleaned = regexp_replace(regexp_replace(trim(c), r"[\s\u00A0\u202F]", ""), ",", ".")
+    return coalesce(when(cleaned != "", cleaned.cast(DoubleType())), lit(0.0))
+
+def row_hash(columns):
+    return sha2(concat_ws("||", *[coalesce(col(c).cast("string"), lit("<NULL>")) for c in columns]), 256)
+
+
+# One read over every file: Spark splits the files across executors
+raw = spark.read.csv([payroll_files[period] for period in periods], header=True, sep=",", quote='"', escape='"',
+                     encoding="UTF-8")
+raw = raw.toDF(*[c.replace("\uFEFF", "").strip() for c in raw.columns])
+
+df_payroll = raw.select(
+    col("PersonnelID").cast(IntegerType()).alias("IDPERSONNEL"),
+    col("PersonnelKey").alias("KEYPERSONNEL"),
+    col("Nom").alias("NOM"),
+    col("Prenom").alias("PRENOM"),
+    regexp_extract(input_file_name(), r"Payroll_(\d{4}-\d{2})\.csv", 1).alias("PERIODE"),
+    col("Periode").alias("PERIODELIBELLE"),
+    to_date(lpad(trim(col("Date")), 8, "0"), "yyyyMMdd").alias("DATE"),
+    parse_montant(col("Montant")).alias("MONTANT"),
+    trim(col("Devise")).alias("DEVISE"),
+    col("ProfessionTypeID").cast(IntegerType()).alias("IDPROFESSIONTYPE"),
+    col("EtablissementID").cast(IntegerType()).alias("IDETABLISSEMENT"),
+    col("ClasseID").cast(IntegerType()).alias("IDCLASSE"),
+    col("NiveauID").cast(IntegerType()).alias("IDNIVEAU"),
+    input_file_name().alias("SOURCEFILE")
+).withColumn("KEYPAIE", xxhash64(col("KEYPERSONNEL"), col("PERIODE")))
+
+# A payslip re-issued within a file keeps its latest line
+latest = Window.partitionBy("KEYPAIE").orderBy(col("DATE").desc_nulls_last(), col("MONTANT").desc())
+df_payroll = df_payroll.withColumn("_rank", row_number().over(latest)) \
+                       .filter(col("_rank") == 1) \
+                       .drop("_rank") \
+                       .select(*PAYROLL_COLUMNS, row_hash(HASHED_COLUMNS).alias("ROWHASH"), "SOURCEFILE") \
+                       .persist()
+
+source_rows = raw.count()
+payroll_rows = df_payroll.count()
+print(f"{payroll_rows} payslips read from {len(periods)} files ({source_rows - payroll_rows} duplicates dropped)")
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+def parse_utc(value):
+    stamp = datetime.fromisoformat(re.sub(r"(\.\d{6})\d+", r"\1", value.replace("Z", "+00:00")))
+    return stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)
+
+def payroll_applied(state):
+    # An upsert finishing after the last sync means the staged rows are in the warehouse
+    if not state.get("pending") or not PAYROLL_PUBLISHED_AT:
+        return False
+    return parse_utc(str(PAYROLL_PUBLISHED_AT)) >= parse_utc(state["synced_at"])
+
+
+table_exists = spark.catalog.tableExists(PAYROLL_TABLE)
+
+# Rows new or different from Silver, computed before the merge rewrites it
+if table_exists:
+    current = spark.table(PAYROLL_TABLE) \
+                   .filter(col("PERIODE").isin(periods)) \
+                   .select("KEYPAIE", col("ROWHASH").alias("CURRENTHASH"))
+    changes = df_payroll.join(current, on="KEYPAIE", how="left") \
+                        .filter(col("CURRENTHASH").isNull() | (col("CURRENTHASH") != col("ROWHASH"))) \
+                        .withColumn("OPERATION", when(col("CURRENTHASH").isNull(), lit("I")).otherwise(lit("U"))) \
+                        .drop("CURRENTHASH", "SOURCEFILE")
+else:
+    changes = df_payroll.drop("SOURCEFILE").withColumn("OPERATION", lit("I"))
+
+payroll_state = json.loads(mssparkutils.fs.head(PAYROLL_SYNC_FILE, 1024 * 1024)) \
+    if mssparkutils.fs.exists(PAYROLL_SYNC_FILE) else {}
+carried_rows = 0
+if payroll_state.get("pending") and not payroll_applied(payroll_state) and spark.catalog.tableExists(STAGING_TABLE):
+    # The previous batch never reached the warehouse: keep its rows unless this batch supersedes them
+    carried = spark.table(STAGING_TABLE).join(changes.select("KEYPAIE"), on="KEYPAIE", how="left_anti")
+    carried_rows = carried.count()
+    changes = changes.unionByName(carried).localCheckpoint()
+
+changes.coalesce(1).write.mode("overwrite").option("overwriteSchema", "true").saveAsTable(STAGING_TABLE)
+staged = {row["OPERATION"]: row["count"] for row in spark.table(STAGING_TABLE).groupBy("OPERATION").count().collect()}
+
+mssparkutils.fs.put(PAYROLL_SYNC_FILE, json.dumps({
+    "run_id": run_id,
+    "synced_at": datetime.now(timezone.utc).isoformat(),
+    "pending": True,
+    "periods": periods
+}, indent=2), overwrite=True)
+
+print(f"Staged {staged.get('I', 0)} inserts and {staged.get('U', 0)} updates in {STAGING_TABLE} "
+      f"({carried_rows} carried over from run {payroll_state.get('run_id')})")
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+period_list = ", ".join(f"'{period}'" for period in periods)
+
+if not table_exists:
+    df_payroll.write.format("delta").partitionBy("PERIODE").saveAsTable(PAYROLL_TABLE)
+else:
+    # Only the loaded period partitions are scanned
+    DeltaTable.forName(spark, PAYROLL_TABLE).alias("t").merge(
+        df_payroll.alias("s"),
+        f"t.PERIODE IN ({period_list}) AND t.PERIODE = s.PERIODE AND t.KEYPAIE = s.KEYPAIE"
+    ).whenMatchedUpdateAll(condition="t.ROWHASH <> s.ROWHASH") \
+     .whenNotMatchedInsertAll() \
+     .execute()
+
+last = DeltaTable.forName(spark, PAYROLL_TABLE).history(1).select("operation", "operationMetrics").first()
+merge_metrics = {k: int(v) for k, v in (last["operationMetrics"] or {}).items() if v.isdigit()}
+df_payroll.unpersist()
+
+result = {
+    "status": "succeeded",
+    "run_id": run_id,
+    "run_ts": datetime.now(ZoneInfo("America/New_York")).isoformat(),
+    "periods": periods,
+    "files": [payroll_files[period] for period in periods],
+    "total_rows_processed": payroll_rows,
+    "duplicates_dropped": source_rows - payroll_rows,
+    "merge_metrics": {
+        "inserted": merge_metrics.get("numTargetRowsInserted", merge_metrics.get("numOutputRows", 0)),
+        "updated": merge_metrics.get("numTargetRowsUpdated", 0)
+    },
+    "staged": {"inserts": staged.get("I", 0), "updates": staged.get("U", 0), "carried": carried_rows}
+}
+
+mssparkutils.notebook.exit(json.dumps(result))
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark",
+# META   "frozen": false,
+# META   "editable": true
+# META }
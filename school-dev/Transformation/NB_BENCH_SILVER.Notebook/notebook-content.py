@@ -0,0 +1,249 @@
+# Fabric notebook source
+
+# METADATA ********************
+
+# META {
+# META   "kernel_info": {
+# META     "name": "synapse_pyspark"
+# META   },
+# META   "dependencies": {
+# META     "lakehouse": {
+# META       "default_lakehouse": "b727fb41-33d0-41ec-90bd-dfc3c112f2b3",
+# META       "default_lakehouse_name": "LH_SILVER",
+# META       "default_lakehouse_workspace_id": "28e6a84a-1953-410e-8b52-272e6318afde",
+# META       "known_lakehouses": [
+# META         {
+# META           "id": "b727fb41-33d0-41ec-90bd-dfc3c112f2b3"
+# META         }
+# META       ]
+# META     }
+# META   }
+# META }
+
+# CELL ********************
+
+from pyspark.sql.types import *
+from pyspark.sql.functions import *
+from notebookutils import mssparkutils
+from delta.tables import DeltaTable
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import random
+import time
+import json
+import os
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+BENCH_FOLDER = "Files/Benchmarks"
+LOCAL_BENCH_FOLDER = f"/lakehouse/default/{BENCH_FOLDER}"
+
+cleanup_widths = [10, 50, 100, 200, 400]
+cleanup_rows = 20000
+
+merge_history_years = [1, 2, 4, 8]
+merge_rows_per_year = 500000
+merge_current_year = 2025
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+def write_synthetic_csv(name: str, width: int, rows: int, seed: int = 42) -> str:
+    rng = random.Random(seed)
+    header = ",".join(f'"COL_{i}"' for i in range(width))
+    noise = ["\x01", "\x07", "\x1F", "\x7F", "\uFEFF", ""]
+    lines = [header]
+    for r in range(rows):
+        values = []
+        for i in range(width):
+            value = f"V{r}_{i}{rng.choice(noise)}"
+            if i % 7 == 0:
+                value = f"{value}\nSUITE"
+            values.append('"' + value.replace('"', '""') + '"')
+        lines.append(",".join(values))
+
+    os.makedirs(f"{LOCAL_BENCH_FOLDER}/cleanup", exist_ok=True)
+    with open(f"{LOCAL_BENCH_FOLDER}/cleanup/{name}", "wb") as f:
+        f.write(("\uFEFF" + "\r\n".join(lines) + "\r\n").encode("utf-16-le"))
+    return f"{BENCH_FOLDER}/cleanup/{name}"
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+CONTROL_CHARS = "\uFEFF" + "".join(chr(i) for i in range(0x20)) + "\x7F"
+CONTROL_PATTERN = "[\uFEFF\x00-\x1F\x7F]"
+
+def read_raw(path: str):
+    df = spark.read.csv(path, header=True, sep=",", quote='"', escape='"', encoding="UTF-16LE", multiLine=True)
+    clean_columns = [c.strip().replace("\uFEFF", "").replace('"', "").strip() for c in df.columns]
+    return df.toDF(*clean_columns)
+
+def clean_loop(df):
+    for col_name in df.columns:
+        df = df.withColumn(col_name, regexp_replace(col(col_name), CONTROL_PATTERN, ""))
+    return df
+
+def clean_select(df, fast: bool):
+    string_cols = {f.name for f in df.schema.fields if isinstance(f.dataType, StringType)}
+    if fast:
+        cleaner = lambda c: translate(col(c), CONTROL_CHARS, "")
+    else:
+        cleaner = lambda c: regexp_replace(col(c), CONTROL_PATTERN, "")
+    return df.select([cleaner(c).alias(c) if c in string_cols else col(c) for c in df.columns])
+
+cleanup_variants = {
+    "withColumn_loop_regex": clean_loop,
+    "select_regex": lambda df: clean_select(df, fast=False),
+    "select_translate": lambda df: clean_select(df, fast=True),
+}
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+def time_variant(path: str, variant):
+    start = time.perf_counter()
+    df = variant(read_raw(path))
+    df._jdf.queryExecution().optimizedPlan()
+    planned = time.perf_counter()
+    df.write.format("noop").mode("overwrite").save()
+    executed = time.perf_counter()
+    return planned - start, executed - planned
+
+
+cleanup_results = []
+for width in cleanup_widths:
+    path = write_synthetic_csv(f"SYNTH_{width}.csv", width, cleanup_rows)
+    for variant_name, variant in cleanup_variants.items():
+        plan_sec, exec_sec = time_variant(path, variant)
+        cleanup_results.append({
+            "benchmark": "read_csv_cleanup",
+            "variant": variant_name,
+            "width": width,
+            "rows": cleanup_rows,
+            "plan_sec": float(f"{plan_sec:.3f}"),
+            "exec_sec": float(f"{exec_sec:.3f}")
+        })
+        print(f"{variant_name} width={width}: plan {plan_sec:.3f}s, exec {exec_sec:.3f}s")
+
+display(spark.createDataFrame(cleanup_results).orderBy("width", "variant"))
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+def school_year(start_col):
+    return concat(start_col.cast("string"), lit("-"), (start_col + 1).cast("string"))
+
+def synthetic_facts(years: int):
+    start = merge_current_year - years + 1
+    return spark.range(merge_rows_per_year * years) \
+                .withColumn("YEARSTART", (lit(start) + floor(col("id") / merge_rows_per_year)).cast(LongType())) \
+                .select((col("YEARSTART") * 10000000000 + col("id") % merge_rows_per_year).alias("KEYVALIDATIONID"),
+                        school_year(col("YEARSTART")).alias("SCHOOLYEAR"),
+                        (rand(7) * 1000).cast(FloatType()).alias("TOTAL"),
+                        date_add(to_date(concat(col("YEARSTART").cast("string"), lit("-09-01"))),
+                                 (col("id") % 300).cast(IntegerType())).alias("DATEFACTURE"))
+
+def current_year_source():
+    # 10% of the current year's rows changed and 5% new keys
+    current = school_year(lit(merge_current_year))
+    return spark.range(int(merge_rows_per_year * 0.15)) \
+                .select((lit(merge_current_year * 10000000000) + col("id") * 10).alias("KEYVALIDATIONID"),
+                        current.alias("SCHOOLYEAR"),
+                        (rand(11) * 1000).cast(FloatType()).alias("TOTAL"),
+                        to_date(lit(f"{merge_current_year}-10-01")).alias("DATEFACTURE"))
+
+def time_merge(table_name: str, condition: str):
+    target = DeltaTable.forName(spark, table_name)
+    start = time.perf_counter()
+    target.alias("t").merge(current_year_source().alias("s"), condition) \
+          .whenMatchedUpdateAll(condition="t.TOTAL <> s.TOTAL") \
+          .whenNotMatchedInsertAll() \
+          .execute()
+    elapsed = time.perf_counter() - start
+    metrics = target.history(1).select("operationMetrics").first()[0]
+    return elapsed, int(metrics.get("numTargetFilesAdded", 0)), int(metrics.get("numTargetRowsCopied", 0))
+
+
+merge_layouts = {
+    "flat": ([], "t.KEYVALIDATIONID = s.KEYVALIDATIONID"),
+    "partitioned": (["SCHOOLYEAR"], f"t.SCHOOLYEAR IN ('{merge_current_year}-{merge_current_year + 1}') "
+                                    "AND t.SCHOOLYEAR = s.SCHOOLYEAR AND t.KEYVALIDATIONID = s.KEYVALIDATIONID")
+}
+
+merge_results = []
+for years in merge_history_years:
+    facts = synthetic_facts(years)
+    for layout, (partition_cols, condition) in merge_layouts.items():
+        table_name = f"bench_merge_{layout}"
+        facts.write.mode("overwrite").option("overwriteSchema", "true").partitionBy(*partition_cols).saveAsTable(table_name)
+        merge_sec, files_added, rows_copied = time_merge(table_name, condition)
+        merge_results.append({
+            "benchmark": "fact_merge",
+            "variant": layout,
+            "years": years,
+            "rows": merge_rows_per_year * years,
+            "merge_sec": float(f"{merge_sec:.3f}"),
+            "files_added": files_added,
+            "rows_copied": rows_copied
+        })
+        print(f"{layout} years={years}: merge {merge_sec:.3f}s, {rows_copied} rows rewritten")
+        spark.sql(f"DROP TABLE IF EXISTS {table_name}")
+
+display(spark.createDataFrame(merge_results).orderBy("years", "variant"))
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+run_ts = datetime.now(ZoneInfo("America/New_York"))
+
+mssparkutils.fs.put(f"{BENCH_FOLDER}/cleanup_results.json",
+                    json.dumps({"run_ts": run_ts.isoformat(), "results": cleanup_results}, indent=2),
+                    overwrite=True)
+
+mssparkutils.fs.put(f"{BENCH_FOLDER}/merge_results.json",
+                    json.dumps({"run_ts": run_ts.isoformat(), "results": merge_results}, indent=2),
+                    overwrite=True)
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
@@ -32,13 +32,18 @@ from pyspark.sql.types import *
 from pyspark.sql.functions import *
 from pyspark.sql.window import *
 from delta.tables import DeltaTable
-from functools import reduce
-from operator import or_
 from datetime import datetime, timezone
 from notebookutils import mssparkutils
 from zoneinfo import ZoneInfo 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pyspark import StorageLevel
+import threading
+import urllib.request
+import math
+import re
 import uuid
 import json
+import time
 
 # METADATA ********************
 
@@ -50,10 +55,76 @@ import json
 # CELL ********************
 
 BRONZE_BASE = "abfss://LISE@onelake.dfs.fabric.microsoft.com/LH_BRONZE.Lakehouse/Files"
+# Defaults to the Tables folder next to BRONZE_BASE
+BRONZE_TABLES = None
+PIPELINE_RUN_ID = None
+BATCH_ID = None
+TRIGGER_TYPE = "Manual"
+GOLD_PUBLISHED_AT = None
+# Comma-separated school years ("2024-2025") and Silver tables ("dim_classes,fact_factures_eleves");
+# either one limits the run to those year partitions or tables and the transforms feeding them
+SCHOOL_YEARS = ""
+TABLES = ""
 
-def p(year: str, filename: str) -> str:
-    return f"{BRONZE_BASE}/Lise_Data/{year}/{filename}"
 
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+# Derived here rather than in the parameters cell, which runs before BRONZE_BASE is injected
+BRONZE_TABLES = BRONZE_TABLES or BRONZE_BASE.rsplit("/", 1)[0] + "/Tables"
+STAGE_METRICS_TABLE = "silver_stage_metrics"
+SPARK_IO_METRICS = ["shuffleReadBytes", "shuffleWriteBytes", "memoryBytesSpilled", "diskBytesSpilled", "outputBytes"]
+
+run_id = PIPELINE_RUN_ID or str(uuid.uuid4())
+stage_records = []
+stage_lock = threading.Lock()
+
+def start_stage(stage, target):
+    group = f"{run_id}:{stage}:{target}"
+    spark.sparkContext.setJobGroup(group, f"{stage} {target}")
+    return {"stage": stage, "target": target, "group": group, "start": time.perf_counter()}
+
+def end_stage(token, status="Succeeded", error=None, rows=None, bytes_written=None, files_written=None):
+    sc = spark.sparkContext
+    sc.setLocalProperty("spark.jobGroup.id", None)
+    sc.setJobDescription(None)
+    token.update({
+        "durationSec": time.perf_counter() - token.pop("start"),
+        "finishedAt": datetime.now(timezone.utc),
+        "status": status,
+        "error": error,
+        "rows": rows,
+        "bytes": bytes_written,
+        "files": files_written
+    })
+    with stage_lock:
+        stage_records.append(token)
+
+def spark_io(group):
+    sc = spark.sparkContext
+    tracker = sc.statusTracker()
+    job_ids = sorted(tracker.getJobIdsForGroup(group))
+    stage_ids = sorted({stage_id for job_id in job_ids if (info := tracker.getJobInfo(job_id)) for stage_id in info.stageIds})
+    totals = dict.fromkeys(SPARK_IO_METRICS, 0)
+    for stage_id in stage_ids:
+        try:
+            url = f"{sc.uiWebUrl}/api/v1/applications/{sc.applicationId}/stages/{stage_id}"
+            with urllib.request.urlopen(url, timeout=10) as response:
+                attempts = json.load(response)
+        except Exception as e:
+            print(f"Stage {stage_id} metrics unavailable: {e}")
+            totals = dict.fromkeys(SPARK_IO_METRICS, None)
+            break
+        for attempt in attempts:
+            for metric in SPARK_IO_METRICS:
+                totals[metric] += attempt.get(metric, 0)
+    return job_ids, stage_ids, totals
 
 # METADATA ********************
 
@@ -64,60 +135,183 @@ def p(year: str, filename: str) -> str:
 
 # CELL ********************
 
-paths = {
-    "2023-2024": {
-        "niveaux":             p("2023-2024", "COM_NIVEAU_2324.csv"),
-        "etablissements":      p("2023-2024", "COM_ETABLISSEMENT_2324.csv"),
-        "classes":             p("2023-2024", "COM_CLASSES_2324.csv"),
-        "foyers":              p("2023-2024", "COM_FOYER_2324.csv"),
-        "responsables":        p("2023-2024", "COM_RESPONSABLES_2324.csv"),
-        "professions":         p("2023-2024", "TAB_CSP_2324.csv"),
-        "eleves":              p("2023-2024", "COM_ELEVES_2324.csv"),
-        "factures_niveaux":    p("2023-2024", "FAC_COMPTA_GENERAL_2324.csv"),
-        "factures_services":   p("2023-2024", "FAC_HISTO_LIGNE_2324.csv"),
-        "factures_familles":   p("2023-2024", "FAC_HISTO_FAMILLE_2324.csv"),
-        "factures_eleves":     p("2023-2024", "FAC_HISTO_ELEVE_2324.csv"),
-        "factures_validations":p("2023-2024", "FAC_VALIDATION_2324.csv"),
-        "personnels":          p("2023-2024", "COM_PERSONNELS_2324.csv"),
-        "professeurs":         p("2023-2024", "COM_PROFS_PRINCIPAUX_2324.csv"),
-        "pays":                p("2023-2024", "TAB_PAYS_2324.csv"),
-    },
-    "2024-2025": {
-        "niveaux":             p("2024-2025", "COM_NIVEAU_2425.csv"),
-        "etablissements":      p("2024-2025", "COM_ETABLISSEMENT_2425.csv"),
-        "classes":             p("2024-2025", "COM_CLASSES_2425.csv"),
-        "foyers":              p("2024-2025", "COM_FOYER_2425.csv"),
-        "responsables":        p("2024-2025", "COM_RESPONSABLES_2425.csv"),
-        "professions":         p("2024-2025", "TAB_CSP_2425.csv"),
-        "eleves":              p("2024-2025", "COM_ELEVES_2425.csv"),
-        "factures_niveaux":    p("2024-2025", "FAC_COMPTA_GENERAL_2425.csv"),
-        "factures_services":   p("2024-2025", "FAC_HISTO_LIGNE_2425.csv"),
-        "factures_familles":   p("2024-2025", "FAC_HISTO_FAMILLE_2425.csv"),
-        "factures_eleves":     p("2024-2025", "FAC_HISTO_ELEVE_2425.csv"),
-        "factures_validations":p("2024-2025", "FAC_VALIDATION_2425.csv"),
-        "personnels":          p("2024-2025", "COM_PERSONNELS_2425.csv"),
-        "professeurs":         p("2024-2025", "COM_PROFS_PRINCIPAUX_2425.csv"),
-        "pays":                p("2024-2025", "TAB_PAYS_2425.csv"),
-    },
-    "2025-2026": {
-        "niveaux":             p("2025-2026", "COM_NIVEAU.csv"),
-        "etablissements":      p("2025-2026", "COM_ETABLISSEMENT.csv"),
-        "classes":             p("2025-2026", "COM_CLASSES.csv"),
-        "foyers":              p("2025-2026", "COM_FOYER.csv"),
-        "responsables":        p("2025-2026", "COM_RESPONSABLES.csv"),
-        "professions":         p("2025-2026", "TAB_CSP.csv"),
-        "eleves":              p("2025-2026", "COM_ELEVES.csv"),
-        "factures_niveaux":    p("2025-2026", "FAC_COMPTA_GENERAL.csv"),
-        "factures_services":   p("2025-2026", "FAC_HISTO_LIGNE.csv"),
-        "factures_familles":   p("2025-2026", "FAC_HISTO_FAMILLE.csv"),
-        "factures_eleves":     p("2025-2026", "FAC_HISTO_ELEVE.csv"),
-        "factures_validations":p("2025-2026", "FAC_VALIDATION.csv"),
-        "personnels":          p("2025-2026", "COM_PERSONNELS.csv"),
-        "professeurs":         p("2025-2026", "COM_PROFS_PRINCIPAUX.csv"),
-        "pays":                p("2025-2026", "TAB_PAYS.csv"),
-    }
+BRONZE_MANIFEST_FILE = f"{BRONZE_BASE}/Watermarks/manifest.json"
+MANIFEST_FILE = "Files/Watermarks/manifest.json"
+# PL_SILVER and NB_SILVER_STREAM both run this notebook; a run that dies before releasing the lock
+# blocks the next ones until it is this old
+RUN_LOCK_FILE = "Files/Watermarks/silver_run.lock"
+RUN_LOCK_TTL_SEC = 3 * 3600
+
+def load_manifest(path: str) -> dict:
+    if not mssparkutils.fs.exists(path):
+        return {}
+    return json.loads(mssparkutils.fs.head(path, 10 * 1024 * 1024))
+
+def acquire_run_lock():
+    now = datetime.now(timezone.utc)
+    if mssparkutils.fs.exists(RUN_LOCK_FILE):
+        holder = json.loads(mssparkutils.fs.head(RUN_LOCK_FILE, 1024 * 1024))
+        age = (now - datetime.fromisoformat(holder["acquiredAt"])).total_seconds()
+        if age < RUN_LOCK_TTL_SEC:
+            raise RuntimeError(f"Silver run {holder['run_id']} ({holder['trigger']}) is still in progress, "
+                               f"started {age:.0f}s ago")
+        print(f"Lock of Silver run {holder['run_id']} expired after {age:.0f}s, taking it over")
+        mssparkutils.fs.rm(RUN_LOCK_FILE)
+    # Without overwrite, a run that took the lock in between makes this put fail
+    mssparkutils.fs.put(RUN_LOCK_FILE, json.dumps({"run_id": run_id, "trigger": TRIGGER_TYPE,
+                                                   "acquiredAt": now.isoformat()}), overwrite=False)
+
+def release_run_lock():
+    mssparkutils.fs.rm(RUN_LOCK_FILE)
+
+def parse_list(value) -> list:
+    # Pipelines pass "a,b"; local runs may pass a JSON list
+    items = value if isinstance(value, (list, tuple)) else str(value or "").split(",")
+    return [str(item).strip() for item in items if str(item).strip()]
+
+
+requested_years = parse_list(SCHOOL_YEARS)
+requested_tables = parse_list(TABLES)
+scoped_run = bool(requested_years or requested_tables)
+invalid_years = [year for year in requested_years if not re.fullmatch(r"\d{4}-\d{4}", year)]
+if invalid_years:
+    raise ValueError(f"SCHOOL_YEARS expects yyyy-yyyy values, got {invalid_years}")
+
+bronze_manifest = load_manifest(BRONZE_MANIFEST_FILE)
+previous_manifest = load_manifest(MANIFEST_FILE)
+
+changed_files = {tuple(key.split("/", 1)) for key, entry in bronze_manifest.items()
+                 if previous_manifest.get(key, {}).get("landedAt") != entry.get("landedAt")}
+changed_years = sorted({year for year, _ in changed_files})
+
+print(f"Changed source files: {sorted(changed_files)}")
+
+if scoped_run:
+    # Targeted reruns redo the requested years whether or not Bronze changed
+    changed_years = requested_years or sorted({key.split("/", 1)[0] for key in bronze_manifest})
+    print(f"Scoped run over school years {changed_years}, tables {requested_tables or 'all'}")
+
+# Also covers a scoped run before NB_BRONZE has landed any year
+if not changed_years:
+    mssparkutils.notebook.exit(json.dumps({
+        "status": "no_change",
+        "run_ts": datetime.now(ZoneInfo("America/New_York")).isoformat(),
+        "rows_processed": {},
+        "total_rows_processed": 0
+    }))
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+# Inputs of each transform cell below: a Bronze table ("bronze:<dataset>"), the VILLES file or an earlier cell
+transform_inputs = {
+    "new_class_rows": ["bronze:classes"],
+    "villes": ["csv:villes"],
+    "services": [],
+    "regimes": [],
+    "etablissements": ["bronze:etablissements"],
+    "niveaux": ["bronze:niveaux"],
+    "classes": ["new_class_rows"],
+    "foyers": ["bronze:foyers", "villes"],
+    "professions": ["bronze:professions"],
+    "pays": ["bronze:pays"],
+    "personnels": ["bronze:personnels", "bronze:professeurs", "pays", "classes"],
+    "responsables": ["bronze:responsables", "foyers"],
+    "ecoliers": ["bronze:eleves", "bronze:factures_eleves", "classes", "regimes"],
+    "dates": [],
+    "school_years": [],
+    "factures_familles": ["bronze:factures_familles", "responsables"],
+    "factures_eleves": ["bronze:factures_eleves", "factures_familles"],
+    "factures_services": ["bronze:factures_services", "services", "factures_eleves"],
+    "factures_niveaux": ["bronze:factures_niveaux", "niveaux"],
+    "factures_validations": ["bronze:factures_validations", "factures_familles"]
 }
 
+# Transform cell building each Silver table
+table_transforms = {
+    "dim_classes": "classes",
+    "dim_classes_targets": "classes",
+    "dim_dates": "dates",
+    "dim_foyers": "foyers",
+    "dim_villes": "villes",
+    "dim_services": "services",
+    "dim_service_codes": "services",
+    "dim_etablissements": "etablissements",
+    "dim_niveaux": "niveaux",
+    "dim_professions": "professions",
+    "dim_personnels": "personnels",
+    "dim_professeurs": "personnels",
+    "dim_staff": "personnels",
+    "dim_pays": "pays",
+    "dim_regimes": "regimes",
+    "dim_enfants": "ecoliers",
+    "dim_eleves": "ecoliers",
+    "dim_parents": "responsables",
+    "dim_responsables": "responsables",
+    "dim_school_years": "school_years",
+    "fact_factures_eleves": "factures_eleves",
+    "fact_factures_niveaux": "factures_niveaux",
+    "fact_factures_familles": "factures_familles",
+    "fact_factures_services": "factures_services",
+    "fact_factures_validations": "factures_validations"
+}
+
+fact_key_cols = {
+    "fact_factures_eleves": ["KEYELEVEID", "KEYRESPONSABLEID", "KEYVALIDATIONID"],
+    "fact_factures_niveaux": ["IDNIVEAU", "KEYRESPONSABLEID", "KEYVALIDATIONID"],
+    "fact_factures_familles": ["KEYRESPONSABLEID", "KEYVALIDATIONID"],
+    "fact_factures_services": ["KEYELEVEID", "KEYRESPONSABLEID", "KEYVALIDATIONID"],
+    "fact_factures_validations": ["KEYVALIDATIONID"]
+}
+
+FACT_PARTITION_COL = "SCHOOLYEAR"
+
+def upstream(names) -> set:
+    needed, pending = set(), list(names)
+    while pending:
+        name = pending.pop()
+        if name not in needed:
+            needed.add(name)
+            pending.extend(transform_inputs.get(name, []))
+    return needed
+
+def fact_table_ready(table_name) -> bool:
+    # merge_table rewrites every year when it creates, rebuilds or re-partitions a fact table
+    if not spark.catalog.tableExists(table_name):
+        return False
+    target = DeltaTable.forName(spark, table_name)
+    return set(fact_key_cols[table_name]) <= set(target.toDF().columns) \
+        and target.detail().first()["partitionColumns"] == [FACT_PARTITION_COL]
+
+def in_scope(bronze_df):
+    # Facts only write the changed years, so their Bronze inputs are filtered on the SCHOOLYEAR
+    # partition column and the scan skips every other year's files
+    return bronze_df.filter(col("SCHOOLYEAR").isin(changed_years)) if prune_years else bronze_df
+
+
+unknown_tables = sorted(set(requested_tables) - set(table_transforms))
+if unknown_tables:
+    raise ValueError(f"Unknown Silver tables {unknown_tables}; expected some of {sorted(table_transforms)}")
+
+acquire_run_lock()
+
+run_tables = requested_tables or sorted(table_transforms)
+run_graph = upstream(table_transforms[table_name] for table_name in run_tables)
+run_transforms = sorted(name for name in run_graph if name in transform_inputs)
+run_datasets = sorted(name.split(":", 1)[1] for name in run_graph if name.startswith("bronze:"))
+
+# Until every fact table is in its merged layout, the facts read every year
+prune_years = scoped_run or all(fact_table_ready(table_name) for table_name in run_tables if table_name in fact_key_cols)
+
+print(f"Tables to write: {run_tables}")
+print(f"Transforms and Bronze datasets they need: {run_transforms}, {run_datasets}")
+print(f"Fact inputs read for school years: {changed_years if prune_years else 'all'}")
 
 # METADATA ********************
 
@@ -128,21 +322,16 @@ paths = {
 
 # CELL ********************
 
-def read_csv(year: str, dataset_name: str):
-    try:
-        path = paths[year][dataset_name]
-        df = spark.read.csv(path, header=True, sep=",", quote='"', escape='"', encoding="UTF-16LE", multiLine=True)
-        
-        clean_columns = [c.strip().replace("\uFEFF", "").replace('"', "").strip() for c in df.columns]
-        df = df.toDF(*clean_columns) 
-
-        for col_name in df.columns:
-            df = df.withColumn(
-                col_name,
-                regexp_replace(col(col_name), "[\uFEFF\x00-\x1F\x7F]", ""))
-               
-        df = df.withColumn("SCHOOLYEAR", lit(year)) \
+bronze_sources = {}
 
+def read_bronze(dataset_name: str):
+    # Reads and transforms only build lazy plans, so their Spark work is measured by the write stages
+    try:
+        path = f"{BRONZE_TABLES}/bronze_{dataset_name}"
+        df = spark.read.format("delta").load(path)
+        if dataset_name in run_datasets:
+            # Frames outside the run are never evaluated, so they stay out of the sizing
+            bronze_sources[dataset_name] = path
         print(f"Table at {path} read successfully")
         return df
 
@@ -150,26 +339,22 @@ def read_csv(year: str, dataset_name: str):
         print(f"Error reading at {path}:{e}")
         raise
 
-def union_dfs(dataset_name):
-    dfs = [read_csv(year, dataset_name) for year in paths]
-    return reduce(lambda a, b: a.unionByName(b, allowMissingColumns=True), dfs) if dfs else None
-    
-
-df_niveaux = union_dfs("niveaux")
-df_etablissements = union_dfs("etablissements")
-df_classes = union_dfs("classes")
-df_foyers = union_dfs("foyers")
-df_responsables = union_dfs("responsables")
-df_professions = union_dfs("professions")
-df_ecoliers = union_dfs("eleves")
-df_factures_niveaux = union_dfs("factures_niveaux")
-df_factures_services = union_dfs("factures_services")
-df_factures_familles = union_dfs("factures_familles")
-df_factures_eleves = union_dfs("factures_eleves")
-df_factures_validations = union_dfs("factures_validations")
-df_personnels = union_dfs("personnels")
-df_professeurs = union_dfs("professeurs")
-df_pays = union_dfs("pays")
+
+df_niveaux = read_bronze("niveaux")
+df_etablissements = read_bronze("etablissements")
+df_classes = read_bronze("classes")
+df_foyers = read_bronze("foyers")
+df_responsables = read_bronze("responsables")
+df_professions = read_bronze("professions")
+df_ecoliers = read_bronze("eleves")
+df_factures_niveaux = read_bronze("factures_niveaux")
+df_factures_services = read_bronze("factures_services")
+df_factures_familles = read_bronze("factures_familles")
+df_factures_eleves = read_bronze("factures_eleves")
+df_factures_validations = read_bronze("factures_validations")
+df_personnels = read_bronze("personnels")
+df_professeurs = read_bronze("professeurs")
+df_pays = read_bronze("pays")
 
 # METADATA ********************
 
@@ -180,17 +365,32 @@ df_pays = union_dfs("pays")
 
 # CELL ********************
 
-new_class_rows = [
-    Row(IDCLASSE=24, CL_CODE="5EG", CL_LIBELLE="5ème - Gamma", IDETABLISSEMENT=1, IDNIVEAU=3, CL_CLASSE_RECTORAT="5EME", SCHOOLYEAR="2024-2025"),
-    Row(IDCLASSE=25, CL_CODE="5EK", CL_LIBELLE="5ème - Kappa", IDETABLISSEMENT=1, IDNIVEAU=3, CL_CLASSE_RECTORAT="5EME", SCHOOLYEAR="2024-2025"),
-    Row(IDCLASSE=26, CL_CODE="6E", CL_LIBELLE="6ème", IDETABLISSEMENT=1, IDNIVEAU=3, CL_CLASSE_RECTORAT="6EME", SCHOOLYEAR="2024-2025")
-]
+TARGET_FILE_BYTES = 128 * 1024 * 1024
+TARGET_PARTITION_BYTES = 64 * 1024 * 1024
+MAX_SHUFFLE_PARTITIONS = 200
+
+def delta_bytes(path: str) -> int:
+    return spark.sql(f"DESCRIBE DETAIL delta.`{path}`").select("sizeInBytes").first()[0] or 0
+
+def bronze_datasets(table_name):
+    return {name.split(":", 1)[1] for name in upstream([table_transforms[table_name]]) if name.startswith("bronze:")}
+
+def output_files(table_name) -> int:
+    # A table is at most as large as the Bronze datasets it is built from
+    table_bytes = __builtins__.sum(bronze_sizes.get(dataset, 0) for dataset in bronze_datasets(table_name))
+    return __builtins__.max(1, math.ceil(table_bytes / TARGET_FILE_BYTES))
 
-df_classes = df_classes.select("IDCLASSE", "CL_CODE", "CL_LIBELLE", "IDETABLISSEMENT", "IDNIVEAU", "CL_CLASSE_RECTORAT", "SCHOOLYEAR")
 
-df_new_class_rows = spark.createDataFrame(new_class_rows, schema = df_classes.schema)
+bronze_sizes = {dataset_name: delta_bytes(path) for dataset_name, path in bronze_sources.items()}
+bronze_bytes = __builtins__.sum(bronze_sizes.values())
+shuffle_partitions = __builtins__.min(__builtins__.max(1, math.ceil(bronze_bytes / TARGET_PARTITION_BYTES)), MAX_SHUFFLE_PARTITIONS)
 
-df_classes = df_classes.unionByName(df_new_class_rows)
+spark.conf.set("spark.sql.shuffle.partitions", shuffle_partitions)
+spark.conf.set("spark.sql.adaptive.advisoryPartitionSizeInBytes", TARGET_PARTITION_BYTES)
+# Merges and partitioned writes bin their output files at write time (Fabric and OSS Delta names)
+spark.conf.set("spark.microsoft.delta.optimizeWrite.enabled", "true")
+spark.conf.set("spark.databricks.delta.optimizeWrite.enabled", "true")
+print(f"Bronze input {bronze_bytes} bytes, {shuffle_partitions} shuffle partitions")
 
 # METADATA ********************
 
@@ -201,24 +401,51 @@ df_classes = df_classes.unionByName(df_new_class_rows)
 
 # CELL ********************
 
-villes_schema = StructType([
-    StructField("VILLE", StringType(), True),
-    StructField("CODEPOSTAL", IntegerType(), True),
-    StructField("LATITUDE", DoubleType(), True),
-    StructField("LONGITUDE", DoubleType(), True),
-    StructField("DEPARTEMENT", StringType(), True),
-    StructField("PAYS", StringType(), True)
-])
-
-villes_path = "abfss://LISE@onelake.dfs.fabric.microsoft.com/LH_BRONZE.Lakehouse/Files/External_Data/VILLES.csv"
+CACHE_LEVEL = StorageLevel.MEMORY_AND_DISK
+
+# Silver tables reading each intermediate DataFrame, directly or through a later transform
+frame_consumers = {
+    "classes": ["dim_classes", "dim_professeurs", "dim_enfants", "dim_eleves"],
+    "personnels": ["dim_personnels", "dim_staff"],
+    "responsables": ["dim_parents", "dim_responsables", "fact_factures_familles", "fact_factures_eleves",
+                     "fact_factures_validations", "fact_factures_services"],
+    "ecoliers": ["dim_enfants", "dim_eleves"],
+    "factures_familles": ["fact_factures_familles", "fact_factures_eleves", "fact_factures_validations",
+                          "fact_factures_services"],
+    "factures_eleves": ["fact_factures_eleves", "fact_factures_services"]
+}
 
-window_villes = Window.orderBy(col("VILLE"))
+cached_frames = {}
+cache_report = {"storageLevel": str(CACHE_LEVEL), "peakMemBytes": 0, "peakDiskBytes": 0, "frames": {}}
+cache_lock = threading.Lock()
 
-df_villes = spark.read.csv(villes_path, schema= villes_schema, header = True, sep = ",", encoding="UTF-8") 
+def cache_usage():
+    infos = spark.sparkContext._jsc.sc().getRDDStorageInfo()
+    return {"memBytes": __builtins__.sum(i.memSize() for i in infos),
+            "diskBytes": __builtins__.sum(i.diskSize() for i in infos)}
 
-df_villes = df_villes.withColumn("IDVILLE", row_number().over(window_villes)) \
-                     .filter(col("DEPARTEMENT") == "GUADELOUPE") \
-                     .select("IDVILLE", "VILLE", "CODEPOSTAL", "LATITUDE", "LONGITUDE", "DEPARTEMENT", "PAYS")
+def share(frame_name, df, level=CACHE_LEVEL):
+    consumers = set(frame_consumers.get(frame_name, [])) & set(run_tables)
+    if len(consumers) < 2:
+        return df
+    df = df.persist(level)
+    cached_frames[frame_name] = {"df": df, "consumers": consumers}
+    print(f"Persisted {frame_name} for {sorted(consumers)}")
+    return df
+
+def release(table_name):
+    with cache_lock:
+        usage = cache_usage()
+        cache_report["peakMemBytes"] = __builtins__.max(cache_report["peakMemBytes"], usage["memBytes"])
+        cache_report["peakDiskBytes"] = __builtins__.max(cache_report["peakDiskBytes"], usage["diskBytes"])
+        for frame_name, entry in list(cached_frames.items()):
+            entry["consumers"].discard(table_name)
+            if entry["consumers"]:
+                continue
+            entry["df"].unpersist()
+            del cached_frames[frame_name]
+            cache_report["frames"][frame_name] = {"releasedAfter": table_name, **usage}
+            print(f"Unpersisted {frame_name} after writing {table_name}")
 
 # METADATA ********************
 
@@ -229,27 +456,7 @@ df_villes = df_villes.withColumn("IDVILLE", row_number().over(window_villes)) \
 
 # CELL ********************
 
-service_schema = StructType([
-    StructField("IDSERVICE", IntegerType(), True),
-    StructField("SERVICE", StringType(), True)
-])
-
-service_data = [
-    (1, "SCOLARITE"),
-    (2, "CANTINE"),
-    (3, "ETUDE"),
-    (4, "GARDERIE"),
-    (5, "VOYAGE"),
-    (6, "UNIFORME"),
-    (7, "SORTIE"),
-    (8, "PSG"),
-    (9, "FRAIS"),
-    (10, "CAMBRIDGE"),
-    (11, "BABY LISE"),
-    (12, "OUTDOOR"),
-    (13, "FOURNITURE")]
-
-df_services = spark.createDataFrame(service_data, schema = service_schema)
+%run NB_SILVER_TRANSFORMS
 
 # METADATA ********************
 
@@ -260,17 +467,7 @@ df_services = spark.createDataFrame(service_data, schema = service_schema)
 
 # CELL ********************
 
-regimes_schema = StructType([
-    StructField("IDREGIME", IntegerType(), True),
-    StructField("REGIME", StringType(), True)
-])
-
-regimes_data = [
-    (1, "DEMI-PENSIONNAIRE"),
-    (2, "EXTERNE")
-]
-
-df_regimes = spark.createDataFrame(regimes_data, schema = regimes_schema)
+df_classes = add_class_rows(df_classes)
 
 # METADATA ********************
 
@@ -281,11 +478,11 @@ df_regimes = spark.createDataFrame(regimes_data, schema = regimes_schema)
 
 # CELL ********************
 
-df_etablissements = df_etablissements.withColumn("IDETABLISSEMENT", col("IDETABLISSEMENT").cast("int")) \
-                                     .filter(col("IDETABLISSEMENT") != 3) \
-                                     .withColumn("ETABLISSEMENT", regexp_replace(col("ET_LIBELLE"), "L.I.S.E COLLEGE", "L.I.S.E PRIMARY"))\
-                                     .select(col("IDETABLISSEMENT").cast(IntegerType()), 
-                                             "ETABLISSEMENT")                              
+villes_path = f"{BRONZE_BASE}/External_Data/VILLES.csv"
+
+df_villes = spark.read.csv(villes_path, schema= villes_schema, header = True, sep = ",", encoding="UTF-8") 
+
+df_villes = transform_villes(df_villes)
 
 # METADATA ********************
 
@@ -296,24 +493,8 @@ df_etablissements = df_etablissements.withColumn("IDETABLISSEMENT", col("IDETABL
 
 # CELL ********************
 
-df_niveaux = df_niveaux.withColumn("NIVEAU", 
-                                   when(col("NI_CODE") == "MAT", "MATERNELLE")
-                                   .when(col("NI_CODE") == "PRIM", "PRIMAIRE")
-                                   .when(col("NI_CODE") == "AE", "ACTIVITES EXTRASCOLAIRES")
-                                   .when(col("NI_CODE") == "6E 5E 4E 3E", "COLLEGE")  
-                                   .otherwise(col("NI_CODE"))) \
-                        .withColumn("IDNIVEAU", 
-                                   when(col("NIVEAU") == "MATERNELLE", 1)
-                                   .when(col("NIVEAU") == "PRIMAIRE", 2)
-                                   .when(col("NIVEAU") == "COLLEGE", 3)
-                                   .when(col("NIVEAU") == "ACTIVITES EXTRASCOLAIRES", 4)) \
-                        .withColumn("IDETABLISSEMENT", 
-                                   when(col("NIVEAU").isin("MATERNELLE", "COLLEGE", "ACTIVITES EXTRASCOLAIRES"), 1) 
-                                   .otherwise(2)
-                                  )\
-                        .select(col("IDNIVEAU").cast(IntegerType()), 
-                                "NIVEAU",
-                                col("IDETABLISSEMENT").cast(IntegerType()))                              
+df_services = build_services(spark)
+df_service_codes = build_service_codes(spark)
 
 # METADATA ********************
 
@@ -324,49 +505,7 @@ df_niveaux = df_niveaux.withColumn("NIVEAU",
 
 # CELL ********************
 
-classes_primaire = ["CP", "CE1", "CE2", "CM1", "CM2"]
-classes_maternelle = ["TP", "PS", "MS", "GS"]
-classes_college = ["6EME", "5EME", "4EME", "3EME"]
-id_niveaux_academy = [9, 1, 3]
-old_classe_keys2425 =["2024-2025-9", "2024-2025-11"]
-
-
-df_classes = df_classes.withColumnRenamed("CL_CLASSE_RECTORAT", "CLASSE") \
-                       .withColumn("CLASSE", regexp_replace(col("CLASSE"), "6ÈME", "6EME")) \
-                       .withColumn("CLASSELIBELLE", split(col("CL_LIBELLE"), "-").getItem(1)) \
-                       .withColumn("IDNIVEAU", when(col("CLASSE").isin(classes_primaire), 2)
-                                               .when(col("CLASSE").isin(classes_maternelle), 1)
-                                               .when(col("CLASSE").isin(classes_college), 3)
-                                               .otherwise(4)) \
-                       .withColumn("IDETABLISSEMENT", when(col("IDNIVEAU").isin(id_niveaux_academy), 1).otherwise(2)) \
-                       .withColumn("CLASSE", when(col("IDCLASSE") == 20, "AE").otherwise(col("CLASSE"))) \
-                       .withColumn("CLASSELIBELLE", when(col("IDCLASSE") == 20, "Activités ExtraScolaires").otherwise(col("CLASSELIBELLE"))) \
-                       .withColumn("CLASSELIBELLE", coalesce(col("CLASSELIBELLE"), col("CLASSE"))) \
-                       .withColumn("CLASSELIBELLE", when(col("CLASSELIBELLE").isin(classes_college), lower(col("CLASSELIBELLE"))).otherwise(col("CLASSELIBELLE")))\
-                       .withColumn("IDETABLISSEMENT", when(col("IDCLASSE") == 20, 1).otherwise(col("IDETABLISSEMENT")))
-
-
-df_classes_targets = df_classes.withColumn("TARGETCOUNT", when(col("CLASSE")== "3EME", 10).otherwise(20)) \
-                              .withColumn("CLASSELIBELLE", coalesce(col("CLASSELIBELLE"), col("CLASSE"))) \
-                              .withColumn("TARGETCOUNT", when(col("CLASSE") == "AE", lit(None).cast(IntegerType())).otherwise(col("TARGETCOUNT"))) \
-                              .withColumn("MAXIMUMCOUNT", when(col("CLASSE") == "AE", lit(None).cast(IntegerType())).otherwise(22)) \
-                              .withColumn("KEYCLASSE", concat(col("SCHOOLYEAR"),
-                                                              lit("-"),
-                                                              col("IDCLASSE"))) \
-                              .filter(~col("KEYCLASSE").isin(old_classe_keys2425))
-
-
-df_classes_targets = df_classes_targets.select("KEYCLASSE",
-                                               col("IDCLASSE").cast(IntegerType()),
-                                               col("TARGETCOUNT").cast(IntegerType()),
-                                               col("MAXIMUMCOUNT").cast(IntegerType()),
-                                               "SCHOOLYEAR")  
-
-df_classes = df_classes.select(col("IDCLASSE").cast(IntegerType()), 
-                               "CLASSE", 
-                               "CLASSELIBELLE",
-                               col("IDNIVEAU").cast(IntegerType()),
-                               col("IDETABLISSEMENT").cast(IntegerType()))
+df_regimes = build_regimes(spark)
 
 # METADATA ********************
 
@@ -377,58 +516,7 @@ df_classes = df_classes.select(col("IDCLASSE").cast(IntegerType()),
 
 # CELL ********************
 
-communes_gwada = [
-    "LES ABYMES",
-    "ANSE BERTRAND",
-    "BAIE MAHAULT",
-    "BAILLIF",
-    "BASSE TERRE",
-    "BOUILLANTE",
-    "CAPESTERRE BELLE EAU",
-    "CAPESTERRE DE MARIE GALANTE",
-    "DESHAIES",
-    "LA DESIRADE",
-    "LE GOSIER",
-    "GOURBEYRE",
-    "GOYAVE",
-    "GRAND BOURG",
-    "HORS GUADELOUPE",
-    "LAMENTIN",
-    "MORNE A L EAU",
-    "LE MOULE",
-    "PETIT BOURG",
-    "PETIT CANAL",
-    "POINTE A PITRE",
-    "POINTE NOIRE",
-    "PORT LOUIS",
-    "SAINT CLAUDE",
-    "SAINT FRANCOIS",
-    "SAINT LOUIS",
-    "SAINTE ANNE",
-    "SAINTE ROSE",
-    "TERRE DE BAS",
-    "TERRE DE HAUT",
-    "TROIS RIVIERES",
-    "VIEUX FORT",
-    "VIEUX HABITANTS"
-]
-
-df_foyers = df_foyers.withColumn("VILLE", regexp_replace(col("VILLE"), "STE ", "SAINTE ")) \
-                     .withColumn("VILLE", regexp_replace(col("VILLE"), "ST ", "SAINT ")) \
-                     .withColumn("VILLE", regexp_replace(col("VILLE"), "Baie-Mahault", "BAIE MAHAULT")) \
-                     .withColumn("VILLE", regexp_replace(col("VILLE"), "BAIE-", "BAIE MAHAULT")) \
-                     .withColumn("VILLE", regexp_replace(col("VILLE"), "BAIE MAHAULTMAHAULT", "BAIE MAHAULT")) \
-                     .withColumn("VILLE", regexp_replace(col("VILLE"), "-", " ")) \
-                     .withColumn("VILLE", when(~col("VILLE").isin(communes_gwada), "HORS GUADELOUPE").otherwise(col("VILLE"))) \
-                     .withColumn("VILLE", upper(col("VILLE"))) \
-                     .filter(col("VILLE").isNotNull() & (trim(col("VILLE")) != "")) 
-
-df_foyers = df_foyers.join(broadcast(df_villes), on = "VILLE", how = "left") \
-                     .withColumn("IDVILLE", when(col("IDVILLE").isNull(), 33).otherwise(col("IDVILLE"))) \
-                     .withColumn("VILLE", when(col("VILLE").isNull(), "HORS GUADELOUPE").otherwise(col("VILLE"))) \
-                     .select(col("IDFOYER").cast(IntegerType()), 
-                             "VILLE",
-                             col("IDVILLE").cast(IntegerType()))
+df_etablissements = transform_etablissements(df_etablissements)
 
 # METADATA ********************
 
@@ -439,10 +527,7 @@ df_foyers = df_foyers.join(broadcast(df_villes), on = "VILLE", how = "left") \
 
 # CELL ********************
 
-df_professions = df_professions.withColumnRenamed("CSP_CODE", "IDPROFESSION")\
-                               .withColumnRenamed("CSP_LIBELLE", "PROFESSION") \
-                               .select(col("IDPROFESSION").cast(IntegerType()), 
-                                       "PROFESSION")                           
+df_niveaux = transform_niveaux(df_niveaux)
 
 # METADATA ********************
 
@@ -453,13 +538,11 @@ df_professions = df_professions.withColumnRenamed("CSP_CODE", "IDPROFESSION")\
 
 # CELL ********************
 
-df_pays = df_pays.withColumnRenamed("PA_CODE", "IDPAYS") \
-                 .withColumnRenamed("PA_PAYS", "PAYS") \
-                 .withColumnRenamed("PA_NATIONALITE", "NATIONALITE") \
-                 .select(col("IDPAYS").cast(IntegerType()),
-                         "PAYS",
-                         "NATIONALITE")
+df_classes = transform_classes(df_classes)
+
+df_classes_targets = build_classes_targets(df_classes)
 
+df_classes = share("classes", build_classes(df_classes))
 
 # METADATA ********************
 
@@ -470,8 +553,7 @@ df_pays = df_pays.withColumnRenamed("PA_CODE", "IDPAYS") \
 
 # CELL ********************
 
-def parse_date(colnames):
-    return when(trim(col(colnames)).isin("NULL", "", "0", "NaN", "InvalidDate", "00000000"), lit(None)).otherwise(to_date(trim(col(colnames)), "yyyyMMdd"))
+df_foyers = transform_foyers(df_foyers, df_villes)
 
 # METADATA ********************
 
@@ -482,7 +564,7 @@ def parse_date(colnames):
 
 # CELL ********************
 
-age_years = floor(months_between(current_date(), col("DATENAISSANCE")) / 12)
+df_professions = transform_professions(df_professions)
 
 # METADATA ********************
 
@@ -493,66 +575,7 @@ age_years = floor(months_between(current_date(), col("DATENAISSANCE")) / 12)
 
 # CELL ********************
 
-df_personnels = df_personnels.withColumnRenamed("PE_NOM", "NOM") \
-    .withColumnRenamed("PE_PRENOM", "PRENOM") \
-    .withColumnRenamed("PE_TYPE", "TYPE") \
-    .withColumnRenamed("PE_VILLE", "VILLE") \
-    .withColumnRenamed("PE_PAYS", "PAYS") \
-    .withColumnRenamed("PE_DATE_ENTREE", "DATEENTREE") \
-    .withColumnRenamed("PE_DATE_SORTIE", "DATESORTIE") \
-    .withColumnRenamed("PE_TELPORTABLE", "TELEPHONE") \
-    .withColumnRenamed("PE_EMAIL_PRO", "EMAIL") \
-    .withColumnRenamed("PE_NAISSANCE_DATE", "DATENAISSANCE") \
-    .withColumnRenamed("PE_NUMSECU", "SECURITESOCIALE") \
-    .withColumnRenamed("PE_BADGENUM", "BADGE") \
-    .withColumnRenamed("PE_IBAN", "NUMEROCOMPTE") \
-    .withColumn("NOM", when(col("IDPERSONNEL") == 18, "CLEDE" ).otherwise(col("NOM"))) \
-    .withColumn("DATEENTREE", parse_date("DATEENTREE")) \
-    .withColumn("DATESORTIE", parse_date("DATESORTIE")) \
-    .withColumn("DATENAISSANCE", parse_date("DATENAISSANCE")) \
-    .withColumn("TYPE", regexp_replace(col("TYPE"), "prof", "Enseignant")) \
-    .withColumn("TYPE", regexp_replace(col("TYPE"), "exterieur", "Agent")) \
-    .withColumn("TYPE", when(col("IDPERSONNEL").isin(70, 71), "Apprentie") 
-                      .when(col("IDPERSONNEL").isin(17, 33), "Cadre")
-                      .when(col("IDPERSONNEL").isin(22, 49), "Administration")
-                      .otherwise(col("TYPE"))) \
-    .withColumn("VILLE", regexp_replace(col("VILLE"), "STE ", "SAINTE ")) \
-    .withColumn("VILLE", regexp_replace(col("VILLE"), "ST ", "SAINT ")) \
-    .withColumn("VILLE", regexp_replace(col("VILLE"), "JARRY", "BAIE MAHAULT")) \
-    .withColumn("VILLE", regexp_replace(col("VILLE"), "-", "")) \
-    .withColumn("TELEPHONE", regexp_replace(col("TELEPHONE"), r"[\s-]", "")) \
-    .withColumn("TELEPHONE", regexp_replace(col("TELEPHONE"), r"^\+(590|596|594|33)", "0")) \
-    .withColumn("TELEPHONE", regexp_replace(col("TELEPHONE"), r"\?", "")) \
-    .withColumn("EMAIL", lower(concat(substring(trim(col("PRENOM")), 1, 1), lit("."), 
-                                      split(trim(col("NOM")), r"\s+").getItem(0),
-                                      lit("@kudzaisolutions.com")))) \
-    .withColumn("EMAIL", regexp_replace(col("EMAIL"), r"@.*$", "@kudzaisolutions.onmicrosoft.com")) \
-    .withColumn("AGE", when(col("DATENAISSANCE").isNotNull() & age_years.between(0,120), age_years).otherwise(lit(None))) \
-    .withColumn("KEYPERSONNEL", concat(col("SCHOOLYEAR"), lit("-"), col("IDPERSONNEL"))) 
-
-df_staff = df_personnels.select(
-    "KEYPERSONNEL",
-    col("IDPERSONNEL").cast(IntegerType()),
-    "VILLE",
-    "DATEENTREE",
-    "DATESORTIE",
-    col("TELEPHONE"),  
-    "EMAIL",
-    "DATENAISSANCE",
-    col("AGE").cast(IntegerType()))
-
-df_personnels = df_personnels.join(df_pays, on=(df_pays["IDPAYS"] == df_personnels["PE_NATIONALITE"]), how="left") \
-        .select(col("IDPERSONNEL").cast(IntegerType()),
-        "NOM",
-        "PRENOM",
-        "NATIONALITE",     
-        col("BADGE").cast(IntegerType()))
-
-df_professeurs = df_professeurs.join(df_classes, on = "IDCLASSE", how = "left") \
-                               .withColumnRenamed("IDPROFSPRINCIPAUX", "IDPROFESSEUR") \
-                               .select(col("IDPROFESSEUR").cast(IntegerType()),
-                                       col("IDPERSONNEL").cast(IntegerType()),
-                                        col("IDCLASSE").cast(IntegerType()))
+df_pays = transform_pays(df_pays)
 
 # METADATA ********************
 
@@ -563,79 +586,13 @@ df_professeurs = df_professeurs.join(df_classes, on = "IDCLASSE", how = "left")
 
 # CELL ********************
 
+df_personnels = share("personnels", transform_personnels(df_personnels))
+
+df_staff = build_staff(df_personnels)
+
+df_personnels = build_personnels(df_personnels, df_pays)
 
-banques_populaires = ["%1010 7%", "%1020 7%", "%1080 7%", "%1090 7%", "%1130 7%", "%1190 7%", "%1350 7%", "%1360 7%", "%1380 7%",
-"%1390 7%", "%1460 7%", "%1470 7%", "%1560 7%", "%1660 7%", "%1670 7%", "%1680 7%", "%1760 7%", "%1780 7%", "%1870 7%"]
-
-credit_agricole = ["%1020 6%", "%1400 6%", "%1100 6%", "%1020 6 %", "%1100 6%", "%1107 6%", "%1120 6%", "%1130 6%", "%1120 6%",
-"%1130 6%", "%1170 6%", "%1200 6%", "%1220 6%", "%1240 6%", "%1250 6%", "%1290 6%", "%1310 6%", "%1321 0%", "%1330 6%", "%1350 6%",
-"%1360 6%", "%1390 6%", "%1440 6%", "%1450 6%", "%1470 6%", "%1480 6%", "%1544 9%", "%1589 8%", "%1600 6%", "%1610 6%", "%1600 6%",
-"%1670 6%", "%1680 6%", "%1690 6%", "%1710 6%", "%1720 6%", "%1742 9%", "%1780 5%", "%1790 6%", "%1810 6%", "%1820 6%", "%1830 6%",
-"%1870 6%", "%1910 6%", "%1940 6%", "%1950 6%", "%1953 0%", "%1980 6%", "%1990 6%", "%3000 6%"]
-
-caisse_epargne = ["%1131 5%", "%1142 5%", "%1213 5%", "%1313 5%", "%1333 5%", "%1348 5%", "%1382 5%", "%1426 5%", "%1444 5%", "%1450 5%",
-"%1513 5%", "%1627 5%", "%1670 5%", "%1751 5%", "%1802 5%", "%1831 5%", "%1871 5%", "%1982 5%", "%1621 0"]
-
-bnp = ["%1149 8%", "%1172 9%", "%1307 8%", "%1308 8%", "%1540 8%", "%1566 8%", "%1593 8%", "%1607 8%", "%1793 9%", "%1802 0%", "%1802 9%",
-"%3000 4%", "%3059 8%", "%4019 8%", "%4132 9%", "%4191 9%"]
-
-credit_mutuel = ["%1027 8%", "%1162 8%", "%1180 8%", "%1542 9%", "%1545 9%", "%1548 9%", "%1551 9%", "%1554 9%", "%1558 9%", "%1562 9%",
-"%1574 9%", "%1582 9%", "%1589 9%", "%1595 9%", "%1608 8%", "%1615 9%", "%1617 9%", "%4553 9%"]
-
-cic = ["%1160 0%", "%1307 0%", "%1584 8%", "%1723 0%", "%3000 6%", "%3008 7%", "%4119 9%", "%3004 7%", "%1005 7%"]
-banque_postale = ["%1617 8%", "%2004 1%"]
-societe_generale = ["%1376 9%", "%1486 9%", "%1596 8%", "%1807 9%", "%1831 9%", "%1999 0%", "%3000 3%"]
-boursorama = ["%4061 8%"]
-qonto = ["%1695 8%", "%1659 8%"]
-lydia = ["%1759 8%"]
-revolut = ["%2823 3%"]
-lcl = ["%3000 2%", "%1009 6%"]
-monabanq = ["%1469 0%"]
-bforbank =["%1621 8%"]
-shine = ["%1741 8%"]
-
-df_responsables = df_responsables.withColumn("RE_CSP1", coalesce(col("RE_CSP1"), col("RE_CSP2"), lit(99))) \
-                                 .withColumnRenamed("RE_NOM1", "NOM") \
-                                 .withColumnRenamed("RE_PRENOM1", "PRENOM") \
-                                 .withColumnRenamed("RE_CSP1", "IDPROFESSION") \
-                                 .withColumnRenamed("RE_MODE_REGLEMENT", "REGLEMENT") \
-                                 .withColumnRenamed("RE_ENF_A_CHARGE", "ENFANTSACHARGE") \
-                                 .withColumnRenamed("RE_TELPORTABLE1", "TELEPHONE") \
-                                 .withColumnRenamed("RE_EMAILPERSO1", "EMAIL") \
-                                 .withColumnRenamed("RE_IBAN", "NUMEROCOMPTE") \
-                                 .withColumn("KEYRESPONSABLE", concat(col("SCHOOLYEAR"),
-                                                               lit("-"),
-                                                               col("IDRESPONSABLE"))) \
-                                 .withColumn("CODEPOSTAL", when(col("RE_CODEPOSTAL") == "H4V1H2", None).otherwise(col("RE_CODEPOSTAL"))) \
-                                 .join(df_foyers, on = "IDFOYER", how = "left")     
-
-df_responsables = df_responsables.withColumn("BANQUE", when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in credit_mutuel]),"CREDIT MUTUEL") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in banques_populaires]), "BANQUE POPULAIRE") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in credit_agricole]), "CREDIT AGRICOLE") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in caisse_epargne]), "CAISSE D'EPARGNE")\
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in bnp]), "BNP") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in cic]), "CIC") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in banque_postale]), "BANQUE POSTALE") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in societe_generale]), "SOCIETE GENERALE") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in boursorama]), "BOURSORAMA") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in qonto]), "QONTO") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in lydia]), "LYDIA") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in revolut]), "REVOLUT") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in lcl]), "LCL") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in monabanq]), "MONABANQ") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in bforbank]), "BFORBANK") \
-                                  .when(reduce(or_,[col("NUMEROCOMPTE").like(p) for p in shine]), "SHINE") \
-                                  .otherwise("AUTRES"))
-
-df_responsables = df_responsables.withColumn("TELEPHONE", regexp_replace(col("TELEPHONE"), r"[\s-]", "")) \
-                                 .withColumn("TELEPHONE", regexp_replace(col("TELEPHONE"), r"^\+(590|596|594|33)", "0")) \
-                                 .withColumn("TELEPHONE", regexp_replace(col("TELEPHONE"), r"\?", "")) 
-
-df_parents = df_responsables.withColumn("FULLNAME", concat(col("NOM"), lit(" "), col("PRENOM"))) \
-                            .select(col("IDRESPONSABLE").cast(IntegerType()), 
-                                    "NOM", 
-                                    "PRENOM",
-                                    "FULLNAME")
+df_professeurs = transform_professeurs(df_professeurs, df_classes)
 
 # METADATA ********************
 
@@ -646,39 +603,9 @@ df_parents = df_responsables.withColumn("FULLNAME", concat(col("NOM"), lit(" "),
 
 # CELL ********************
 
-df_ecoliers = df_ecoliers.withColumn("IDELEVE", when(col("IDELEVE")== 575, lit(668)).otherwise(col("IDELEVE")))
-
-df_ecoliers = df_ecoliers.join(df_factures_eleves, on=["IDELEVE", "SCHOOLYEAR"], how="left") \
-                         .join(broadcast(df_classes), df_ecoliers["EL_IDCLASSE"] == df_classes["IDCLASSE"], "left")\
-                         .join(broadcast(df_regimes), df_ecoliers["EL_IDREGIME"] == df_regimes["IDREGIME"], "left") \
-                         .withColumnRenamed("EL_NOM1", "NOM")\
-                         .withColumnRenamed("EL_PRENOM1", "PRENOM")\
-                         .withColumnRenamed("EL_SEXE", "SEXE")\
-                         .withColumnRenamed("EL_DATE_DE_NAISSANCE", "DATENAISSANCE") \
-                         .withColumnRenamed("EL_DATE_ENTREE", "DATEENTREE") \
-                         .withColumnRenamed("EL_DATE_SORTIE", "DATESORTIE") \
-                         .withColumnRenamed("EL_NATIONALITE1", "NATIONALITE") \
-                         .withColumnRenamed("EL_IDENT_NAT", "IDENTITENATIONALE") \
-                         .withColumn("DATEENTREE", parse_date("DATEENTREE")) \
-                         .withColumn("DATESORTIE", parse_date("DATESORTIE")) \
-                         .withColumn("DATENAISSANCE", parse_date("DATENAISSANCE")) \
-                         .withColumn("IDREGIME", when(col("EL_IDREGIME").isNull(), 2).otherwise(col("EL_IDREGIME"))) \
-                         .withColumn("REGIME", when(col("CLASSE") == "AE", "EXTERNE").otherwise(col("REGIME"))) \
-                         .withColumn("AGE", when(col("DATENAISSANCE").isNotNull() & age_years.between(0,120), age_years).otherwise(lit(None))) \
-                         .withColumn("KEYELEVE", concat(df_factures_eleves["SCHOOLYEAR"],
-                                                   lit("-"),
-                                                   col("IDELEVE")))
-
-df_enfants = df_ecoliers.withColumn("FULLNAME", concat(col("NOM"), lit(" "), col("PRENOM"))) \
-                        .select(col("IDELEVE").cast(IntegerType()), 
-                                "NOM", 
-                                "PRENOM", 
-                                "SEXE",
-                                "DATENAISSANCE",
-                                "AGE",
-                                "NATIONALITE",
-                                "IDENTITENATIONALE",
-                                "FULLNAME")
+df_responsables = share("responsables", transform_responsables(df_responsables, df_foyers))
+
+df_parents = build_parents(df_responsables)
 
 # METADATA ********************
 
@@ -689,31 +616,9 @@ df_enfants = df_ecoliers.withColumn("FULLNAME", concat(col("NOM"), lit(" "), col
 
 # CELL ********************
 
-start_date = "20220101"
-end_date   = "20301231"
-
-df_date_range = spark.createDataFrame([(start_date, end_date)], ["start_date", "end_date"])
-df_dates = df_date_range.select(
-    explode(sequence(to_date(col("start_date"), "yyyyMMdd"),
-                     to_date(col("end_date"), "yyyyMMdd"),
-                     expr("interval 1 day"))).alias("DATE"))
-
-window_dates = Window.orderBy("DATE")
-
-df_dates = df_dates.withColumn("CALENDARYEAR", year(col("DATE"))) \
-                   .withColumn("IDDATE", row_number().over(window_dates)) \
-                   .withColumn("CALENDARMONTH", month(col("DATE"))) \
-                   .withColumn("CALENDARDAY", dayofmonth(col("DATE"))) \
-                   .withColumn("MONTHNAME", date_format(col("DATE"), "MMMM")) \
-                   .withColumn("DAYNAME", date_format(col("DATE"), "EEEE")) \
-                   .withColumn("SCHOOLYEARSTART", when(month(col("DATE")) >= 8, year(col("DATE"))).otherwise(year(col("DATE")) -1)) \
-                   .withColumn("SCHOOLYEAREND", col("SCHOOLYEARSTART") + 1) \
-                   .withColumn("SCHOOLYEAR", concat(col("SCHOOLYEARSTART"),
-                                             lit("-"),
-                                             col("SCHOOLYEAREND"))) \
-                   .withColumn("SCHOOLYEARMONTH", when(month(col("DATE")) >= 9, month(col("DATE")) - 8).otherwise(month(col("DATE")) + 4)) \
-                   .withColumn("ISSCHOOLPERIOD", when((month(col("DATE")) >= 9) | (month(col("DATE")) <= 6), 1).otherwise(0)) \
-                   .select("IDDATE","DATE", "CALENDARYEAR", "CALENDARMONTH", "CALENDARDAY", "MONTHNAME", "DAYNAME", "SCHOOLYEAR", "ISSCHOOLPERIOD")
+df_ecoliers = share("ecoliers", transform_ecoliers(df_ecoliers, df_factures_eleves, df_classes, df_regimes))
+
+df_enfants = build_enfants(df_ecoliers)
 
 # METADATA ********************
 
@@ -724,24 +629,18 @@ df_dates = df_dates.withColumn("CALENDARYEAR", year(col("DATE"))) \
 
 # CELL ********************
 
-school_years_schema = StructType([
-    StructField("SCHOOLYEAR", StringType(), True),
-    StructField("SCHOOLYEARLIBELLE", StringType(), True)
-])
+df_dates = build_dates(spark)
 
-school_years_data = [
-    ("2021-2022", "SCHOOL YEAR 2021-2022"),
-    ("2022-2023", "SCHOOL YEAR 2022-2023"),
-    ("2023-2024", "SCHOOL YEAR 2023-2024"),
-    ("2024-2025", "SCHOOL YEAR 2024-2025"),
-    ("2025-2026", "SCHOOL YEAR 2025-2026"),
-    ("2026-2027", "SCHOOL YEAR 2026-2027"),
-    ("2027-2028", "SCHOOL YEAR 2027-2028"),
-    ("2028-2029", "SCHOOL YEAR 2028-2029"),
-    ("2029-2030", "SCHOOL YEAR 2029-2030")
-    ]
+# METADATA ********************
 
-df_school_years = spark.createDataFrame(school_years_data, schema = school_years_schema)
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+df_school_years = build_school_years(spark)
 
 # METADATA ********************
 
@@ -752,15 +651,7 @@ df_school_years = spark.createDataFrame(school_years_data, schema = school_years
 
 # CELL ********************
 
-df_factures_familles = df_factures_familles.withColumnRenamed("HF_APAYER_FACTURE", "TOTALFAMILLE") \
-                                           .withColumn("DATEFACTURE", to_date(col("HF_DATE_FACTURE"), "yyyyMMdd")) \
-                                           .withColumn("KEYRESPONSABLE", concat(col("SCHOOLYEAR"),
-                                                                    lit("-"),
-                                                                    col("IDRESPONSABLE"))) \
-                                           .withColumn("KEYVALIDATION", concat(col("SCHOOLYEAR"),
-                                                                        lit("-"),
-                                                                        col("IDVALIDATION"))) \
-                                           .join(df_responsables, on = ["KEYRESPONSABLE", "IDRESPONSABLE"], how = "left")                                 
+df_factures_familles = share("factures_familles", transform_factures_familles(in_scope(df_factures_familles), df_responsables))
 
 # METADATA ********************
 
@@ -771,33 +662,7 @@ df_factures_familles = df_factures_familles.withColumnRenamed("HF_APAYER_FACTURE
 
 # CELL ********************
 
-df_factures_eleves = df_factures_eleves.withColumn("HE_IDCLASSE", when((col("HE_IDCLASSE")== 11) & (col("SCHOOLYEAR")== "2024-2025"), 25) \
-                                       .when((col("HE_IDCLASSE")== 9) & (col("SCHOOLYEAR")== "2024-2025"), 24) \
-                                       .when((col("HE_IDCLASSE")== 23) & (col("SCHOOLYEAR") == "2024-2025"), 26) \
-                                       .otherwise(col("HE_IDCLASSE")))
-
-df_factures_eleves = df_factures_eleves.withColumn("IDELEVE", when(col("IDELEVE")== 575, lit(668)).otherwise(col("IDELEVE")))
-
-df_factures_eleves = df_factures_eleves.withColumnRenamed("HE_IDREGIME", "IDREGIME") \
-                                       .withColumnRenamed("HE_IDCLASSE", "IDCLASSE") \
-                                       .withColumnRenamed("HE_APAYER_ELEVE", "TOTALELEVE")\
-                                       .withColumn("KEYVALIDATION", concat(col("SCHOOLYEAR"),
-                                                                    lit("-"),
-                                                                    col("IDVALIDATION"))
-                                                                    .cast("string")) \
-                                       .withColumn("KEYRESPONSABLE", concat(col("SCHOOLYEAR"),
-                                                                    lit("-"),
-                                                                    col("IDRESPONSABLE"))
-                                                                    .cast("string")) \
-                                       .withColumn("KEYELEVE", concat(col("SCHOOLYEAR"),
-                                                               lit("-"),
-                                                               col("IDELEVE"))) \
-                                       .withColumn("KEYCLASSE", concat(col("SCHOOLYEAR"),
-                                                               lit("-"),
-                                                               col("IDCLASSE"))) \
-                                       .join(df_factures_familles, on = ["KEYVALIDATION", "IDVALIDATION", "KEYRESPONSABLE", "IDRESPONSABLE", "SCHOOLYEAR"], how = "left") \
-                                       .filter(col("IDELEVE") != 0) \
-                                       .withColumn("IDREGIME", when(col("IDREGIME") == 0, 2).otherwise(col("IDREGIME")))
+df_factures_eleves = share("factures_eleves", transform_factures_eleves(in_scope(df_factures_eleves), df_factures_familles))
 
 # METADATA ********************
 
@@ -808,57 +673,14 @@ df_factures_eleves = df_factures_eleves.withColumnRenamed("HE_IDREGIME", "IDREGI
 
 # CELL ********************
 
-voyage = ["CM2_TRIP", "CM2TRIP", "VOYAGE_LING_FLL", "VOYAGE_LING_DOMINICA", "VOYAGE_LING_FTL", "CM1VL", "VLMFL", "VLCM2", "VL_ATL", "VOYAGES"]
-cantine = ["REPAS_THANKSGIVING"]
-frais = ["FRAIS_INS", "FRAIS_REINSC", "FRAIS_REINSCR", "FRAISRETARD", "PENALITE","LMS", "ACCES_ED", "FRAISREJET" ]
-uniforme = ["JUPES", "UNIFORME", "POLO", "POLOS", "SHORT", "T_SHIRT", "SORCT", "JUPE"]
-etude = ["ACADEMIC_WEDNESDAY"]
-psg =["PSG_COMPLET", "PSG_DEMI_JOURNEE", "EXT_PSG_COMPLET", "EXT_PSG_DEMI"]
-sortie = ["SORTIES", "KAYAK", "CINETHEATRE_MILETOIL"]
-cambridge = ["CAMBDRIDGEEXAM", "CAMBRIDGEEXAM"]
-wanted_services =["FRAISRETARD", "VOYAGES"]
-services_from_lines = df_factures_services.select(col("HL_CODE_LIGNE").alias("SERVICE"))
-services_from_levels = df_factures_niveaux.filter(col("CG_POSTE_ANA").isin(wanted_services)) \
-                                          .select(col("CG_POSTE_ANA").alias("SERVICE"))
-
-all_services = services_from_lines.union(services_from_levels).distinct()
-
-df_factures_services = df_factures_services.drop("SERVICE") \
-                                           .join(all_services, df_factures_services["HL_CODE_LIGNE"] == all_services["SERVICE"], "left")
-
-
-df_factures_services = df_factures_services.withColumn("SERVICE", regexp_replace(col("SERVICE"), "BABY_LISE|EXT_BABYLISE", "BABY LISE")) \
-                                           .withColumn("SERVICE", regexp_replace(col("SERVICE"), "EXT_OUTDOOR|OUTDOOR", "OUTDOOR")) \
-                                           .withColumn("SERVICE", regexp_replace(col("SERVICE"), "FOURNITURES", "FOURNITURE")) 
-        
-df_factures_services = df_factures_services.withColumn("SERVICE",
-                                            when(col("SERVICE").isin(voyage), "VOYAGE") 
-                                            .when(col("SERVICE").isin(cantine), "CANTINE") 
-                                            .when(col("SERVICE").isin(uniforme), "UNIFORME") 
-                                            .when(col("SERVICE").isin(psg), "PSG") 
-                                            .when(col("SERVICE").isin(etude), "ETUDE")
-                                            .when(col("SERVICE").isin(frais), "FRAIS") 
-                                            .when(col("SERVICE").isin(sortie), "SORTIE")
-                                            .when(col("SERVICE").isin(cambridge), "CAMBRIDGE")
-                                            .otherwise(col("SERVICE"))) 
-
-df_factures_services = df_factures_services.withColumnRenamed("HL_QUANTITE", "QUANTITE") \
-                                           .withColumnRenamed("HL_PRIX", "PRIX") \
-                                           .withColumnRenamed("HL_REMISE_MT_AUTO", "REMISE") \
-                                           .withColumnRenamed("HL_APAYER_LIGNE", "TOTALSERVICE") \
-                                           .withColumn("KEYRESPONSABLE", concat(col("SCHOOLYEAR"),
-                                                                    lit("-"),
-                                                                    col("IDRESPONSABLE"))
-                                                                    .cast("string")) \
-                                           .withColumn("KEYVALIDATION", concat(col("SCHOOLYEAR"),
-                                                                        lit("-"),
-                                                                        col("IDVALIDATION"))
-                                                                        .cast("string")) \
-                                           .withColumn("KEYELEVE", concat(col("SCHOOLYEAR"),
-                                                                   lit("-"),
-                                                                   col("IDELEVE"))) \
-                                          .join(df_services, on = "SERVICE", how = "left") \
-                                          .join(df_factures_eleves, on = ["KEYELEVE", "IDELEVE", "KEYRESPONSABLE", "IDRESPONSABLE", "KEYVALIDATION", "IDVALIDATION", "SCHOOLYEAR"], how ="left") 
+unmapped_codes = []
+if "factures_services" in run_transforms:
+    unmapped_codes = [row.asDict() for row in unmapped_service_codes(df_factures_services.filter(col("SCHOOLYEAR").isin(changed_years)),
+                                                                       df_service_codes).orderBy(desc("LINES")).limit(50).collect()]
+if unmapped_codes:
+    print(f"Invoice line codes without a service mapping (version {SERVICE_CODES_VERSION}): {unmapped_codes}")
+
+df_factures_services = transform_factures_services(in_scope(df_factures_services), df_service_codes, df_factures_eleves)
 
 # METADATA ********************
 
@@ -869,21 +691,7 @@ df_factures_services = df_factures_services.withColumnRenamed("HL_QUANTITE", "QU
 
 # CELL ********************
 
-unwanted_niveaux = ["FRAISRETARD", "VOYAGES"]
-
-df_factures_niveaux = df_factures_niveaux.filter(~col("CG_POSTE_ANA").isin(unwanted_niveaux)) \
-                                         .withColumn("TOTALNIVEAU", (col("CG_CREDIT") - col("CG_DEBIT")))\
-                                         .withColumn("NIVEAU", regexp_replace(col("CG_POSTE_ANA"),"TPS", "MATERNELLE"))\
-                                         .withColumn("DATEFACTURE", to_date(col("CG_DATE_FACTURE"), "yyyyMMdd")) \
-                                         .withColumn("KEYRESPONSABLE", concat(col("SCHOOLYEAR"),
-                                                                    lit("-"),
-                                                                    col("IDRESPONSABLE"))
-                                                                    .cast("string")) \
-                                         .withColumn("KEYVALIDATION", concat(col("SCHOOLYEAR"),
-                                                                    lit("-"),
-                                                                    col("IDVALIDATION"))
-                                                                    .cast("string")) \
-                                         .join(broadcast(df_niveaux), on = "NIVEAU", how="left") 
+df_factures_niveaux = transform_factures_niveaux(in_scope(df_factures_niveaux), df_niveaux)
 
 # METADATA ********************
 
@@ -894,19 +702,7 @@ df_factures_niveaux = df_factures_niveaux.filter(~col("CG_POSTE_ANA").isin(unwan
 
 # CELL ********************
 
-df_factures_validations = df_factures_validations.withColumn("TYPEFACTURE", regexp_replace(col("VA_TYPE_FACTURE"), "Toutes", "Calculées")) \
-                                                 .withColumnRenamed("VA_NB_FACTURES", "NOMBREFACTURE") \
-                                                 .withColumnRenamed("VA_DATE_HEURE", "DATEVALIDATION") \
-                                                 .withColumn("DATEVALIDATION", regexp_replace(col("DATEVALIDATION"), "Le", "")) \
-                                                 .withColumn("DATEVALIDATION", regexp_replace(col("DATEVALIDATION"), "à", "")) \
-                                                 .withColumn("DATEVALIDATION", trim(col("DATEVALIDATION"))) \
-                                                 .withColumn("DATEVALIDATION", split(col("DATEVALIDATION"), " ").getItem(0)) \
-                                                 .withColumn("DATEVALIDATION", to_date(col("DATEVALIDATION"), "dd/MM/yyyy")) \
-                                                 .withColumn("KEYVALIDATION", concat(col("SCHOOLYEAR"),
-                                                                    lit("-"),
-                                                                    col("IDVALIDATION"))
-                                                                    .cast("string")) \
-                                                 .join(df_factures_familles, on=["KEYVALIDATION", "IDVALIDATION"], how = "left")                                               
+df_factures_validations = transform_factures_validations(in_scope(df_factures_validations), df_factures_familles)
 
 # METADATA ********************
 
@@ -918,8 +714,10 @@ df_factures_validations = df_factures_validations.withColumn("TYPEFACTURE", rege
 # CELL ********************
 
 df_factures_familles = df_factures_familles.select("KEYRESPONSABLE",
+                                                   "KEYRESPONSABLEID",
                                                    col("IDRESPONSABLE").cast(IntegerType()),
                                                    "KEYVALIDATION",
+                                                   "KEYVALIDATIONID",
                                                    col("IDVALIDATION").cast(IntegerType()),
                                                    col("IDFOYER").cast(IntegerType()), 
                                                    col("IDPROFESSION").cast(IntegerType()),
@@ -936,6 +734,7 @@ df_factures_familles = df_factures_familles.select("KEYRESPONSABLE",
 # CELL ********************
 
 df_responsables = df_responsables.select("KEYRESPONSABLE", 
+                                         "KEYRESPONSABLEID",
                                          col("IDRESPONSABLE").cast(IntegerType()),
                                          col("ENFANTSACHARGE").cast(DoubleType()),
                                          "REGLEMENT",
@@ -954,10 +753,13 @@ df_responsables = df_responsables.select("KEYRESPONSABLE",
 # CELL ********************
 
 df_factures_services = df_factures_services.select("KEYELEVE",
+                                                   "KEYELEVEID",
                                                    col("IDELEVE").cast(IntegerType()),
                                                    "KEYRESPONSABLE",
+                                                   "KEYRESPONSABLEID",
                                                    col("IDRESPONSABLE").cast(IntegerType()), 
                                                    "KEYVALIDATION",
+                                                   "KEYVALIDATIONID",
                                                    col("IDVALIDATION").cast(IntegerType()),  
                                                    col("IDSERVICE").cast(IntegerType()), 
                                                    col("QUANTITE").cast(FloatType()),
@@ -976,12 +778,16 @@ df_factures_services = df_factures_services.select("KEYELEVE",
 # CELL ********************
 
 df_factures_eleves = df_factures_eleves.select("KEYELEVE",
+                                               "KEYELEVEID",
                                                col("IDELEVE").cast(IntegerType()),                                               
                                                "KEYRESPONSABLE",
+                                               "KEYRESPONSABLEID",
                                                col("IDRESPONSABLE").cast(IntegerType()),  
                                                "KEYVALIDATION",
+                                               "KEYVALIDATIONID",
                                                col("IDVALIDATION").cast(IntegerType()),
                                                "KEYCLASSE",
+                                               "KEYCLASSEID",
                                                col("IDCLASSE").cast(IntegerType()),
                                                col("IDREGIME").cast(IntegerType()),  
                                                col("TOTALELEVE").cast(FloatType()), 
@@ -997,6 +803,7 @@ df_factures_eleves = df_factures_eleves.select("KEYELEVE",
 # CELL ********************
 
 df_eleves = df_ecoliers.select("KEYELEVE", 
+                               "KEYELEVEID",
                                col("IDELEVE").cast(IntegerType()), 
                                col("IDRESPONSABLE").cast(IntegerType()), 
                                "DATEENTREE", 
@@ -1014,8 +821,10 @@ df_eleves = df_ecoliers.select("KEYELEVE",
 
 df_factures_niveaux = df_factures_niveaux.select(col("IDNIVEAU").cast(IntegerType()), 
                                                  "KEYVALIDATION",
+                                                 "KEYVALIDATIONID",
                                                  col("IDVALIDATION").cast(IntegerType()),  
                                                  "KEYRESPONSABLE",
+                                                 "KEYRESPONSABLEID",
                                                  col("IDRESPONSABLE").cast(IntegerType()), 
                                                  col("TOTALNIVEAU").cast(FloatType()), 
                                                  "DATEFACTURE")
@@ -1030,6 +839,7 @@ df_factures_niveaux = df_factures_niveaux.select(col("IDNIVEAU").cast(IntegerTyp
 # CELL ********************
 
 df_factures_validations = df_factures_validations.select("KEYVALIDATION", 
+                                                         "KEYVALIDATIONID",
                                                          col("IDVALIDATION").cast(IntegerType()), 
                                                          "TYPEFACTURE", 
                                                          col("NOMBREFACTURE").cast(IntegerType()), 
@@ -1099,6 +909,7 @@ overwrite_tables = {
     "dim_foyers": df_foyers,
     "dim_villes": df_villes,
     "dim_services": df_services,
+    "dim_service_codes": df_service_codes,
     "dim_etablissements": df_etablissements,
     "dim_niveaux": df_niveaux,
     "dim_professions": df_professions,
@@ -1123,42 +934,252 @@ append_tables = {
     "fact_factures_validations": df_factures_validations
 }
 
-fact_key_cols = {
-    "fact_factures_eleves": ["KEYELEVE", "KEYRESPONSABLE", "KEYVALIDATION"],
-    "fact_factures_niveaux": ["IDNIVEAU", "KEYRESPONSABLE", "KEYVALIDATION"],
-    "fact_factures_familles": ["KEYRESPONSABLE", "KEYVALIDATION"],
-    "fact_factures_services": ["KEYELEVE", "KEYRESPONSABLE", "KEYVALIDATION"],
-    "fact_factures_validations": ["KEYVALIDATION"]
+dim_key_cols = {
+    "dim_classes": ["IDCLASSE"],
+    "dim_dates": ["IDDATE"],
+    "dim_foyers": ["IDFOYER"],
+    "dim_villes": ["IDVILLE"],
+    "dim_services": ["IDSERVICE"],
+    "dim_service_codes": ["CODE"],
+    "dim_etablissements": ["IDETABLISSEMENT"],
+    "dim_niveaux": ["IDNIVEAU"],
+    "dim_professions": ["IDPROFESSION"],
+    "dim_personnels": ["IDPERSONNEL"],
+    "dim_professeurs": ["IDPROFESSEUR"],
+    "dim_staff": ["KEYPERSONNELID"],
+    "dim_pays": ["IDPAYS"],
+    "dim_regimes": ["IDREGIME"],
+    "dim_enfants": ["IDELEVE"],
+    "dim_eleves": ["KEYELEVEID"],
+    "dim_parents": ["IDRESPONSABLE"],
+    "dim_responsables": ["KEYRESPONSABLEID"],
+    "dim_classes_targets": ["KEYCLASSEID"],
+    "dim_school_years": ["SCHOOLYEAR"]
 }
 
 
-for table_name, overwrite_df in overwrite_tables.items():
-    try:
-        overwrite_df.write.mode("overwrite").saveAsTable(f"{table_name}")
-        print(f"Table {table_name} overwritten successfully.")
-    except Exception as e:
-        print(f"Error overwriting table {table_name}: {e}")
+WRITE_WORKERS = 6
+DELETE_MISSING_FACTS = False
+SYNC_DIMENSIONS = True
+DELETE_MISSING_DIMENSIONS = True
+CHANGE_FEED = True
+
+spark.conf.set("spark.databricks.delta.properties.defaults.enableChangeDataFeed", str(CHANGE_FEED).lower())
 
 def make_merge_condition(keys):
     return " AND ".join([f"t.{col} = s.{col}" for col in keys])
 
-for table_name, append_df in append_tables.items():
+def make_row_hash(alias, columns):
+    values = ", ".join([f"coalesce(cast({alias}.{c} as string), '<NULL>')" for c in columns])
+    return f"sha2(concat_ws('||', {values}), 256)"
+
+def overwrite_table(table_name, overwrite_df):
+    # Only a full rewrite has its file count set here; merges rely on optimized writes
+    overwrite_df.coalesce(output_files(table_name)) \
+                .write.mode("overwrite").option("overwriteSchema", "true").saveAsTable(f"{table_name}")
+    print(f"Table {table_name} overwritten successfully.")
+    return "overwrite"
+
+def with_fact_partition(fact_df):
+    return fact_df.withColumn(FACT_PARTITION_COL, substring(col("KEYVALIDATION"), 1, 9))
+
+def write_fact_table(table_name, fact_df):
+    fact_df.write.mode("overwrite") \
+           .option("overwriteSchema", "true") \
+           .partitionBy(FACT_PARTITION_COL) \
+           .saveAsTable(f"{table_name}")
+
+def migrate_fact_partitioning(table_name, target):
+    if target.detail().first()["partitionColumns"] == [FACT_PARTITION_COL]:
+        return
+    current = target.toDF()
+    if FACT_PARTITION_COL not in current.columns:
+        current = with_fact_partition(current)
+    write_fact_table(table_name, current)
+    print(f"Migrated {table_name} to {FACT_PARTITION_COL} partitions")
+
+def merge_table(table_name, append_df):
     keys = fact_key_cols.get(table_name)
     if not keys:
         raise ValueError(f"No business key defined for table {table_name}")
 
-    merge_condition = make_merge_condition(keys)
+    append_df = with_fact_partition(append_df)
+    years = ", ".join(f"'{year}'" for year in changed_years)
+    merge_condition = f"t.{FACT_PARTITION_COL} IN ({years}) AND t.{FACT_PARTITION_COL} = s.{FACT_PARTITION_COL} AND " \
+                      + make_merge_condition(keys)
+    value_cols = [c for c in append_df.columns if c not in keys]
+    hash_changed = f"{make_row_hash('t', value_cols)} <> {make_row_hash('s', value_cols)}"
+    changed_df = append_df.filter(col(FACT_PARTITION_COL).isin(changed_years)) \
+                          .dropDuplicates(keys)
 
     try:
         target = DeltaTable.forName(spark, table_name)
-        (target.alias("t").merge(append_df.alias("s"), merge_condition).whenNotMatchedInsertAll().execute())
+        if not set(keys) <= set(target.toDF().columns):
+            write_fact_table(table_name, append_df)
+            print(f"Rebuilt {table_name} with key columns {keys}")
+            return "create"
+        migrate_fact_partitioning(table_name, target)
+        target = DeltaTable.forName(spark, table_name)
+        merge = target.alias("t").merge(changed_df.alias("s"), merge_condition) \
+                      .whenMatchedUpdateAll(condition=hash_changed) \
+                      .whenNotMatchedInsertAll()
+        if DELETE_MISSING_FACTS:
+            merge = merge.whenNotMatchedBySourceDelete(condition=f"t.{FACT_PARTITION_COL} IN ({years})")
+        merge.execute()
         print(f"Upsert completed for '{table_name}' using key columns {keys}")
+        return "merge"
     except Exception as e:
-        if "is not a Delta table" in e.desc:
-            append_df.write.mode("overwrite").saveAsTable(f"{table_name}")
+        if "is not a Delta table" in str(e):
+            write_fact_table(table_name, append_df)
             print(f"Created new Delta table {table_name}")
+            return "create"
+        raise
+
+def replace_fact_partitions(table_name, append_df):
+    # Scoped runs rewrite the requested year partitions in place instead of merging
+    keys = fact_key_cols.get(table_name)
+    if not keys:
+        raise ValueError(f"No business key defined for table {table_name}")
+    years = ", ".join(f"'{year}'" for year in changed_years)
+    replaced_df = with_fact_partition(append_df).filter(col(FACT_PARTITION_COL).isin(changed_years)) \
+                                                .dropDuplicates(keys)
+    if spark.catalog.tableExists(table_name):
+        migrate_fact_partitioning(table_name, DeltaTable.forName(spark, table_name))
+    replaced_df.write.mode("overwrite") \
+               .option("replaceWhere", f"{FACT_PARTITION_COL} IN ({years})") \
+               .option("mergeSchema", "true") \
+               .partitionBy(FACT_PARTITION_COL) \
+               .saveAsTable(f"{table_name}")
+    print(f"Replaced {table_name} partitions {changed_years}")
+    return "replace"
+
+def sync_table(table_name, dim_df):
+    keys = dim_key_cols.get(table_name)
+    if keys:
+        # A NULL key never matches a merge, so such rows would be inserted again on every run
+        dim_df = dim_df.filter(" AND ".join(f"{c} IS NOT NULL" for c in keys))
+    if not keys or not spark.catalog.tableExists(table_name):
+        return overwrite_table(table_name, dim_df)
+
+    target = DeltaTable.forName(spark, table_name)
+    if set(target.toDF().columns) != set(dim_df.columns):
+        print(f"Schema of {table_name} changed, overwriting")
+        return overwrite_table(table_name, dim_df)
+
+    value_cols = [c for c in dim_df.columns if c not in keys]
+    source = dim_df.alias("s").select("*", expr(make_row_hash("s", value_cols)).alias("ROWHASH"))
+    current = target.toDF().alias("t").select(*keys, expr(make_row_hash("t", value_cols)).alias("ROWHASH"))
+    changed_df = source.join(current, on=keys + ["ROWHASH"], how="left_anti") \
+                       .drop("ROWHASH") \
+                       .withColumn("_REMOVED", lit(False))
+
+    # Keys gone from the source are deleted too, matched null-safely so NULL keys left by earlier
+    # syncs go as well. An empty Bronze input is more likely a failed upstream load, so it deletes nothing.
+    if DELETE_MISSING_DIMENSIONS and all(bronze_sizes.get(dataset, 0) for dataset in bronze_datasets(table_name)):
+        present = " AND ".join(f"c.{k} <=> n.{k}" for k in keys)
+        removed_df = current.alias("c").join(source.alias("n"), on=expr(present), how="left_anti") \
+                            .select(*keys) \
+                            .dropDuplicates(keys) \
+                            .withColumn("_REMOVED", lit(True))
+        changed_df = changed_df.unionByName(removed_df, allowMissingColumns=True)
+
+    # Cached so the emptiness check and the merge evaluate the source pipeline once
+    changed_df = changed_df.persist(CACHE_LEVEL)
+    try:
+        if changed_df.isEmpty():
+            print(f"Table {table_name} unchanged, skipped.")
+            return "skip"
+
+        columns = {c: f"s.{c}" for c in dim_df.columns}
+        target.alias("t").merge(changed_df.alias("s"), " AND ".join(f"t.{k} <=> s.{k}" for k in keys)) \
+              .whenMatchedDelete(condition="s._REMOVED") \
+              .whenMatchedUpdate(set=columns) \
+              .whenNotMatchedInsert(condition="NOT s._REMOVED", values=columns) \
+              .execute()
+    finally:
+        changed_df.unpersist()
+    print(f"Table {table_name} synced on {keys}.")
+    return "sync"
+
+def enable_change_feed(table_name):
+    if not CHANGE_FEED or not spark.catalog.tableExists(table_name):
+        return
+    properties = DeltaTable.forName(spark, table_name).detail().first()["properties"]
+    if properties.get("delta.enableChangeDataFeed") != "true":
+        spark.sql(f"ALTER TABLE {table_name} SET TBLPROPERTIES (delta.enableChangeDataFeed = true)")
+        print(f"Change data feed enabled on {table_name}")
+
+def commit_metrics(table_name):
+    last = DeltaTable.forName(spark, table_name).history(1).select("version", "operation", "operationMetrics").first()
+    metrics = {k: int(v) for k, v in (last["operationMetrics"] or {}).items() if v.isdigit()}
+    inserted = metrics.get("numTargetRowsInserted", 0)
+    updated = metrics.get("numTargetRowsUpdated", 0)
+    deleted = metrics.get("numTargetRowsDeleted", 0)
+    source_rows = metrics.get("numSourceRows", 0)
+
+    if last["operation"] == "MERGE":
+        rows = source_rows
+        bytes_added = metrics.get("numTargetBytesAdded", 0)
+    else:
+        rows = metrics.get("numOutputRows", 0)
+        bytes_added = metrics.get("numOutputBytes", metrics.get("numAddedBytes", 0))
+    # Only matched deletes come from source rows (sync_table's removed keys); not-matched-by-source
+    # deletes of facts are target rows
+    source_deleted = metrics.get("numTargetRowsMatchedDeleted", deleted)
+
+    return {
+        "version": last["version"],
+        "operation": last["operation"],
+        "rows": rows,
+        "inserted": inserted,
+        "updated": updated,
+        "deleted": deleted,
+        "unchanged": __builtins__.max(source_rows - inserted - updated - source_deleted, 0),
+        "bytes": bytes_added,
+        "files": metrics.get("numFiles", metrics.get("numTargetFilesAdded", 0))
+    }
+
+def run_write(table_name, write_fn, df, pool):
+    sc = spark.sparkContext
+    sc.setLocalProperty("spark.scheduler.pool", pool)
+    stage = start_stage("write", table_name)
+    start = time.perf_counter()
+    try:
+        enable_change_feed(table_name)
+        operation = write_fn(table_name, df)
+        duration = time.perf_counter() - start
+        if operation == "skip":
+            metrics = {"version": None, "operation": None, "rows": 0, "inserted": 0, "updated": 0,
+                       "deleted": 0, "unchanged": 0, "bytes": 0, "files": 0}
         else:
-            print(f"Error upserting '{table_name}': {e}")
+            metrics = commit_metrics(table_name)
+        end_stage(stage, rows=metrics["rows"], bytes_written=metrics["bytes"], files_written=metrics["files"])
+        return {"status": "succeeded", "operation": operation, "durationSec": duration, "error": None,
+                "metrics": metrics}
+    except Exception as e:
+        print(f"Error writing table {table_name}: {e}")
+        end_stage(stage, status="Failed", error=str(e)[:4000])
+        return {"status": "failed", "operation": None, "durationSec": time.perf_counter() - start, "error": str(e)[:4000]}
+    finally:
+        release(table_name)
+        sc.setLocalProperty("spark.scheduler.pool", None)
+
+
+dim_write = sync_table if SYNC_DIMENSIONS else overwrite_table
+fact_write = replace_fact_partitions if scoped_run else merge_table
+
+write_jobs = [(name, dim_write, df, "silver_dims") for name, df in overwrite_tables.items() if name in run_tables] + \
+             [(name, fact_write, df, "silver_facts") for name, df in append_tables.items() if name in run_tables]
+
+with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor:
+    futures = {executor.submit(run_write, *job): job[0] for job in write_jobs}
+    write_results = {futures[future]: future.result() for future in as_completed(futures)}
+
+for frame_name in list(cached_frames):
+    cached_frames.pop(frame_name)["df"].unpersist()
+
+failed_tables = sorted(name for name, outcome in write_results.items() if outcome["status"] == "failed")
+print(f"Write phase finished, failed tables: {failed_tables}")
 
 # METADATA ********************
 
@@ -1171,33 +1192,263 @@ for table_name, append_df in append_tables.items():
 
 # CELL ********************
 
-rows_processed = {
-    "dim_classes": df_classes.count(),
-    "dim_classes_targets": df_classes_targets.count(),
-    "dim_dates": df_dates.count(),
-    "dim_foyers": df_foyers.count(),
-    "dim_villes": df_villes.count(),
-    "dim_services": df_services.count(),
-    "dim_etablissements": df_etablissements.count(),
-    "dim_niveaux": df_niveaux.count(),
-    "dim_professions": df_professions.count(),
-    "dim_personnels": df_personnels.count(),
-    "dim_professeurs": df_professeurs.count(),
-    "dim_staff": df_staff.count(),
-    "dim_pays": df_pays.count(),
-    "dim_regimes": df_regimes.count(),
-    "dim_enfants": df_enfants.count(),
-    "dim_eleves": df_eleves.count(),
-    "dim_parents": df_parents.count(),
-    "dim_responsables": df_responsables.count(),
-    "dim_school_years": df_school_years.count(),
-    "fact_factures_eleves": df_factures_eleves.count(),
-    "fact_factures_niveaux": df_factures_niveaux.count(),
-    "fact_factures_familles": df_factures_familles.count(),
-    "fact_factures_services": df_factures_services.count(),
-    "fact_factures_validations": df_factures_validations.count()
+MAINTENANCE_ENABLED = True
+OPTIMIZE_MIN_SMALL_FILES = 8
+OPTIMIZE_SMALL_FILE_BYTES = 32 * 1024 * 1024
+VACUUM_RETENTION_HOURS = 168
+
+def table_layout(table_name):
+    detail = spark.sql(f"DESCRIBE DETAIL {table_name}").select("numFiles", "sizeInBytes").first()
+    return {"files": detail["numFiles"], "bytes": detail["sizeInBytes"]}
+
+def compaction_years(table_name, partitioned, years):
+    # Year partitions (None for an unpartitioned table) holding enough small files to be worth a rewrite;
+    # years limits the scan to the partitions this run wrote
+    files = spark.table(table_name)
+    if partitioned and years is not None:
+        files = files.filter(col(FACT_PARTITION_COL).isin(years))
+    group_cols = [FACT_PARTITION_COL] if partitioned else []
+    small = files.select(*group_cols, col("_metadata.file_path").alias("path"), col("_metadata.file_size").alias("size")) \
+                 .filter(col("size") < OPTIMIZE_SMALL_FILE_BYTES) \
+                 .distinct() \
+                 .groupBy(*group_cols).count() \
+                 .filter(col("count") >= OPTIMIZE_MIN_SMALL_FILES)
+    return [row[FACT_PARTITION_COL] if partitioned else None for row in small.collect()]
+
+def maintain_table(table_name, operation):
+    stage = start_stage("maintenance", table_name)
+    try:
+        before = table_layout(table_name)
+        partitioned = DeltaTable.forName(spark, table_name).detail().first()["partitionColumns"] == [FACT_PARTITION_COL]
+        # Merges and partition replaces only wrote the changed years, so closed years are left as they are
+        years = changed_years if partitioned and operation in ("merge", "replace") else None
+        targets = compaction_years(table_name, partitioned, years)
+
+        compacted = False
+        if targets:
+            years = ", ".join(f"'{year}'" for year in targets)
+            where = f" WHERE {FACT_PARTITION_COL} IN ({years})" if partitioned else ""
+            zorder_cols = fact_key_cols.get(table_name)
+            zorder = f" ZORDER BY ({', '.join(zorder_cols)})" if zorder_cols else ""
+            optimize_metrics = spark.sql(f"OPTIMIZE {table_name}{where}{zorder}").first()["metrics"]
+            compacted = optimize_metrics["numFilesRemoved"] > 0
+
+        if compacted:
+            # Vacuum rides on the same gate: compaction is what leaves most files behind, and the
+            # retention window still keeps the merges' removed files until a later compaction
+            spark.sql(f"VACUUM {table_name} RETAIN {VACUUM_RETENTION_HOURS} HOURS")
+
+        after = table_layout(table_name)
+    except Exception as e:
+        end_stage(stage, status="Failed", error=str(e)[:4000])
+        raise
+    end_stage(stage, bytes_written=after["bytes"], files_written=after["files"])
+    print(f"Maintenance {table_name}: {before['files']} files / {before['bytes']} bytes -> "
+          f"{after['files']} files / {after['bytes']} bytes")
+    return {"optimized": compacted, "partitions": targets if partitioned else None, "before": before, "after": after}
+
+
+maintenance_results = {}
+if MAINTENANCE_ENABLED:
+    for table_name, outcome in sorted(write_results.items()):
+        # A skipped sync wrote nothing, so it has no new small files to compact
+        if outcome["status"] != "succeeded" or outcome["operation"] == "skip":
+            continue
+        try:
+            maintenance_results[table_name] = maintain_table(table_name, outcome["operation"])
+        except Exception as e:
+            print(f"Maintenance failed for {table_name}: {e}")
+            maintenance_results[table_name] = {"error": str(e)[:4000]}
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+GOLD_SYNC_FILE = "Files/Watermarks/gold_sync.json"
+
+# Columns read by the LISE.Staging_* views and the key sp_UpdateInsertData updates on;
+# fact tables are insert-only in Gold, so their rows are identified by the row hash alone.
+gold_tables = {
+    "dim_classes": (["IDCLASSE", "CLASSE", "CLASSELIBELLE", "IDNIVEAU", "IDETABLISSEMENT"], ["IDCLASSE"]),
+    "dim_classes_targets": (["KEYCLASSE", "IDCLASSE", "TARGETCOUNT", "MAXIMUMCOUNT", "SCHOOLYEAR"], ["KEYCLASSE"]),
+    "dim_dates": (["IDDATE", "DATE", "CALENDARYEAR", "CALENDARMONTH", "CALENDARDAY", "MONTHNAME", "DAYNAME",
+                   "SCHOOLYEAR", "ISSCHOOLPERIOD"], ["DATE"]),
+    "dim_eleves": (["KEYELEVE", "IDELEVE", "IDRESPONSABLE", "DATEENTREE", "DATESORTIE"], ["KEYELEVE"]),
+    "dim_enfants": (["IDELEVE", "NOM", "PRENOM", "SEXE", "DATENAISSANCE", "AGE", "NATIONALITE", "IDENTITENATIONALE",
+                     "FULLNAME"], ["IDELEVE"]),
+    "dim_etablissements": (["IDETABLISSEMENT", "ETABLISSEMENT"], ["IDETABLISSEMENT"]),
+    "dim_foyers": (["IDFOYER", "VILLE", "IDVILLE"], ["IDFOYER"]),
+    "dim_niveaux": (["IDNIVEAU", "NIVEAU", "IDETABLISSEMENT"], ["IDNIVEAU"]),
+    "dim_parents": (["IDRESPONSABLE", "NOM", "PRENOM", "FULLNAME"], ["IDRESPONSABLE"]),
+    "dim_pays": (["IDPAYS", "PAYS", "NATIONALITE"], ["IDPAYS"]),
+    "dim_personnels": (["IDPERSONNEL", "NOM", "PRENOM", "NATIONALITE", "BADGE"], ["IDPERSONNEL"]),
+    "dim_professeurs": (["IDPROFESSEUR", "IDPERSONNEL", "IDCLASSE"], ["IDPROFESSEUR"]),
+    "dim_professions": (["IDPROFESSION", "PROFESSION"], ["IDPROFESSION"]),
+    "dim_regimes": (["IDREGIME", "REGIME"], ["IDREGIME"]),
+    "dim_responsables": (["KEYRESPONSABLE", "IDRESPONSABLE", "ENFANTSACHARGE", "REGLEMENT", "TELEPHONE", "EMAIL",
+                          "NUMEROCOMPTE", "BANQUE"], ["KEYRESPONSABLE"]),
+    "dim_school_years": (["SCHOOLYEAR", "SCHOOLYEARLIBELLE"], ["SCHOOLYEAR"]),
+    "dim_services": (["IDSERVICE", "SERVICE"], ["IDSERVICE"]),
+    "dim_staff": (["KEYPERSONNEL", "IDPERSONNEL", "VILLE", "DATEENTREE", "DATESORTIE", "TELEPHONE", "EMAIL",
+                   "DATENAISSANCE", "AGE"], ["KEYPERSONNEL"]),
+    "dim_villes": (["IDVILLE", "VILLE", "CODEPOSTAL", "LATITUDE", "LONGITUDE", "DEPARTEMENT", "PAYS"], ["IDVILLE"]),
+    "fact_factures_eleves": (["KEYELEVE", "IDELEVE", "KEYRESPONSABLE", "IDRESPONSABLE", "KEYVALIDATION", "IDVALIDATION",
+                              "KEYCLASSE", "IDCLASSE", "IDREGIME", "TOTALELEVE", "DATEFACTURE"], []),
+    "fact_factures_familles": (["KEYRESPONSABLE", "IDRESPONSABLE", "KEYVALIDATION", "IDVALIDATION", "IDFOYER",
+                                "IDPROFESSION", "TOTALFAMILLE", "DATEFACTURE"], []),
+    "fact_factures_niveaux": (["IDNIVEAU", "KEYVALIDATION", "IDVALIDATION", "KEYRESPONSABLE", "IDRESPONSABLE",
+                               "TOTALNIVEAU", "DATEFACTURE"], []),
+    "fact_factures_services": (["KEYELEVE", "IDELEVE", "KEYRESPONSABLE", "IDRESPONSABLE", "KEYVALIDATION", "IDVALIDATION",
+                                "IDSERVICE", "QUANTITE", "PRIX", "REMISE", "TOTALSERVICE", "DATEFACTURE"], []),
+    "fact_factures_validations": (["KEYVALIDATION", "IDVALIDATION", "TYPEFACTURE", "NOMBREFACTURE", "DATEVALIDATION"], [])
 }
 
+def parse_utc(value):
+    stamp = datetime.fromisoformat(re.sub(r"(\.\d{6})\d+", r"\1", value.replace("Z", "+00:00")))
+    return stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)
+
+def gold_applied(state):
+    # A Gold success finishing after the last sync means its deltas are in the warehouse
+    if not state.get("pending") or not GOLD_PUBLISHED_AT:
+        return False
+    return parse_utc(str(GOLD_PUBLISHED_AT)) >= parse_utc(state["synced_at"])
+
+def publish_delta(table_name, keys):
+    delta_table, snapshot_table = f"gold_delta_{table_name}", f"gold_snapshot_{table_name}"
+    if not spark.catalog.tableExists(delta_table):
+        return
+    identity = keys or ["ROWHASH"]
+    published = spark.table(delta_table).select(*keys, "ROWHASH").dropDuplicates(identity)
+    if not spark.catalog.tableExists(snapshot_table):
+        published.write.mode("overwrite").saveAsTable(snapshot_table)
+        return
+    merge = DeltaTable.forName(spark, snapshot_table).alias("t").merge(published.alias("s"), make_merge_condition(identity))
+    if keys:
+        merge = merge.whenMatchedUpdateAll()
+    merge.whenNotMatchedInsertAll().execute()
+
+silver_key_cols = {**dim_key_cols, **fact_key_cols}
+
+def table_version(table_name):
+    return DeltaTable.forName(spark, table_name).history(1).select("version").first()[0]
+
+def read_changes(table_name, since_version, until_version, keys):
+    # Latest insert, update or delete per key committed after since_version
+    changes = spark.read.format("delta") \
+                   .option("readChangeFeed", "true") \
+                   .option("startingVersion", since_version + 1) \
+                   .option("endingVersion", until_version) \
+                   .table(table_name) \
+                   .filter(col("_change_type") != "update_preimage")
+    latest = Window.partitionBy(*keys) \
+                   .orderBy(col("_commit_version").desc(), when(col("_change_type") == "delete", 1).otherwise(0))
+    return changes.withColumn("_change_rank", row_number().over(latest)) \
+                  .filter(col("_change_rank") == 1) \
+                  .drop("_change_rank")
+
+def gold_source(table_name, since_version, until_version):
+    if since_version is None:
+        return spark.table(table_name), "full"
+    if since_version >= until_version:
+        return spark.table(table_name).limit(0), "changes"
+    try:
+        changes = read_changes(table_name, since_version, until_version, silver_key_cols[table_name])
+        changes.limit(1).collect()
+    except Exception as e:
+        # Versions vacuumed away or written before the feed was enabled
+        print(f"Change feed of {table_name} unavailable since version {since_version}, reading the full table: {e}")
+        return spark.table(table_name), "full"
+    return changes.filter(col("_change_type") != "delete"), "changes"
+
+def stage_gold_delta(table_name, columns, keys, since_version):
+    delta_table, snapshot_table = f"gold_delta_{table_name}", f"gold_snapshot_{table_name}"
+    stage = start_stage("gold_sync", table_name)
+    try:
+        until_version = table_version(table_name)
+        source, mode = gold_source(table_name, since_version, until_version)
+        current = source.alias("c") \
+                       .select(*columns, expr(make_row_hash("c", columns)).alias("ROWHASH")) \
+                       .distinct()
+        if spark.catalog.tableExists(snapshot_table):
+            snapshot = spark.table(snapshot_table)
+            changed = current.join(snapshot, on=keys + ["ROWHASH"], how="left_anti")
+            if keys:
+                known = snapshot.select(*keys).distinct().withColumn("OPERATION", lit("U"))
+                changed = changed.join(known, on=keys, how="left").fillna("I", subset=["OPERATION"])
+            else:
+                changed = changed.withColumn("OPERATION", lit("I"))
+        else:
+            # Nothing published yet: dimension rows may already be in Gold, so stage them as updates
+            changed = current.withColumn("OPERATION", lit("U" if keys else "I"))
+
+        changed.select(*columns, "ROWHASH", "OPERATION").coalesce(1) \
+               .write.mode("overwrite").option("overwriteSchema", "true").saveAsTable(delta_table)
+        counts = {row["OPERATION"]: row["count"] for row in spark.table(delta_table).groupBy("OPERATION").count().collect()}
+        metrics = commit_metrics(delta_table)
+    except Exception as e:
+        end_stage(stage, status="Failed", error=str(e)[:4000])
+        raise
+    end_stage(stage, rows=metrics["rows"], bytes_written=metrics["bytes"], files_written=metrics["files"])
+    print(f"Gold delta {delta_table} from {mode} read up to version {until_version}: "
+          f"{counts.get('I', 0)} inserts, {counts.get('U', 0)} updates")
+    return {"inserts": counts.get("I", 0), "updates": counts.get("U", 0), "source": mode, "version": until_version}
+
+
+gold_state = load_manifest(GOLD_SYNC_FILE)
+gold_checkpoints = gold_state.get("consumed", {})
+gold_published = gold_applied(gold_state)
+if gold_published:
+    for table_name, (_, keys) in gold_tables.items():
+        publish_delta(table_name, keys)
+    gold_checkpoints = {**gold_checkpoints, **{table_name: outcome["version"]
+                                               for table_name, outcome in gold_state.get("tables", {}).items()
+                                               if "version" in outcome}}
+    mssparkutils.fs.put(GOLD_SYNC_FILE, json.dumps({**gold_state, "pending": False, "consumed": gold_checkpoints}, indent=2),
+                        overwrite=True)
+    print(f"Gold deltas of run {gold_state.get('run_id')} published to snapshots")
+
+gold_sync = {}
+with ThreadPoolExecutor(max_workers=WRITE_WORKERS) as executor:
+    futures = {executor.submit(stage_gold_delta, table_name, columns, keys, gold_checkpoints.get(table_name)): table_name
+               for table_name, (columns, keys) in gold_tables.items() if spark.catalog.tableExists(table_name)}
+    for future in as_completed(futures):
+        try:
+            gold_sync[futures[future]] = future.result()
+        except Exception as e:
+            print(f"Gold delta failed for {futures[future]}: {e}")
+            gold_sync[futures[future]] = {"error": str(e)[:4000]}
+
+mssparkutils.fs.put(GOLD_SYNC_FILE, json.dumps({
+    "run_id": run_id,
+    "synced_at": datetime.now(timezone.utc).isoformat(),
+    "pending": True,
+    "consumed": gold_checkpoints,
+    "tables": gold_sync
+}, indent=2), overwrite=True)
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+rows_processed = {name: outcome["metrics"]["rows"] for name, outcome in write_results.items() if outcome["status"] == "succeeded"}
+
+merge_metrics = {name: {k: outcome["metrics"][k] for k in ("inserted", "updated", "deleted", "unchanged")}
+                 for name, outcome in write_results.items()
+                 if outcome["status"] == "succeeded" and outcome["operation"] in ("merge", "sync")}
+
+skipped_tables = sorted(name for name, outcome in write_results.items() if outcome["operation"] == "skip")
+print(f"Unchanged tables skipped: {skipped_tables}")
+
 total_rows_processed = __builtins__.sum(rows_processed.values())
 print(f"Total rows processed: {total_rows_processed}")
 
@@ -1210,17 +1461,102 @@ print(f"Total rows processed: {total_rows_processed}")
 
 # CELL ********************
 
-run_id = str(uuid.uuid4())
+stage_metrics_schema = StructType([
+    StructField("RunID", StringType(), False),
+    StructField("BatchID", StringType(), True),
+    StructField("TriggerType", StringType(), True),
+    StructField("PipelineName", StringType(), False),
+    StructField("Layer", StringType(), False),
+    StructField("Stage", StringType(), False),
+    StructField("TargetObject", StringType(), False),
+    StructField("Status", StringType(), False),
+    StructField("ErrorMessage", StringType(), True),
+    StructField("FinishedAtUTC", TimestampType(), False),
+    StructField("DurationSec", DoubleType(), False),
+    StructField("RowsWritten", LongType(), True),
+    StructField("BytesWritten", LongType(), True),
+    StructField("FilesWritten", IntegerType(), True),
+    StructField("ThroughputMBps", DoubleType(), True),
+    StructField("JobIds", StringType(), True),
+    StructField("StageIds", StringType(), True),
+    StructField("ShuffleReadBytes", LongType(), True),
+    StructField("ShuffleWriteBytes", LongType(), True),
+    StructField("MemorySpilledBytes", LongType(), True),
+    StructField("DiskSpilledBytes", LongType(), True),
+    StructField("OutputBytes", LongType(), True)
+])
+
+stage_rows = []
+for record in stage_records:
+    job_ids, stage_ids, io = spark_io(record["group"])
+    bytes_written = record["bytes"] if record["bytes"] is not None else io["outputBytes"]
+    throughput = bytes_written / 1024 / 1024 / record["durationSec"] if bytes_written and record["durationSec"] else None
+    stage_rows.append((
+        run_id, BATCH_ID, TRIGGER_TYPE, "NB_SILVER", "Silver",
+        record["stage"],
+        record["target"] if record["stage"] == "write" else f"{record['stage']}:{record['target']}",
+        record["status"],
+        record["error"],
+        record["finishedAt"].replace(tzinfo=None),
+        float(record["durationSec"]),
+        record["rows"],
+        bytes_written,
+        record["files"],
+        throughput,
+        ",".join(map(str, job_ids)),
+        ",".join(map(str, stage_ids)),
+        io["shuffleReadBytes"],
+        io["shuffleWriteBytes"],
+        io["memoryBytesSpilled"],
+        io["diskBytesSpilled"],
+        io["outputBytes"]
+    ))
+
+spark.createDataFrame(stage_rows, schema = stage_metrics_schema) \
+     .write.mode("append").option("mergeSchema", "true").saveAsTable(STAGE_METRICS_TABLE)
+print(f"{len(stage_rows)} stage metrics rows written to {STAGE_METRICS_TABLE}")
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
 run_ts = datetime.now(ZoneInfo("America/New_York"))
 
 result = {
-    "status": "succeeded",
+    "status": "succeeded" if not failed_tables else "failed",
     "run_id": run_id,
     "run_ts": run_ts.isoformat(),
     "rows_processed": rows_processed,
-    "total_rows_processed": total_rows_processed
+    "total_rows_processed": total_rows_processed,
+    "merge_metrics": merge_metrics,
+    "skipped_tables": skipped_tables,
+    "stage_metrics_rows": len(stage_rows),
+    "maintenance": maintenance_results,
+    "gold_sync": gold_sync,
+    "gold_published": gold_published,
+    "changed_files": [f"{year}/{name}" for year, name in sorted(changed_files)],
+    "unmapped_service_codes": unmapped_codes,
+    "scope": {"school_years": changed_years, "tables": run_tables, "transforms": run_transforms,
+              "datasets": run_datasets} if scoped_run else None,
+    "write_results": write_results,
+    "cache": cache_report
 }
 
+# A scoped run leaves the manifest alone so the next full run still sees every Bronze change
+if not failed_tables and not scoped_run:
+    mssparkutils.fs.put(MANIFEST_FILE, json.dumps(bronze_manifest, indent=2), overwrite=True)
+
+release_run_lock()
+
+# Failing the activity keeps PL_SILVER from advancing the Silver watermark past the failed writes
+if failed_tables:
+    raise RuntimeError(f"Silver writes failed for {failed_tables}: {json.dumps(result, default=str)}")
+
 mssparkutils.notebook.exit(json.dumps(result))
 
 # METADATA ********************
@@ -0,0 +1,247 @@
+# Fabric notebook source
+
+# METADATA ********************
+
+# META {
+# META   "kernel_info": {
+# META     "name": "synapse_pyspark"
+# META   },
+# META   "dependencies": {
+# META     "lakehouse": {
+# META       "default_lakehouse": "b727fb41-33d0-41ec-90bd-dfc3c112f2b3",
+# META       "default_lakehouse_name": "LH_SILVER",
+# META       "default_lakehouse_workspace_id": "28e6a84a-1953-410e-8b52-272e6318afde",
+# META       "known_lakehouses": [
+# META         {
+# META           "id": "bfe479b8-2f70-44bc-84d5-dfa2ec50d321"
+# META         },
+# META         {
+# META           "id": "b727fb41-33d0-41ec-90bd-dfc3c112f2b3"
+# META         }
+# META       ]
+# META     },
+# META     "warehouse": {
+# META       "known_warehouses": []
+# META     }
+# META   }
+# META }
+
+
+# CELL ********************
+
+from pyspark.sql.types import *
+from pyspark.sql.functions import *
+from delta.tables import DeltaTable
+from datetime import datetime, timezone
+from notebookutils import mssparkutils
+from zoneinfo import ZoneInfo
+import uuid
+import json
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+BRONZE_BASE = "abfss://LISE@onelake.dfs.fabric.microsoft.com/LH_BRONZE.Lakehouse/Files"
+# Defaults to the Tables folder next to BRONZE_BASE
+BRONZE_TABLES = None
+PIPELINE_RUN_ID = None
+TRIGGER_TYPE = "Stream"
+GOLD_PUBLISHED_AT = None
+SILVER_TIMEOUT_SEC = 3600
+
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+# Derived here rather than in the parameters cell, which runs before BRONZE_BASE is injected
+BRONZE_TABLES = BRONZE_TABLES or BRONZE_BASE.rsplit("/", 1)[0] + "/Tables"
+# Run on demand after NB_BRONZE, not on a schedule: PL_SILVER stays the scheduled Silver load and owns the
+# manifest and watermark, and a second schedule would only redo its work. NB_SILVER's run lock keeps the
+# two from overlapping.
+STREAM_NAME = "silver_stream"
+CHECKPOINT_ROOT = "Files/Checkpoints/silver_stream"
+PENDING_TABLE = "silver_stream_changes"
+
+# Silver tables built from each Bronze dataset, following NB_SILVER's transform_inputs and table_transforms
+DATASET_TABLES = {
+    "niveaux": ["dim_niveaux", "fact_factures_niveaux"],
+    "etablissements": ["dim_etablissements"],
+    "classes": ["dim_classes", "dim_classes_targets", "dim_eleves", "dim_enfants", "dim_personnels", "dim_professeurs",
+                "dim_staff"],
+    "foyers": ["dim_foyers", "dim_parents", "dim_responsables", "fact_factures_eleves", "fact_factures_familles",
+               "fact_factures_services", "fact_factures_validations"],
+    "responsables": ["dim_parents", "dim_responsables", "fact_factures_eleves", "fact_factures_familles",
+                     "fact_factures_services", "fact_factures_validations"],
+    "professions": ["dim_professions"],
+    "eleves": ["dim_eleves", "dim_enfants"],
+    "factures_niveaux": ["fact_factures_niveaux"],
+    "factures_services": ["fact_factures_services"],
+    "factures_familles": ["fact_factures_eleves", "fact_factures_familles", "fact_factures_services",
+                          "fact_factures_validations"],
+    "factures_eleves": ["dim_eleves", "dim_enfants", "fact_factures_eleves", "fact_factures_services"],
+    "factures_validations": ["fact_factures_validations"],
+    "personnels": ["dim_personnels", "dim_professeurs", "dim_staff"],
+    "professeurs": ["dim_personnels", "dim_professeurs", "dim_staff"],
+    "pays": ["dim_pays", "dim_personnels", "dim_professeurs", "dim_staff"]
+}
+
+pending_schema = StructType([
+    StructField("DATASET", StringType(), False),
+    StructField("SCHOOLYEAR", StringType(), True),
+    StructField("RECORDEDAT", TimestampType(), False)
+])
+
+run_id = PIPELINE_RUN_ID or str(uuid.uuid4())
+
+if not spark.catalog.tableExists(PENDING_TABLE):
+    spark.createDataFrame([], pending_schema).write.format("delta").saveAsTable(PENDING_TABLE)
+
+def bronze_path(dataset_name: str) -> str:
+    return f"{BRONZE_TABLES}/bronze_{dataset_name}"
+
+def table_id(path: str) -> str:
+    return spark.sql(f"DESCRIBE DETAIL delta.`{path}`").select("id").first()[0]
+
+def record_years(df, batch_id=None, dataset_name=None):
+    writer = df.select("DATASET", "SCHOOLYEAR").distinct() \
+               .withColumn("RECORDEDAT", current_timestamp()) \
+               .write.format("delta").mode("append")
+    if batch_id is not None:
+        # A micro-batch replayed after a failure is appended only once
+        writer = writer.option("txnAppId", f"{STREAM_NAME}_{dataset_name}").option("txnVersion", batch_id)
+    writer.saveAsTable(PENDING_TABLE)
+
+def reset_if_rebuilt(dataset_name: str):
+    # NB_BRONZE drops and rebuilds a table whose schema changed; its stream restarts and every year is recorded
+    path, id_file = bronze_path(dataset_name), f"{CHECKPOINT_ROOT}/bronze_{dataset_name}.table_id"
+    current_id = table_id(path)
+    known_id = mssparkutils.fs.head(id_file, 1024).strip() if mssparkutils.fs.exists(id_file) else None
+    if known_id == current_id:
+        return
+    if known_id is not None:
+        mssparkutils.fs.rm(f"{CHECKPOINT_ROOT}/bronze_{dataset_name}", True)
+        record_years(spark.read.format("delta").load(path).withColumn("DATASET", lit(dataset_name)))
+        print(f"bronze_{dataset_name} was rebuilt, all its school years are recorded")
+    mssparkutils.fs.put(id_file, current_id, overwrite=True)
+
+def start_stream(dataset_name: str):
+    reset_if_rebuilt(dataset_name)
+    # Change feed rows only carry the affected school years forward; the Silver run reads the tables
+    changes = spark.readStream.format("delta") \
+                   .option("readChangeFeed", "true") \
+                   .option("startingVersion", "latest") \
+                   .load(bronze_path(dataset_name)) \
+                   .filter(col("_change_type") != "update_preimage") \
+                   .select(lit(dataset_name).alias("DATASET"), col("SCHOOLYEAR"))
+    return changes.writeStream \
+                  .queryName(f"{STREAM_NAME}_{dataset_name}") \
+                  .option("checkpointLocation", f"{CHECKPOINT_ROOT}/bronze_{dataset_name}") \
+                  .foreachBatch(lambda batch_df, batch_id: record_years(batch_df, batch_id, dataset_name)) \
+                  .trigger(availableNow=True) \
+                  .start()
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+streams, failed_streams = {}, {}
+for dataset_name in DATASET_TABLES:
+    if not mssparkutils.fs.exists(f"{bronze_path(dataset_name)}/_delta_log"):
+        print(f"bronze_{dataset_name} not landed yet, skipped")
+        continue
+    try:
+        streams[dataset_name] = start_stream(dataset_name)
+    except Exception as e:
+        print(f"Stream over bronze_{dataset_name} failed to start: {e}")
+        failed_streams[dataset_name] = str(e)[:4000]
+
+# availableNow: each query drains the commits landed since its checkpoint, then stops
+for dataset_name, query in streams.items():
+    try:
+        query.awaitTermination()
+    except Exception as e:
+        print(f"Stream over bronze_{dataset_name} failed: {e}")
+        failed_streams[dataset_name] = str(e)[:4000]
+
+pending = spark.table(PENDING_TABLE)
+recorded_until = pending.agg(max("RECORDEDAT")).first()[0]
+affected = sorted({(row["DATASET"], row["SCHOOLYEAR"]) for row in pending.select("DATASET", "SCHOOLYEAR").distinct().collect()})
+print(f"Bronze changes awaiting Silver: {affected}")
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+silver_result = None
+if affected:
+    # A scoped NB_SILVER run rebuilds only the tables fed by the changed datasets, in the changed years,
+    # and leaves the Silver manifest to PL_SILVER's full runs. Rows without a school year widen it to all years.
+    affected_years = {year for _, year in affected}
+    silver_scope = {
+        "SCHOOL_YEARS": "" if None in affected_years else ",".join(sorted(affected_years)),
+        "TABLES": ",".join(sorted({table for dataset_name, _ in affected for table in DATASET_TABLES[dataset_name]}))
+    }
+    print(f"Silver scope: {silver_scope}")
+    silver_params = {
+        "BRONZE_BASE": BRONZE_BASE,
+        "BRONZE_TABLES": BRONZE_TABLES,
+        "PIPELINE_RUN_ID": run_id,
+        "BATCH_ID": datetime.now(timezone.utc).isoformat(),
+        "TRIGGER_TYPE": TRIGGER_TYPE,
+        "GOLD_PUBLISHED_AT": GOLD_PUBLISHED_AT,
+        **silver_scope
+    }
+    try:
+        silver_exit = mssparkutils.notebook.run("NB_SILVER", SILVER_TIMEOUT_SEC,
+                                                {name: value for name, value in silver_params.items() if value is not None})
+        silver_result = json.loads(silver_exit) if silver_exit else {"status": "failed"}
+    except Exception as e:
+        # NB_SILVER raises when a write fails or PL_SILVER holds its run lock; the pending rows stay for the next batch
+        print(f"NB_SILVER failed: {e}")
+        silver_result = {"status": "failed", "error": str(e)[:4000]}
+    if silver_result.get("status") in ("succeeded", "no_change"):
+        DeltaTable.forName(spark, PENDING_TABLE).delete(col("RECORDEDAT") <= lit(recorded_until))
+
+silver_status = (silver_result or {}).get("status", "no_change")
+
+result = {
+    "status": "failed" if failed_streams or silver_status == "failed" else silver_status,
+    "run_id": run_id,
+    "run_ts": datetime.now(ZoneInfo("America/New_York")).isoformat(),
+    "affected": [f"{year}/{dataset_name}" for dataset_name, year in affected],
+    "failed_streams": failed_streams,
+    "silver": silver_result
+}
+
+mssparkutils.notebook.exit(json.dumps(result))
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark",
+# META   "frozen": false,
+# META   "editable": true
+# META }
@@ -0,0 +1,667 @@
+# Fabric notebook source
+
+# METADATA ********************
+
+# META {
+# META   "kernel_info": {
+# META     "name": "synapse_pyspark"
+# META   }
+# META }
+
+# CELL ********************
+
+from pyspark.sql import DataFrame, Row, SparkSession
+from pyspark.sql.types import *
+from pyspark.sql.functions import *
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+# Silver transforms as functions of their input DataFrames only: no lakehouse paths, no notebookutils
+# and no module-level session, so NB_SILVER can %run them and lise_silver can import them locally.
+
+SURROGATE_EPOCH = "2022-01-01"
+
+def date_key(date_col):
+    return (datediff(date_col, to_date(lit(SURROGATE_EPOCH))) + 1).cast(IntegerType())
+
+def hash_key(*key_cols):
+    return (pmod(xxhash64(*key_cols), lit(2147483647)) + 1).cast(IntegerType())
+
+# School-year start in the high digits, entity ID in the low ten: 2024-2025 / 668 -> 20240000000668
+def packed_key(year_col, id_col):
+    return substring(year_col, 1, 4).cast(LongType()) * 10000000000 + id_col.cast(LongType())
+
+def year_key(id_col):
+    return concat(col("SCHOOLYEAR"), lit("-"), col(id_col))
+
+def age(date_col):
+    age_years = floor(months_between(current_date(), date_col) / 12)
+    return when(date_col.isNotNull() & age_years.between(0,120), age_years).otherwise(lit(None))
+
+def clean_telephone(df: DataFrame) -> DataFrame:
+    return df.withColumn("TELEPHONE", regexp_replace(col("TELEPHONE"), r"[\s-]", "")) \
+             .withColumn("TELEPHONE", regexp_replace(col("TELEPHONE"), r"^\+(590|596|594|33)", "0")) \
+             .withColumn("TELEPHONE", regexp_replace(col("TELEPHONE"), r"\?", ""))
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+villes_schema = StructType([
+    StructField("VILLE", StringType(), True),
+    StructField("CODEPOSTAL", IntegerType(), True),
+    StructField("LATITUDE", DoubleType(), True),
+    StructField("LONGITUDE", DoubleType(), True),
+    StructField("DEPARTEMENT", StringType(), True),
+    StructField("PAYS", StringType(), True)
+])
+
+service_data = [
+    (1, "SCOLARITE"),
+    (2, "CANTINE"),
+    (3, "ETUDE"),
+    (4, "GARDERIE"),
+    (5, "VOYAGE"),
+    (6, "UNIFORME"),
+    (7, "SORTIE"),
+    (8, "PSG"),
+    (9, "FRAIS"),
+    (10, "CAMBRIDGE"),
+    (11, "BABY LISE"),
+    (12, "OUTDOOR"),
+    (13, "FOURNITURE")]
+
+regimes_data = [
+    (1, "DEMI-PENSIONNAIRE"),
+    (2, "EXTERNE")
+]
+
+school_years_data = [
+    ("2021-2022", "SCHOOL YEAR 2021-2022"),
+    ("2022-2023", "SCHOOL YEAR 2022-2023"),
+    ("2023-2024", "SCHOOL YEAR 2023-2024"),
+    ("2024-2025", "SCHOOL YEAR 2024-2025"),
+    ("2025-2026", "SCHOOL YEAR 2025-2026"),
+    ("2026-2027", "SCHOOL YEAR 2026-2027"),
+    ("2027-2028", "SCHOOL YEAR 2027-2028"),
+    ("2028-2029", "SCHOOL YEAR 2028-2029"),
+    ("2029-2030", "SCHOOL YEAR 2029-2030")
+    ]
+
+new_class_rows = [
+    Row(IDCLASSE=24, CL_CODE="5EG", CL_LIBELLE="5ème - Gamma", IDETABLISSEMENT=1, IDNIVEAU=3, CL_CLASSE_RECTORAT="5EME", SCHOOLYEAR="2024-2025"),
+    Row(IDCLASSE=25, CL_CODE="5EK", CL_LIBELLE="5ème - Kappa", IDETABLISSEMENT=1, IDNIVEAU=3, CL_CLASSE_RECTORAT="5EME", SCHOOLYEAR="2024-2025"),
+    Row(IDCLASSE=26, CL_CODE="6E", CL_LIBELLE="6ème", IDETABLISSEMENT=1, IDNIVEAU=3, CL_CLASSE_RECTORAT="6EME", SCHOOLYEAR="2024-2025")
+]
+
+def build_services(spark: SparkSession) -> DataFrame:
+    service_schema = StructType([
+        StructField("IDSERVICE", IntegerType(), True),
+        StructField("SERVICE", StringType(), True)
+    ])
+    return spark.createDataFrame(service_data, schema = service_schema)
+
+def build_regimes(spark: SparkSession) -> DataFrame:
+    regimes_schema = StructType([
+        StructField("IDREGIME", IntegerType(), True),
+        StructField("REGIME", StringType(), True)
+    ])
+    return spark.createDataFrame(regimes_data, schema = regimes_schema)
+
+def build_school_years(spark: SparkSession) -> DataFrame:
+    school_years_schema = StructType([
+        StructField("SCHOOLYEAR", StringType(), True),
+        StructField("SCHOOLYEARLIBELLE", StringType(), True)
+    ])
+    return spark.createDataFrame(school_years_data, schema = school_years_schema)
+
+def build_dates(spark: SparkSession, start_date: str = "20220101", end_date: str = "20301231") -> DataFrame:
+    df_date_range = spark.createDataFrame([(start_date, end_date)], ["start_date", "end_date"])
+
+    df_dates = df_date_range.select(
+        explode(sequence(to_date(col("start_date"), "yyyyMMdd"),
+                         to_date(col("end_date"), "yyyyMMdd"),
+                         expr("interval 1 day"))).alias("DATE"))
+
+    return df_dates.withColumn("CALENDARYEAR", year(col("DATE"))) \
+                   .withColumn("IDDATE", date_key(col("DATE"))) \
+                   .withColumn("CALENDARMONTH", month(col("DATE"))) \
+                   .withColumn("CALENDARDAY", dayofmonth(col("DATE"))) \
+                   .withColumn("MONTHNAME", date_format(col("DATE"), "MMMM")) \
+                   .withColumn("DAYNAME", date_format(col("DATE"), "EEEE")) \
+                   .withColumn("SCHOOLYEARSTART", when(month(col("DATE")) >= 8, year(col("DATE"))).otherwise(year(col("DATE")) -1)) \
+                   .withColumn("SCHOOLYEAREND", col("SCHOOLYEARSTART") + 1) \
+                   .withColumn("SCHOOLYEAR", concat(col("SCHOOLYEARSTART"),
+                                             lit("-"),
+                                             col("SCHOOLYEAREND"))) \
+                   .withColumn("SCHOOLYEARMONTH", when(month(col("DATE")) >= 9, month(col("DATE")) - 8).otherwise(month(col("DATE")) + 4)) \
+                   .withColumn("ISSCHOOLPERIOD", when((month(col("DATE")) >= 9) | (month(col("DATE")) <= 6), 1).otherwise(0)) \
+                   .select("IDDATE","DATE", "CALENDARYEAR", "CALENDARMONTH", "CALENDARDAY", "MONTHNAME", "DAYNAME", "SCHOOLYEAR", "ISSCHOOLPERIOD")
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+def add_class_rows(df_classes: DataFrame) -> DataFrame:
+    df_classes = df_classes.select("IDCLASSE", "CL_CODE", "CL_LIBELLE", "IDETABLISSEMENT", "IDNIVEAU", "CL_CLASSE_RECTORAT", "SCHOOLYEAR")
+    df_new_class_rows = df_classes.sparkSession.createDataFrame(new_class_rows, schema = df_classes.schema)
+    return df_classes.unionByName(df_new_class_rows)
+
+def transform_villes(df_villes: DataFrame) -> DataFrame:
+    return df_villes.withColumn("IDVILLE", hash_key(col("VILLE"))) \
+                    .filter(col("DEPARTEMENT") == "GUADELOUPE") \
+                    .select("IDVILLE", "VILLE", "CODEPOSTAL", "LATITUDE", "LONGITUDE", "DEPARTEMENT", "PAYS")
+
+def transform_etablissements(df_etablissements: DataFrame) -> DataFrame:
+    return df_etablissements.withColumn("IDETABLISSEMENT", col("IDETABLISSEMENT").cast("int")) \
+                            .filter(col("IDETABLISSEMENT") != 3) \
+                            .withColumn("ETABLISSEMENT", regexp_replace(col("ET_LIBELLE"), "L.I.S.E COLLEGE", "L.I.S.E PRIMARY"))\
+                            .select(col("IDETABLISSEMENT").cast(IntegerType()),
+                                    "ETABLISSEMENT")
+
+def transform_niveaux(df_niveaux: DataFrame) -> DataFrame:
+    return df_niveaux.withColumn("NIVEAU",
+                                 when(col("NI_CODE") == "MAT", "MATERNELLE")
+                                 .when(col("NI_CODE") == "PRIM", "PRIMAIRE")
+                                 .when(col("NI_CODE") == "AE", "ACTIVITES EXTRASCOLAIRES")
+                                 .when(col("NI_CODE") == "6E 5E 4E 3E", "COLLEGE")
+                                 .otherwise(col("NI_CODE"))) \
+                     .withColumn("IDNIVEAU",
+                                 when(col("NIVEAU") == "MATERNELLE", 1)
+                                 .when(col("NIVEAU") == "PRIMAIRE", 2)
+                                 .when(col("NIVEAU") == "COLLEGE", 3)
+                                 .when(col("NIVEAU") == "ACTIVITES EXTRASCOLAIRES", 4)) \
+                     .withColumn("IDETABLISSEMENT",
+                                 when(col("NIVEAU").isin("MATERNELLE", "COLLEGE", "ACTIVITES EXTRASCOLAIRES"), 1)
+                                 .otherwise(2)
+                                )\
+                     .select(col("IDNIVEAU").cast(IntegerType()),
+                             "NIVEAU",
+                             col("IDETABLISSEMENT").cast(IntegerType()))
+
+def transform_professions(df_professions: DataFrame) -> DataFrame:
+    return df_professions.withColumnRenamed("CSP_CODE", "IDPROFESSION")\
+                         .withColumnRenamed("CSP_LIBELLE", "PROFESSION") \
+                         .select(col("IDPROFESSION").cast(IntegerType()),
+                                 "PROFESSION")
+
+def transform_pays(df_pays: DataFrame) -> DataFrame:
+    return df_pays.withColumnRenamed("PA_CODE", "IDPAYS") \
+                  .withColumnRenamed("PA_PAYS", "PAYS") \
+                  .withColumnRenamed("PA_NATIONALITE", "NATIONALITE") \
+                  .select(col("IDPAYS").cast(IntegerType()),
+                          "PAYS",
+                          "NATIONALITE")
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+classes_primaire = ["CP", "CE1", "CE2", "CM1", "CM2"]
+classes_maternelle = ["TP", "PS", "MS", "GS"]
+classes_college = ["6EME", "5EME", "4EME", "3EME"]
+id_niveaux_academy = [9, 1, 3]
+old_classe_keys2425 =["2024-2025-9", "2024-2025-11"]
+
+def transform_classes(df_classes: DataFrame) -> DataFrame:
+    """Cleaned classes with add_class_rows applied, shared by build_classes and build_classes_targets."""
+    return df_classes.withColumnRenamed("CL_CLASSE_RECTORAT", "CLASSE") \
+                     .withColumn("CLASSE", regexp_replace(col("CLASSE"), "6ÈME", "6EME")) \
+                     .withColumn("CLASSELIBELLE", split(col("CL_LIBELLE"), "-").getItem(1)) \
+                     .withColumn("IDNIVEAU", when(col("CLASSE").isin(classes_primaire), 2)
+                                             .when(col("CLASSE").isin(classes_maternelle), 1)
+                                             .when(col("CLASSE").isin(classes_college), 3)
+                                             .otherwise(4)) \
+                     .withColumn("IDETABLISSEMENT", when(col("IDNIVEAU").isin(id_niveaux_academy), 1).otherwise(2)) \
+                     .withColumn("CLASSE", when(col("IDCLASSE") == 20, "AE").otherwise(col("CLASSE"))) \
+                     .withColumn("CLASSELIBELLE", when(col("IDCLASSE") == 20, "Activités ExtraScolaires").otherwise(col("CLASSELIBELLE"))) \
+                     .withColumn("CLASSELIBELLE", coalesce(col("CLASSELIBELLE"), col("CLASSE"))) \
+                     .withColumn("CLASSELIBELLE", when(col("CLASSELIBELLE").isin(classes_college), lower(col("CLASSELIBELLE"))).otherwise(col("CLASSELIBELLE")))\
+                     .withColumn("IDETABLISSEMENT", when(col("IDCLASSE") == 20, 1).otherwise(col("IDETABLISSEMENT")))
+
+def build_classes_targets(df_classes: DataFrame) -> DataFrame:
+    return df_classes.withColumn("TARGETCOUNT", when(col("CLASSE")== "3EME", 10).otherwise(20)) \
+                     .withColumn("CLASSELIBELLE", coalesce(col("CLASSELIBELLE"), col("CLASSE"))) \
+                     .withColumn("TARGETCOUNT", when(col("CLASSE") == "AE", lit(None).cast(IntegerType())).otherwise(col("TARGETCOUNT"))) \
+                     .withColumn("MAXIMUMCOUNT", when(col("CLASSE") == "AE", lit(None).cast(IntegerType())).otherwise(22)) \
+                     .withColumn("KEYCLASSE", year_key("IDCLASSE")) \
+                     .withColumn("KEYCLASSEID", packed_key(col("SCHOOLYEAR"), col("IDCLASSE"))) \
+                     .filter(~col("KEYCLASSE").isin(old_classe_keys2425)) \
+                     .select("KEYCLASSE",
+                             "KEYCLASSEID",
+                             col("IDCLASSE").cast(IntegerType()),
+                             col("TARGETCOUNT").cast(IntegerType()),
+                             col("MAXIMUMCOUNT").cast(IntegerType()),
+                             "SCHOOLYEAR")
+
+def build_classes(df_classes: DataFrame) -> DataFrame:
+    return df_classes.select(col("IDCLASSE").cast(IntegerType()),
+                             "CLASSE",
+                             "CLASSELIBELLE",
+                             col("IDNIVEAU").cast(IntegerType()),
+                             col("IDETABLISSEMENT").cast(IntegerType()))
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+communes_gwada = [
+    "LES ABYMES",
+    "ANSE BERTRAND",
+    "BAIE MAHAULT",
+    "BAILLIF",
+    "BASSE TERRE",
+    "BOUILLANTE",
+    "CAPESTERRE BELLE EAU",
+    "CAPESTERRE DE MARIE GALANTE",
+    "DESHAIES",
+    "LA DESIRADE",
+    "LE GOSIER",
+    "GOURBEYRE",
+    "GOYAVE",
+    "GRAND BOURG",
+    "HORS GUADELOUPE",
+    "LAMENTIN",
+    "MORNE A L EAU",
+    "LE MOULE",
+    "PETIT BOURG",
+    "PETIT CANAL",
+    "POINTE A PITRE",
+    "POINTE NOIRE",
+    "PORT LOUIS",
+    "SAINT CLAUDE",
+    "SAINT FRANCOIS",
+    "SAINT LOUIS",
+    "SAINTE ANNE",
+    "SAINTE ROSE",
+    "TERRE DE BAS",
+    "TERRE DE HAUT",
+    "TROIS RIVIERES",
+    "VIEUX FORT",
+    "VIEUX HABITANTS"
+]
+
+def transform_foyers(df_foyers: DataFrame, df_villes: DataFrame) -> DataFrame:
+    df_foyers = df_foyers.withColumn("VILLE", regexp_replace(col("VILLE"), "STE ", "SAINTE ")) \
+                         .withColumn("VILLE", regexp_replace(col("VILLE"), "ST ", "SAINT ")) \
+                         .withColumn("VILLE", regexp_replace(col("VILLE"), "Baie-Mahault", "BAIE MAHAULT")) \
+                         .withColumn("VILLE", regexp_replace(col("VILLE"), "BAIE-", "BAIE MAHAULT")) \
+                         .withColumn("VILLE", regexp_replace(col("VILLE"), "BAIE MAHAULTMAHAULT", "BAIE MAHAULT")) \
+                         .withColumn("VILLE", regexp_replace(col("VILLE"), "-", " ")) \
+                         .withColumn("VILLE", when(~col("VILLE").isin(communes_gwada), "HORS GUADELOUPE").otherwise(col("VILLE"))) \
+                         .withColumn("VILLE", upper(col("VILLE"))) \
+                         .filter(col("VILLE").isNotNull() & (trim(col("VILLE")) != ""))
+
+    return df_foyers.join(broadcast(df_villes), on = "VILLE", how = "left") \
+                    .withColumn("IDVILLE", when(col("IDVILLE").isNull(), hash_key(lit("HORS GUADELOUPE"))).otherwise(col("IDVILLE"))) \
+                    .withColumn("VILLE", when(col("VILLE").isNull(), "HORS GUADELOUPE").otherwise(col("VILLE"))) \
+                    .select(col("IDFOYER").cast(IntegerType()),
+                            "VILLE",
+                            col("IDVILLE").cast(IntegerType()))
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+def transform_personnels(df_personnels: DataFrame) -> DataFrame:
+    """Renamed and cleaned staff rows shared by build_staff and build_personnels."""
+    df_personnels = df_personnels.withColumnRenamed("PE_NOM", "NOM") \
+        .withColumnRenamed("PE_PRENOM", "PRENOM") \
+        .withColumnRenamed("PE_TYPE", "TYPE") \
+        .withColumnRenamed("PE_VILLE", "VILLE") \
+        .withColumnRenamed("PE_PAYS", "PAYS") \
+        .withColumnRenamed("PE_DATE_ENTREE", "DATEENTREE") \
+        .withColumnRenamed("PE_DATE_SORTIE", "DATESORTIE") \
+        .withColumnRenamed("PE_TELPORTABLE", "TELEPHONE") \
+        .withColumnRenamed("PE_EMAIL_PRO", "EMAIL") \
+        .withColumnRenamed("PE_NAISSANCE_DATE", "DATENAISSANCE") \
+        .withColumnRenamed("PE_NUMSECU", "SECURITESOCIALE") \
+        .withColumnRenamed("PE_BADGENUM", "BADGE") \
+        .withColumnRenamed("PE_IBAN", "NUMEROCOMPTE") \
+        .withColumn("NOM", when(col("IDPERSONNEL") == 18, "CLEDE" ).otherwise(col("NOM"))) \
+        .withColumn("TYPE", regexp_replace(col("TYPE"), "prof", "Enseignant")) \
+        .withColumn("TYPE", regexp_replace(col("TYPE"), "exterieur", "Agent")) \
+        .withColumn("TYPE", when(col("IDPERSONNEL").isin(70, 71), "Apprentie")
+                          .when(col("IDPERSONNEL").isin(17, 33), "Cadre")
+                          .when(col("IDPERSONNEL").isin(22, 49), "Administration")
+                          .otherwise(col("TYPE"))) \
+        .withColumn("VILLE", regexp_replace(col("VILLE"), "STE ", "SAINTE ")) \
+        .withColumn("VILLE", regexp_replace(col("VILLE"), "ST ", "SAINT ")) \
+        .withColumn("VILLE", regexp_replace(col("VILLE"), "JARRY", "BAIE MAHAULT")) \
+        .withColumn("VILLE", regexp_replace(col("VILLE"), "-", ""))
+
+    return clean_telephone(df_personnels) \
+        .withColumn("EMAIL", lower(concat(substring(trim(col("PRENOM")), 1, 1), lit("."),
+                                          split(trim(col("NOM")), r"\s+").getItem(0),
+                                          lit("@kudzaisolutions.com")))) \
+        .withColumn("EMAIL", regexp_replace(col("EMAIL"), r"@.*$", "@kudzaisolutions.onmicrosoft.com")) \
+        .withColumn("AGE", age(col("DATENAISSANCE"))) \
+        .withColumn("KEYPERSONNEL", year_key("IDPERSONNEL")) \
+        .withColumn("KEYPERSONNELID", packed_key(col("SCHOOLYEAR"), col("IDPERSONNEL")))
+
+def build_staff(df_personnels: DataFrame) -> DataFrame:
+    return df_personnels.select(
+        "KEYPERSONNEL",
+        "KEYPERSONNELID",
+        col("IDPERSONNEL").cast(IntegerType()),
+        "VILLE",
+        "DATEENTREE",
+        "DATESORTIE",
+        col("TELEPHONE"),
+        "EMAIL",
+        "DATENAISSANCE",
+        col("AGE").cast(IntegerType()))
+
+def build_personnels(df_personnels: DataFrame, df_pays: DataFrame) -> DataFrame:
+    return df_personnels.join(df_pays, on=(df_pays["IDPAYS"] == df_personnels["PE_NATIONALITE"]), how="left") \
+                        .select(col("IDPERSONNEL").cast(IntegerType()),
+                                "NOM",
+                                "PRENOM",
+                                "NATIONALITE",
+                                col("BADGE").cast(IntegerType()))
+
+def transform_professeurs(df_professeurs: DataFrame, df_classes: DataFrame) -> DataFrame:
+    return df_professeurs.join(df_classes, on = "IDCLASSE", how = "left") \
+                         .withColumnRenamed("IDPROFSPRINCIPAUX", "IDPROFESSEUR") \
+                         .select(col("IDPROFESSEUR").cast(IntegerType()),
+                                 col("IDPERSONNEL").cast(IntegerType()),
+                                 col("IDCLASSE").cast(IntegerType()))
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+# Code banque (positions 5 to 9 of a French IBAN) per bank
+codes_banques = {
+    "CREDIT MUTUEL": ["10278", "11628", "11808", "15429", "15459", "15489", "15519", "15549", "15589", "15629",
+                      "15749", "15829", "15899", "15959", "16088", "16159", "16179", "45539"],
+    "BANQUE POPULAIRE": ["10107", "10207", "10807", "10907", "11307", "11907", "13507", "13607", "13807", "13907",
+                         "14607", "14707", "15607", "16607", "16707", "16807", "17607", "17807", "18707"],
+    "CREDIT AGRICOLE": ["10206", "14006", "11006", "11076", "11206", "11306", "11706", "12006", "12206", "12406",
+                        "12506", "12906", "13106", "13210", "13306", "13506", "13606", "13906", "14406", "14506",
+                        "14706", "14806", "15449", "15898", "16006", "16106", "16706", "16806", "16906", "17106",
+                        "17206", "17429", "17805", "17906", "18106", "18206", "18306", "18706", "19106", "19406",
+                        "19506", "19530", "19806", "19906", "30006"],
+    "CAISSE D'EPARGNE": ["11315", "11425", "12135", "13135", "13335", "13485", "13825", "14265", "14445", "14505",
+                         "15135", "16275", "16705", "17515", "18025", "18315", "18715", "19825", "16210"],
+    "BNP": ["11498", "11729", "13078", "13088", "15408", "15668", "15938", "16078", "17939", "18020", "18029",
+            "30004", "30598", "40198", "41329", "41919"],
+    "CIC": ["11600", "13070", "15848", "17230", "30087", "41199", "30047", "10057"],
+    "BANQUE POSTALE": ["16178", "20041"],
+    "SOCIETE GENERALE": ["13769", "14869", "15968", "18079", "18319", "19990", "30003"],
+    "BOURSORAMA": ["40618"],
+    "QONTO": ["16958", "16598"],
+    "LYDIA": ["17598"],
+    "REVOLUT": ["28233"],
+    "LCL": ["30002", "10096"],
+    "MONABANQ": ["14690"],
+    "BFORBANK": ["16218"],
+    "SHINE": ["17418"]
+}
+
+def build_banques(spark: SparkSession) -> DataFrame:
+    banques_schema = StructType([
+        StructField("CODEBANQUE", StringType(), True),
+        StructField("BANQUE", StringType(), True)
+    ])
+    return spark.createDataFrame([(code, banque) for banque, codes in codes_banques.items() for code in codes],
+                                 schema = banques_schema)
+
+def transform_responsables(df_responsables: DataFrame, df_foyers: DataFrame) -> DataFrame:
+    """Responsables joined to their foyer and bank, shared by build_parents and the family facts."""
+    df_responsables = df_responsables.withColumn("RE_CSP1", coalesce(col("RE_CSP1"), col("RE_CSP2"), lit(99))) \
+                                     .withColumnRenamed("RE_NOM1", "NOM") \
+                                     .withColumnRenamed("RE_PRENOM1", "PRENOM") \
+                                     .withColumnRenamed("RE_CSP1", "IDPROFESSION") \
+                                     .withColumnRenamed("RE_MODE_REGLEMENT", "REGLEMENT") \
+                                     .withColumnRenamed("RE_ENF_A_CHARGE", "ENFANTSACHARGE") \
+                                     .withColumnRenamed("RE_TELPORTABLE1", "TELEPHONE") \
+                                     .withColumnRenamed("RE_EMAILPERSO1", "EMAIL") \
+                                     .withColumnRenamed("RE_IBAN", "NUMEROCOMPTE") \
+                                     .withColumn("KEYRESPONSABLE", year_key("IDRESPONSABLE")) \
+                                     .withColumn("KEYRESPONSABLEID", packed_key(col("SCHOOLYEAR"), col("IDRESPONSABLE"))) \
+                                     .withColumn("CODEPOSTAL", when(col("RE_CODEPOSTAL") == "H4V1H2", None).otherwise(col("RE_CODEPOSTAL"))) \
+                                     .join(df_foyers, on = "IDFOYER", how = "left")
+
+    df_responsables = df_responsables.withColumn("CODEBANQUE", substring(regexp_replace(upper(col("NUMEROCOMPTE")), "[^0-9A-Z]", ""), 5, 5)) \
+                                     .join(broadcast(build_banques(df_responsables.sparkSession)), on = "CODEBANQUE", how = "left") \
+                                     .withColumn("BANQUE", coalesce(col("BANQUE"), lit("AUTRES"))) \
+                                     .drop("CODEBANQUE")
+
+    return clean_telephone(df_responsables)
+
+def build_parents(df_responsables: DataFrame) -> DataFrame:
+    return df_responsables.withColumn("FULLNAME", concat(col("NOM"), lit(" "), col("PRENOM"))) \
+                          .select(col("IDRESPONSABLE").cast(IntegerType()),
+                                  "NOM",
+                                  "PRENOM",
+                                  "FULLNAME")
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+def transform_ecoliers(df_ecoliers: DataFrame, df_factures_eleves: DataFrame, df_classes: DataFrame, df_regimes: DataFrame) -> DataFrame:
+    """Students per school year; df_factures_eleves is the Bronze invoice table, not transform_factures_eleves."""
+    df_ecoliers = df_ecoliers.withColumn("IDELEVE", when(col("IDELEVE")== 575, lit(668)).otherwise(col("IDELEVE")))
+
+    return df_ecoliers.join(df_factures_eleves, on=["IDELEVE", "SCHOOLYEAR"], how="left") \
+                      .join(broadcast(df_classes), df_ecoliers["EL_IDCLASSE"] == df_classes["IDCLASSE"], "left")\
+                      .join(broadcast(df_regimes), df_ecoliers["EL_IDREGIME"] == df_regimes["IDREGIME"], "left") \
+                      .withColumnRenamed("EL_NOM1", "NOM")\
+                      .withColumnRenamed("EL_PRENOM1", "PRENOM")\
+                      .withColumnRenamed("EL_SEXE", "SEXE")\
+                      .withColumnRenamed("EL_DATE_DE_NAISSANCE", "DATENAISSANCE") \
+                      .withColumnRenamed("EL_DATE_ENTREE", "DATEENTREE") \
+                      .withColumnRenamed("EL_DATE_SORTIE", "DATESORTIE") \
+                      .withColumnRenamed("EL_NATIONALITE1", "NATIONALITE") \
+                      .withColumnRenamed("EL_IDENT_NAT", "IDENTITENATIONALE") \
+                      .withColumn("IDREGIME", when(col("EL_IDREGIME").isNull(), 2).otherwise(col("EL_IDREGIME"))) \
+                      .withColumn("REGIME", when(col("CLASSE") == "AE", "EXTERNE").otherwise(col("REGIME"))) \
+                      .withColumn("AGE", age(col("DATENAISSANCE"))) \
+                      .withColumn("KEYELEVE", concat(df_factures_eleves["SCHOOLYEAR"],
+                                                lit("-"),
+                                                col("IDELEVE"))) \
+                      .withColumn("KEYELEVEID", packed_key(df_factures_eleves["SCHOOLYEAR"], col("IDELEVE")))
+
+def build_enfants(df_ecoliers: DataFrame) -> DataFrame:
+    return df_ecoliers.withColumn("FULLNAME", concat(col("NOM"), lit(" "), col("PRENOM"))) \
+                      .select(col("IDELEVE").cast(IntegerType()),
+                              "NOM",
+                              "PRENOM",
+                              "SEXE",
+                              "DATENAISSANCE",
+                              "AGE",
+                              "NATIONALITE",
+                              "IDENTITENATIONALE",
+                              "FULLNAME")
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+def transform_factures_familles(df_factures_familles: DataFrame, df_responsables: DataFrame) -> DataFrame:
+    return df_factures_familles.withColumnRenamed("HF_APAYER_FACTURE", "TOTALFAMILLE") \
+                               .withColumnRenamed("HF_DATE_FACTURE", "DATEFACTURE") \
+                               .withColumn("KEYRESPONSABLE", year_key("IDRESPONSABLE")) \
+                               .withColumn("KEYVALIDATION", year_key("IDVALIDATION")) \
+                               .withColumn("KEYRESPONSABLEID", packed_key(col("SCHOOLYEAR"), col("IDRESPONSABLE"))) \
+                               .withColumn("KEYVALIDATIONID", packed_key(col("SCHOOLYEAR"), col("IDVALIDATION"))) \
+                               .join(df_responsables.drop("KEYRESPONSABLE", "IDRESPONSABLE"), on = "KEYRESPONSABLEID", how = "left")
+
+def transform_factures_eleves(df_factures_eleves: DataFrame, df_factures_familles: DataFrame) -> DataFrame:
+    df_factures_eleves = df_factures_eleves.withColumn("HE_IDCLASSE", when((col("HE_IDCLASSE")== 11) & (col("SCHOOLYEAR")== "2024-2025"), 25) \
+                                           .when((col("HE_IDCLASSE")== 9) & (col("SCHOOLYEAR")== "2024-2025"), 24) \
+                                           .when((col("HE_IDCLASSE")== 23) & (col("SCHOOLYEAR") == "2024-2025"), 26) \
+                                           .otherwise(col("HE_IDCLASSE")))
+
+    df_factures_eleves = df_factures_eleves.withColumn("IDELEVE", when(col("IDELEVE")== 575, lit(668)).otherwise(col("IDELEVE")))
+
+    return df_factures_eleves.withColumnRenamed("HE_IDREGIME", "IDREGIME") \
+                             .withColumnRenamed("HE_IDCLASSE", "IDCLASSE") \
+                             .withColumnRenamed("HE_APAYER_ELEVE", "TOTALELEVE")\
+                             .withColumn("KEYVALIDATION", year_key("IDVALIDATION").cast("string")) \
+                             .withColumn("KEYRESPONSABLE", year_key("IDRESPONSABLE").cast("string")) \
+                             .withColumn("KEYELEVE", year_key("IDELEVE")) \
+                             .withColumn("KEYCLASSE", year_key("IDCLASSE")) \
+                             .withColumn("KEYVALIDATIONID", packed_key(col("SCHOOLYEAR"), col("IDVALIDATION"))) \
+                             .withColumn("KEYRESPONSABLEID", packed_key(col("SCHOOLYEAR"), col("IDRESPONSABLE"))) \
+                             .withColumn("KEYELEVEID", packed_key(col("SCHOOLYEAR"), col("IDELEVE"))) \
+                             .withColumn("KEYCLASSEID", packed_key(col("SCHOOLYEAR"), col("IDCLASSE"))) \
+                             .join(df_factures_familles.drop("KEYVALIDATION", "IDVALIDATION", "KEYRESPONSABLE", "IDRESPONSABLE", "SCHOOLYEAR"),
+                                   on = ["KEYVALIDATIONID", "KEYRESPONSABLEID"], how = "left") \
+                             .filter(col("IDELEVE") != 0) \
+                             .withColumn("IDREGIME", when(col("IDREGIME") == 0, 2).otherwise(col("IDREGIME")))
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+SERVICE_CODES_VERSION = 1
+
+# Raw invoice line codes (HL_CODE_LIGNE) -> IDSERVICE of service_data; bump the version with any edit.
+# Codes missing here land with a null IDSERVICE and are listed by unmapped_service_codes.
+service_code_data = [
+    ("SCOLARITE", 1),
+    ("CANTINE", 2), ("REPAS_THANKSGIVING", 2),
+    ("ETUDE", 3), ("ACADEMIC_WEDNESDAY", 3),
+    ("GARDERIE", 4),
+    ("VOYAGE", 5), ("VOYAGES", 5), ("CM2_TRIP", 5), ("CM2TRIP", 5), ("VOYAGE_LING_FLL", 5), ("VOYAGE_LING_DOMINICA", 5),
+    ("VOYAGE_LING_FTL", 5), ("CM1VL", 5), ("VLMFL", 5), ("VLCM2", 5), ("VL_ATL", 5),
+    ("UNIFORME", 6), ("JUPE", 6), ("JUPES", 6), ("POLO", 6), ("POLOS", 6), ("SHORT", 6), ("T_SHIRT", 6), ("SORCT", 6),
+    ("SORTIE", 7), ("SORTIES", 7), ("KAYAK", 7), ("CINETHEATRE_MILETOIL", 7),
+    ("PSG", 8), ("PSG_COMPLET", 8), ("PSG_DEMI_JOURNEE", 8), ("EXT_PSG_COMPLET", 8), ("EXT_PSG_DEMI", 8),
+    ("FRAIS", 9), ("FRAIS_INS", 9), ("FRAIS_REINSC", 9), ("FRAIS_REINSCR", 9), ("FRAISRETARD", 9), ("PENALITE", 9),
+    ("LMS", 9), ("ACCES_ED", 9), ("FRAISREJET", 9),
+    ("CAMBRIDGE", 10), ("CAMBRIDGEEXAM", 10), ("CAMBDRIDGEEXAM", 10),
+    ("BABY LISE", 11), ("BABY_LISE", 11), ("EXT_BABYLISE", 11),
+    ("OUTDOOR", 12), ("EXT_OUTDOOR", 12),
+    ("FOURNITURE", 13), ("FOURNITURES", 13)
+]
+
+def build_service_codes(spark: SparkSession) -> DataFrame:
+    service_codes_schema = StructType([
+        StructField("CODE", StringType(), False),
+        StructField("IDSERVICE", IntegerType(), False)
+    ])
+    return spark.createDataFrame(service_code_data, schema = service_codes_schema) \
+                .withColumn("VERSION", lit(SERVICE_CODES_VERSION))
+
+def unmapped_service_codes(df_factures_services: DataFrame, df_service_codes: DataFrame) -> DataFrame:
+    """Bronze invoice line codes missing from the mapping, with their line count and school years."""
+    return df_factures_services.filter(col("HL_CODE_LIGNE").isNotNull()) \
+                               .join(broadcast(df_service_codes), col("HL_CODE_LIGNE") == col("CODE"), "left_anti") \
+                               .groupBy("HL_CODE_LIGNE") \
+                               .agg(count(lit(1)).alias("LINES"), sort_array(collect_set("SCHOOLYEAR")).alias("SCHOOLYEARS"))
+
+def transform_factures_services(df_factures_services: DataFrame, df_service_codes: DataFrame,
+                                df_factures_eleves: DataFrame) -> DataFrame:
+    """Invoice lines with IDSERVICE looked up in the broadcast service code mapping."""
+    service_codes = broadcast(df_service_codes.select(col("CODE").alias("HL_CODE_LIGNE"), "IDSERVICE"))
+    return df_factures_services.join(service_codes, on = "HL_CODE_LIGNE", how = "left") \
+                               .withColumnRenamed("HL_QUANTITE", "QUANTITE") \
+                               .withColumnRenamed("HL_PRIX", "PRIX") \
+                               .withColumnRenamed("HL_REMISE_MT_AUTO", "REMISE") \
+                               .withColumnRenamed("HL_APAYER_LIGNE", "TOTALSERVICE") \
+                               .withColumn("KEYRESPONSABLE", year_key("IDRESPONSABLE").cast("string")) \
+                               .withColumn("KEYVALIDATION", year_key("IDVALIDATION").cast("string")) \
+                               .withColumn("KEYELEVE", year_key("IDELEVE")) \
+                               .withColumn("KEYRESPONSABLEID", packed_key(col("SCHOOLYEAR"), col("IDRESPONSABLE"))) \
+                               .withColumn("KEYVALIDATIONID", packed_key(col("SCHOOLYEAR"), col("IDVALIDATION"))) \
+                               .withColumn("KEYELEVEID", packed_key(col("SCHOOLYEAR"), col("IDELEVE"))) \
+                               .join(df_factures_eleves.drop("KEYELEVE", "IDELEVE", "KEYRESPONSABLE", "IDRESPONSABLE", "KEYVALIDATION", "IDVALIDATION", "SCHOOLYEAR"),
+                                     on = ["KEYELEVEID", "KEYRESPONSABLEID", "KEYVALIDATIONID"], how ="left")
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
+unwanted_niveaux = ["FRAISRETARD", "VOYAGES"]
+
+def transform_factures_niveaux(df_factures_niveaux: DataFrame, df_niveaux: DataFrame) -> DataFrame:
+    return df_factures_niveaux.filter(~col("CG_POSTE_ANA").isin(unwanted_niveaux)) \
+                              .withColumn("TOTALNIVEAU", (col("CG_CREDIT") - col("CG_DEBIT")))\
+                              .withColumn("NIVEAU", regexp_replace(col("CG_POSTE_ANA"),"TPS", "MATERNELLE"))\
+                              .withColumnRenamed("CG_DATE_FACTURE", "DATEFACTURE") \
+                              .withColumn("KEYRESPONSABLE", year_key("IDRESPONSABLE").cast("string")) \
+                              .withColumn("KEYVALIDATION", year_key("IDVALIDATION").cast("string")) \
+                              .withColumn("KEYRESPONSABLEID", packed_key(col("SCHOOLYEAR"), col("IDRESPONSABLE"))) \
+                              .withColumn("KEYVALIDATIONID", packed_key(col("SCHOOLYEAR"), col("IDVALIDATION"))) \
+                              .join(broadcast(df_niveaux), on = "NIVEAU", how="left")
+
+def transform_factures_validations(df_factures_validations: DataFrame, df_factures_familles: DataFrame) -> DataFrame:
+    return df_factures_validations.withColumn("TYPEFACTURE", regexp_replace(col("VA_TYPE_FACTURE"), "Toutes", "Calculées")) \
+                                  .withColumnRenamed("VA_NB_FACTURES", "NOMBREFACTURE") \
+                                  .withColumnRenamed("VA_DATE_HEURE", "DATEVALIDATION") \
+                                  .withColumn("DATEVALIDATION", regexp_replace(col("DATEVALIDATION"), "Le", "")) \
+                                  .withColumn("DATEVALIDATION", regexp_replace(col("DATEVALIDATION"), "à", "")) \
+                                  .withColumn("DATEVALIDATION", trim(col("DATEVALIDATION"))) \
+                                  .withColumn("DATEVALIDATION", split(col("DATEVALIDATION"), " ").getItem(0)) \
+                                  .withColumn("DATEVALIDATION", to_date(col("DATEVALIDATION"), "dd/MM/yyyy")) \
+                                  .withColumn("KEYVALIDATION", year_key("IDVALIDATION").cast("string")) \
+                                  .withColumn("KEYVALIDATIONID", packed_key(col("SCHOOLYEAR"), col("IDVALIDATION"))) \
+                                  .join(df_factures_familles.drop("KEYVALIDATION", "IDVALIDATION"), on="KEYVALIDATIONID", how = "left")
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
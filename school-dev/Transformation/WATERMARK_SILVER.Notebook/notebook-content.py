@@ -22,6 +22,18 @@
 
 # CELL ********************
 
+# Set by PL_SILVER when NB_SILVER ran for given school years or tables only
+SCOPED_RUN = False
+
+# METADATA ********************
+
+# META {
+# META   "language": "python",
+# META   "language_group": "synapse_pyspark"
+# META }
+
+# CELL ********************
+
 from notebookutils import mssparkutils
 from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
@@ -34,8 +46,10 @@ now_utc  = now_et.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
 folder = "Files/Watermarks"
 file   = f"{folder}/watermark.json"
 
-mssparkutils.fs.mkdirs(folder)  
-mssparkutils.fs.put(file, json.dumps({"lastModified": now_utc}, indent=2), overwrite=True)
+# A scoped rerun leaves Bronze changes outside its scope unprocessed, so the watermark stays put
+if not SCOPED_RUN:
+    mssparkutils.fs.mkdirs(folder)  
+    mssparkutils.fs.put(file, json.dumps({"lastModified": now_utc}, indent=2), overwrite=True)
 
 
 # METADATA ********************